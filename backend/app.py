@@ -1,18 +1,47 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Response, WebSocket, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 import models
 
 # Import the Logic functions
 from queries import create_user, check_existing_user
-from core_logic import signup_user_core, login_user_core,create_event_core, list_events_for_club_core, list_all_events_core, create_post_core, list_posts_for_club_core
+from core_logic import create_event_core, create_post_core
+from core_logic import update_event_core, delete_event_core, update_post_core, delete_post_core
+from core_logic import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from core_logic import signup_user_core_async, login_user_core_async
+from core_logic import get_club_or_404_async, club_feed_etag, etag_matches
+from core_logic import get_home_feed_core
+from core_logic import list_club_followers_core
+from core_logic import get_club_network_core, list_club_rankings_core
+from core_logic import list_conversations_core, mark_conversation_read_core
+from core_logic import search_core
+from core_logic import list_events_in_window_core_async
+from core_logic import list_events_for_club_core_async, list_all_events_core_async, list_posts_for_club_core_async, list_recommended_clubs_core_async
 
 # Import DB setup
-from database import get_db
-from auth import create_access_token, get_current_user
+from database import get_db, get_async_db, SessionLocal
+from auth import create_access_token, get_current_user, get_user_from_token
 from datetime import timedelta, datetime
 from auth import ACCESS_TOKEN_EXPIRE_MINUTES
+from replicas import ReadYourWritesMiddleware, get_read_async_db
+from metrics import MetricsMiddleware, PROMETHEUS_CONTENT_TYPE, query_budget, render_metrics
+
+# Faster JSON encoding for the list endpoints when orjson is installed.
+# Those routes return the response object directly, which also skips
+# FastAPI's jsonable_encoder pass over already JSON-safe dicts.
+# (FastAPI's own ORJSONResponse is deprecated, hence the local class.)
+try:
+    import orjson
+
+    class FastJSONResponse(JSONResponse):
+        def render(self, content) -> bytes:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    FastJSONResponse = JSONResponse
 
 app = FastAPI()
 
@@ -29,8 +58,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets browser clients echo the write marker, see replicas.py
+    expose_headers=["X-Last-Write"],
 )
 
+# Per-route latency, status counts and DB usage, served on /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Users who just wrote keep reading from the primary, see replicas.py
+app.add_middleware(ReadYourWritesMiddleware)
+
 # --- Pydantic Models ---
 class UserSignup(BaseModel):
     name: str
@@ -66,24 +103,33 @@ class PostUpdate(BaseModel):
     title: str | None = None
     content: str | None = None
 
+class ConversationCreate(BaseModel):
+    user_id: int
+
 
 # --- ROUTES ---
 
-@app.post("/api/signup")
-def signup(user: UserSignup, db: Session = Depends(get_db)):
-    return signup_user_core(user, db)
+# Password hashing runs on a worker pool, see passwords.py
+@app.post("/api/signup", dependencies=[query_budget(4)])
+async def signup(user: UserSignup, db: Session = Depends(get_db)):
+    return await signup_user_core_async(user, db)
 
-@app.post("/api/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    return login_user_core(user, db)
+@app.post("/api/login", dependencies=[query_budget(1)])
+async def login(user: UserLogin, db: Session = Depends(get_db)):
+    return await login_user_core_async(user, db)
 
-@app.post("/api/save_tags")
+@app.post("/api/save_tags", dependencies=[query_budget(4)])
 def save_user_tags(tags: list[str], current_user: models.Users = Depends(get_current_user), db: Session = Depends(get_db)):
     from queries import create_user_tags
-    create_user_tags(db, current_user.userid, tags)
-    return {"status": "success", "message": "Tags saved successfully"}
+    report = create_user_tags(db, current_user.userid, tags)
+    if report is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not save tags",
+        )
+    return {"status": "success", "message": "Tags saved successfully", **report}
 
-@app.post("/api/events")
+@app.post("/api/events", dependencies=[query_budget(7)])
 def create_event(
     event: EventCreate,
     current_user: models.Users = Depends(get_current_user),
@@ -91,18 +137,83 @@ def create_event(
 ):
     return create_event_core(event, current_user, db)
 
-@app.get("/api/clubs/{club_id}/events")
-def get_events_for_club(
+@app.get("/api/clubs/{club_id}/events", response_class=FastJSONResponse, dependencies=[query_budget(2)])
+async def get_events_for_club(
+    club_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_async_db),
+):
+    # 304 straight from the club's content version, events are not read
+    club = await get_club_or_404_async(club_id, db)
+    etag = club_feed_etag("events", club, limit, cursor)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    body = await list_events_for_club_core_async(club_id, db, limit, cursor, club=club)
+    return FastJSONResponse(body, headers={"ETag": etag})
+
+# ?from=&to= returns only events overlapping that window, ?club_ids=1,2,3
+# restricts to those clubs
+@app.get("/api/events", response_class=FastJSONResponse, dependencies=[query_budget(2)])
+async def get_all_events(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    window_from: datetime | None = Query(None, alias="from"),
+    window_to: datetime | None = Query(None, alias="to"),
+    club_ids: str | None = None,
+    db: AsyncSession = Depends(get_read_async_db),
+):
+    if window_from is None and window_to is None and not club_ids:
+        return FastJSONResponse(await list_all_events_core_async(db, limit, cursor))
+
+    try:
+        ids = [int(part) for part in club_ids.split(",") if part.strip()] if club_ids else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="club_ids must be a comma-separated list of ids",
+        )
+    return FastJSONResponse(
+        await list_events_in_window_core_async(db, window_from, window_to, ids, limit, cursor)
+    )
+
+# Streaming export for club admins: kind is events, posts or members,
+# format is ndjson (default) or csv. See exports.py.
+@app.get("/api/clubs/{club_id}/export/{kind}", dependencies=[query_budget(5)])
+def export_club_data(
     club_id: int,
+    kind: str,
+    format: str = "ndjson",
+    current_user: models.Users = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    return list_events_for_club_core(club_id, db)
+    from exports import EXPORT_FORMATS, EXPORT_KINDS, export_filename, stream_club_export
+    from queries import check_admin_status
+    if kind not in EXPORT_KINDS or format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"kind must be one of {', '.join(EXPORT_KINDS)} and format one of {', '.join(EXPORT_FORMATS)}",
+        )
+    if db.query(models.Clubs.clubid).filter(models.Clubs.clubid == club_id).first() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Club not found",
+        )
+    if not check_admin_status(db, current_user.userid, club_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only club admins can export club data",
+        )
 
-@app.get("/api/events")
-def get_all_events(db: Session = Depends(get_db)):
-    return list_all_events_core(db)
+    return StreamingResponse(
+        stream_club_export(club_id, kind, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(club_id, kind, format)}"'},
+    )
 
-@app.post("/api/posts")
+@app.post("/api/posts", dependencies=[query_budget(8)])
 def create_post(
     post: PostCreate,
     current_user: models.Users = Depends(get_current_user),
@@ -110,23 +221,107 @@ def create_post(
 ):
     return create_post_core(post, current_user, db)
 
-@app.get("/api/clubs/{club_id}/posts")
-def get_posts_for_club(
+@app.get("/api/clubs/{club_id}/posts", response_class=FastJSONResponse, dependencies=[query_budget(2)])
+async def get_posts_for_club(
+    club_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_async_db),
+):
+    # 304 straight from the club's content version, posts are not read
+    club = await get_club_or_404_async(club_id, db)
+    etag = club_feed_etag("posts", club, limit, cursor)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    body = await list_posts_for_club_core_async(club_id, db, limit, cursor, club=club)
+    return FastJSONResponse(body, headers={"ETag": etag})
+
+# One page of a club's members plus the follower/admin counts
+@app.get("/api/clubs/{club_id}/followers", response_class=FastJSONResponse, dependencies=[query_budget(2)])
+def get_club_followers(
+    club_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+):
+    return FastJSONResponse(list_club_followers_core(club_id, db, limit, cursor))
+
+# Partner clubs: mutual follows and two-hop suggestions from the club graph
+@app.get("/api/clubs/{club_id}/network", response_class=FastJSONResponse, dependencies=[query_budget(3)])
+def get_club_network(
     club_id: int,
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    return FastJSONResponse(get_club_network_core(club_id, db, limit))
+
+# ?by=followers (followed by the most clubs) or ?by=following
+@app.get("/api/clubs/rankings", response_class=FastJSONResponse, dependencies=[query_budget(2)])
+def get_club_rankings(
+    by: str = "followers",
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    return FastJSONResponse(list_club_rankings_core(db, by, limit))
+
+@app.get("/api/feed", response_class=FastJSONResponse, dependencies=[query_budget(6)])
+def get_home_feed(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    current_user: models.Users = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    return list_posts_for_club_core(club_id, db)
+    return FastJSONResponse(get_home_feed_core(current_user, db, limit, cursor))
+
+@app.get("/api/search", response_class=FastJSONResponse, dependencies=[query_budget(5)])
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: str | None = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    return FastJSONResponse(search_core(q, db, type, limit))
+
+@app.get("/api/recommended_clubs", dependencies=[query_budget(4)])
+async def get_recommended_clubs_for_user(
+    scoring: str = "count",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: models.Users = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await list_recommended_clubs_core_async(current_user, db, scoring, limit)
+
+@app.on_event("shutdown")
+def stop_password_pool():
+    from passwords import shutdown_pool
+    shutdown_pool()
+
+@app.on_event("shutdown")
+async def flush_messages():
+    from messaging import message_writer
+    await message_writer.flush()
 
 # --- Health Checks ---
-@app.get("/")
+@app.get("/", dependencies=[query_budget(0)])
 def read_root():
     return {"status": "online", "message": "Clubr Backend API is running (With C++ Encryption)"}
 
-@app.get("/health")
+@app.get("/health", dependencies=[query_budget(0)])
 def health_check():
     return {"status": "online", "message": "Healthy"}
 
-@app.put("/api/events/{event_id}")
+@app.get("/metrics", dependencies=[query_budget(0)])
+def metrics():
+    return Response(content=render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/api/cache/stats", dependencies=[query_budget(0)])
+def cache_stats():
+    from cache import feed_cache
+    return {"status": "success", "feed_cache": feed_cache.stats()}
+
+@app.put("/api/events/{event_id}", dependencies=[query_budget(7)])
 def update_event(
     event_id: int,
     event: EventUpdate,
@@ -136,7 +331,7 @@ def update_event(
     return update_event_core(event_id, event, current_user, db)
 
 
-@app.delete("/api/events/{event_id}")
+@app.delete("/api/events/{event_id}", dependencies=[query_budget(4)])
 def delete_event(
     event_id: int,
     current_user: models.Users = Depends(get_current_user),
@@ -144,7 +339,7 @@ def delete_event(
 ):
     return delete_event_core(event_id, current_user, db)
 
-@app.put("/api/posts/{post_id}")
+@app.put("/api/posts/{post_id}", dependencies=[query_budget(7)])
 def update_post(
     post_id: int,
     post: PostUpdate,
@@ -154,10 +349,74 @@ def update_post(
     return update_post_core(post_id, post, current_user, db)
 
 
-@app.delete("/api/posts/{post_id}")
+@app.delete("/api/posts/{post_id}", dependencies=[query_budget(4)])
 def delete_post(
     post_id: int,
     current_user: models.Users = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     return delete_post_core(post_id, current_user, db)
+
+# --- Messaging ---
+
+@app.post("/api/conversations", dependencies=[query_budget(3)])
+def start_conversation(
+    conversation: ConversationCreate,
+    current_user: models.Users = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    from queries import get_or_create_conversation
+    if conversation.user_id == current_user.userid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot start a conversation with yourself",
+        )
+    if db.query(models.Users.userid).filter(models.Users.userid == conversation.user_id).first() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+
+    result = get_or_create_conversation(db, current_user.userid, conversation.user_id)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not start conversation",
+        )
+    return {"status": "success", "conversation_id": result.conversationid}
+
+@app.get("/api/conversations", response_class=FastJSONResponse, dependencies=[query_budget(2)])
+def get_conversations(
+    current_user: models.Users = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    return FastJSONResponse(list_conversations_core(current_user, db))
+
+@app.post("/api/conversations/{conversation_id}/read", dependencies=[query_budget(2)])
+def read_conversation(
+    conversation_id: int,
+    current_user: models.Users = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    return mark_conversation_read_core(conversation_id, current_user, db)
+
+def _user_for_socket(token: str):
+    db = SessionLocal()
+    try:
+        return get_user_from_token(token, db)
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+# Browsers cannot set headers on a WebSocket, so the JWT comes in ?token=
+@app.websocket("/ws/messages")
+async def messages_socket(websocket: WebSocket, token: str = Query(...)):
+    from messaging import handle_message_socket
+    user = await run_in_threadpool(_user_for_socket, token)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    await handle_message_socket(websocket, user)
@@ -1,9 +1,9 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from cache import TTLCache
 from database import get_db
 from models import Users
 
@@ -12,8 +12,15 @@ SECRET_KEY = "your-secret-key-keep-it-secret"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Resolved users are cached by user id so most authenticated requests
+# skip the users lookup entirely. Entries expire well before the token does.
+USER_CACHE_SIZE = 4096
+USER_CACHE_TTL_SECONDS = 300
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/login")
 
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -21,24 +28,68 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    # jose loads every crypto backend on import, keep that off the cold start
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Subject (email) of a valid token, or None. No DB lookup.
+def token_subject(token: str) -> str | None:
+    from jose import JWTError, jwt
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+# Copy the fields routes need into a session-free Users object, so the cached
+# value never touches a closed session (and never carries the password hash)
+def _snapshot_user(user: Users) -> Users:
+    return Users(
+        userid=user.userid,
+        email=user.email,
+        name=user.name,
+        profiledescription=user.profiledescription,
+    )
+
+# Drop a cached user, call this whenever a user row changes
+def invalidate_cached_user(user_id: int):
+    user_cache.delete(user_id)
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return get_user_from_token(token, db)
+
+# Resolve a bearer token to a user (also used by the WebSocket routes)
+# Raises HTTPException 401 if the token or user is not valid
+def get_user_from_token(token: str, db: Session):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
+        user_id: int | None = payload.get("uid")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(Users).filter(Users.email == email).first()
-    if user is None:
+
+    # Fast path: token carries the user id and the user is cached
+    if user_id is not None:
+        cached = user_cache.get(user_id)
+        if cached is not None and cached.email == email:
+            return cached
+
+    # Older tokens only carry the email
+    if user_id is not None:
+        user = db.query(Users).filter(Users.userid == user_id).first()
+    else:
+        user = db.query(Users).filter(Users.email == email).first()
+    if user is None or user.email != email:
         raise credentials_exception
-    return user
+
+    principal = _snapshot_user(user)
+    user_cache.set(principal.userid, principal)
+    return principal
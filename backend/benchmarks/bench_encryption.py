@@ -0,0 +1,54 @@
+# Throughput comparison: encrypt_password per item vs encrypt_passwords_batch
+# Run from backend/:  python -m benchmarks.bench_encryption [count]
+import random
+import string
+import sys
+import time
+
+from cpp_bridge import encrypt_password, encrypt_passwords_batch
+
+
+def make_passwords(count: int, seed: int = 42) -> list[str]:
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits
+    return ["".join(rng.choices(alphabet, k=rng.randint(8, 32))) for _ in range(count)]
+
+
+def bench_single(passwords: list[str]) -> float:
+    start = time.perf_counter()
+    for password in passwords:
+        encrypt_password(password)
+    return time.perf_counter() - start
+
+
+def bench_batch(passwords: list[str]) -> float:
+    start = time.perf_counter()
+    encrypt_passwords_batch(passwords)
+    return time.perf_counter() - start
+
+
+def run(count: int = 100_000) -> dict:
+    passwords = make_passwords(count)
+
+    # Both paths must agree before timing them
+    sample = passwords[:100]
+    if encrypt_passwords_batch(sample) != [encrypt_password(p) for p in sample]:
+        raise RuntimeError("Batch digests do not match single-call digests")
+
+    single = bench_single(passwords)
+    batch = bench_batch(passwords)
+    return {
+        "count": count,
+        "single_per_sec": count / single,
+        "batch_per_sec": count / batch,
+        "speedup": single / batch,
+    }
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    result = run(count)
+    print(f"\n Hashed {result['count']} passwords")
+    print(f"  single call: {result['single_per_sec']:,.0f} hashes/s")
+    print(f"  batch call:  {result['batch_per_sec']:,.0f} hashes/s")
+    print(f"  speedup:     {result['speedup']:.2f}x\n")
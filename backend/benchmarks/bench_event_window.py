@@ -0,0 +1,97 @@
+# Latency of a one-week window query as the events table grows: the plain
+# overlap filter (start <= to AND end >= from) vs the duration-class filter
+# used by GET /api/events?from=&to=, plus the in-memory interval tree.
+# Uses an on-disk SQLite file in a temp dir, so no DATABASE_URL is needed.
+# Run from backend/:  python -m benchmarks.bench_event_window [rows ...]
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="clubr-window-"), "events.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+
+from sqlalchemy import and_, delete, insert, select
+
+from benchmarks.sqlite_db import make_sqlite_session
+from core_logic import EVENT_COLUMNS, _event_window_filter
+from intervals import IntervalTree
+from models import Clubs, Events
+
+# Durations seen in practice: mostly a couple of hours, a few multi-day
+DURATIONS_HOURS = [1] * 50 + [2] * 30 + [3] * 15 + [48] * 4 + [24 * 30]
+YEARS = 5
+
+
+def seed(db, rows: int, rng: random.Random, origin: datetime):
+    db.execute(delete(Events))
+    batch = []
+    for i in range(1, rows + 1):
+        start = origin + timedelta(minutes=rng.randrange(YEARS * 365 * 24 * 60))
+        batch.append({
+            "eventid": i,
+            "clubid": 1,
+            "title": f"Event {i}",
+            "description": "",
+            "startdatetime": start,
+            "enddatetime": start + timedelta(hours=rng.choice(DURATIONS_HOURS)),
+            "location": "",
+        })
+        if len(batch) == 10_000:
+            db.execute(insert(Events), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Events), batch)
+    db.commit()
+
+
+def best_of(fn, repeat: int = 20) -> tuple[float, int]:
+    best, count = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(fn())
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, count
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 400_000]
+    db = make_sqlite_session(os.environ["DATABASE_URL"], tables=[Clubs.__table__, Events.__table__])
+    db.add(Clubs(clubid=1, clubname="Bench Club", description=""))
+    db.commit()
+
+    rng = random.Random(1)
+    origin = datetime(2022, 1, 1)
+    window_from = origin + timedelta(days=YEARS * 365 // 2)
+    window_to = window_from + timedelta(days=7)
+
+    print(f"\n{'rows':>8} {'matches':>8} {'plain ms':>9} {'classes ms':>11} {'tree ms':>8}")
+    for rows in sizes:
+        seed(db, rows, rng, origin)
+
+        def plain():
+            return db.execute(select(*EVENT_COLUMNS).where(and_(
+                Events.startdatetime <= window_to, Events.enddatetime >= window_from,
+            ))).all()
+
+        def classes():
+            return db.execute(select(*EVENT_COLUMNS).where(_event_window_filter(window_from, window_to))).all()
+
+        # The tree holds a 90-day hot range around the window
+        hot_rows = db.execute(select(*EVENT_COLUMNS).where(
+            _event_window_filter(window_from - timedelta(days=30), window_to + timedelta(days=60))
+        )).all()
+        tree = IntervalTree((row.startdatetime, row.enddatetime, row) for row in hot_rows)
+
+        plain_ms, matches = best_of(plain)
+        classes_ms, class_matches = best_of(classes)
+        tree_ms, tree_matches = best_of(lambda: tree.overlapping(window_from, window_to))
+        assert matches == class_matches == tree_matches
+        print(f"{rows:>8} {matches:>8} {plain_ms:>9.2f} {classes_ms:>11.2f} {tree_ms:>8.3f}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
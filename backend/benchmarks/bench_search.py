@@ -0,0 +1,92 @@
+# Query latency and build time for the BM25 search index (search.py) on a
+# synthetic corpus with a Zipf-like word distribution. No database needed.
+# Run from backend/:  python -m benchmarks.bench_search [documents]
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from search import SearchIndex
+
+VOCABULARY_SIZE = 50_000
+QUERIES = 500
+
+
+def make_vocabulary(rng: random.Random) -> list[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(3, 10))))
+    # Shuffled so a word's frequency has nothing to do with its spelling
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+
+# Rank-based weights, so a few words are very common and most are rare
+def zipf_cum_weights(n: int) -> list[float]:
+    return list(itertools.accumulate(1.0 / (rank + 1) for rank in range(n)))
+
+
+def make_corpus(rng: random.Random, vocabulary: list[str], documents: int):
+    cum_weights = zipf_cum_weights(len(vocabulary))
+
+    def text(n):
+        return " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=n))
+
+    n_clubs = max(1, documents // 100)
+    n_events = documents // 3
+    n_posts = documents - n_clubs - n_events
+    return (
+        ("club", [(i, text(3), text(30)) for i in range(1, n_clubs + 1)]),
+        ("post", [(i, text(6), text(60)) for i in range(1, n_posts + 1)]),
+        ("event", [(i, text(5), text(40), text(2)) for i in range(1, n_events + 1)]),
+    )
+
+
+def main():
+    documents = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng)
+
+    start = time.perf_counter()
+    corpus = make_corpus(rng, vocabulary, documents)
+    print(f"\n generated {documents} documents in {time.perf_counter() - start:.1f}s")
+
+    index = SearchIndex(ttl=float("inf"))
+    start = time.perf_counter()
+    index._load_rows(corpus, index._epoch)
+    print(f" built index in {time.perf_counter() - start:.1f}s "
+          f"({len(index.postings)} terms)")
+
+    # Queries of 1-3 words drawn from the same distribution, the last one
+    # truncated half the time so prefix expansion is exercised too
+    cum_weights = zipf_cum_weights(len(vocabulary))
+    queries = []
+    for _ in range(QUERIES):
+        words = rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(1, 3))
+        if rng.random() < 0.5:
+            words[-1] = words[-1][:max(2, len(words[-1]) // 2)]
+        queries.append(" ".join(words))
+
+    # The first pass also sorts each long posting list it touches
+    for label, prefix in (("exact", False), ("prefix", True), ("exact", False), ("prefix", True)):
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, limit=20, prefix=prefix)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        print(f" {label:6s} p50 {timings[len(timings) // 2]:.2f} ms"
+              f"  p95 {timings[int(len(timings) * 0.95)]:.2f} ms"
+              f"  p99 {timings[int(len(timings) * 0.99)]:.2f} ms"
+              f"  mean {statistics.fmean(timings):.2f} ms")
+    print()
+
+
+if __name__ == "__main__":
+    main()
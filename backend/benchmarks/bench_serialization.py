@@ -0,0 +1,93 @@
+# Rows/s for the event list endpoint body: ORM objects + jsonable_encoder
+# (before) vs column tuples + _event_rows_to_dicts + FastJSONResponse (after).
+# Uses an in-memory SQLite database, so no DATABASE_URL is needed.
+# Run from backend/:  python -m benchmarks.bench_serialization [rows]
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.encoders import jsonable_encoder
+
+from app import FastJSONResponse
+from benchmarks.sqlite_db import make_sqlite_session
+from core_logic import EVENT_COLUMNS, _event_rows_to_dicts, _event_to_dict
+from models import Clubs, Events
+
+
+def make_session(rows: int):
+    db = make_sqlite_session(tables=[Clubs.__table__, Events.__table__])
+
+    db.add(Clubs(clubid=1, clubname="Bench Club", description="Benchmark club"))
+    start = datetime(2025, 1, 1, 18, 30)
+    db.add_all(
+        Events(
+            eventid=i,
+            clubid=1,
+            title=f"Event {i}",
+            description="Weekly meeting " * 4,
+            startdatetime=start + timedelta(hours=i),
+            enddatetime=start + timedelta(hours=i + 2),
+            location="Stauffer Library",
+        )
+        for i in range(1, rows + 1)
+    )
+    db.commit()
+    return db
+
+
+def before(db) -> bytes:
+    club = db.query(Clubs).filter(Clubs.clubid == 1).first()
+    events = db.query(Events).order_by(Events.startdatetime, Events.eventid).all()
+    body = {"status": "success", "events": [_event_to_dict(e, club) for e in events]}
+    return json.dumps(jsonable_encoder(body)).encode("utf-8")
+
+
+def after(db) -> bytes:
+    club_name = db.query(Clubs.clubname).filter(Clubs.clubid == 1).scalar()
+    rows = db.query(*EVENT_COLUMNS).order_by(Events.startdatetime, Events.eventid).all()
+    body = {"status": "success", "events": _event_rows_to_dicts(rows, club_name)}
+    return FastJSONResponse(body).body
+
+
+def time_it(fn, db, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        # Start each run with an empty identity map, like a fresh request
+        db.expunge_all()
+        start = time.perf_counter()
+        fn(db)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(rows: int = 20_000) -> dict:
+    db = make_session(rows)
+    try:
+        # Both paths must produce the same document
+        if json.loads(before(db)) != json.loads(after(db)):
+            raise RuntimeError("Row serialiser output differs from _event_to_dict")
+
+        old = time_it(before, db)
+        new = time_it(after, db)
+    finally:
+        db.close()
+
+    return {
+        "rows": rows,
+        "before_rows_per_sec": rows / old,
+        "after_rows_per_sec": rows / new,
+        "speedup": old / new,
+    }
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    result = run(rows)
+    print(f"\n Serialised {result['rows']} events")
+    print(f"  before: {result['before_rows_per_sec']:,.0f} rows/s")
+    print(f"  after:  {result['after_rows_per_sec']:,.0f} rows/s")
+    print(f"  speedup: {result['speedup']:.2f}x\n")
@@ -0,0 +1,215 @@
+# Query budget check for every route in app.py: calls each one once
+# against a seeded SQLite database with QUERY_BUDGET_MODE=strict and
+# reports the queries it ran next to the budget it declares. Fails when
+# a route has no budget, goes over it (strict mode answers 500), or has no
+# request listed below, so an N+1 regression or a new unchecked route
+# turns the run red.
+# Caches are cleared before every call, so counts are the cold path.
+# A route may list several requests, each optionally with a setup function
+# run just before it (its name is shown next to the route).
+# Run from backend/:  python -m benchmarks.check_query_budgets
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="clubr-budgets-"), "budgets.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["QUERY_BUDGET_MODE"] = "strict"
+os.environ.setdefault("PASSWORD_HASH_ITERATIONS", "1000")
+
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert
+
+from app import app
+from auth import create_access_token, user_cache
+from benchmarks.sqlite_db import make_sqlite_session
+from cache import feed_cache
+from club_graph import club_graph
+from database import async_engine, engine
+from metrics import _most_repeated, route_query_budget
+from search import LOAD_THREAD_NAME, search_index
+from models import (
+    ClubMembership, ClubTags, ClubToClubMembership, Clubs, ConversationReadState, Conversations, Events, Posts, Tags, UserTags, Users,
+)
+from timelines import timeline_store
+
+# Enough rows per relation that one query per row would blow any budget
+ROWS = 40
+USER_ID = 1
+
+
+# /api/search before the index is built answers from SQL, after it from memory
+def search_index_building():
+    search_index.reset()
+
+
+def search_index_built():
+    search_index.ensure_loading()
+    search_index.wait_loaded()
+
+
+def seed():
+    db = make_sqlite_session(os.environ["DATABASE_URL"])
+    now = datetime.utcnow().replace(microsecond=0)
+    db.execute(insert(Users), [
+        {"userid": i, "email": f"budget{i}@clubr.test", "password": "-", "name": f"Budget {i}"}
+        for i in range(1, ROWS + 1)
+    ])
+    db.execute(insert(Tags), [{"tagid": i, "tagname": f"tag {i}"} for i in range(1, 11)])
+    db.execute(insert(Clubs), [
+        {"clubid": i, "clubname": f"Club {i}", "description": "jazz and chess"} for i in range(1, ROWS + 1)
+    ])
+    db.execute(insert(ClubTags), [
+        {"clubid": club_id, "tagid": tag_id}
+        for club_id in range(1, ROWS + 1) for tag_id in sorted({1, 2, club_id % 10 + 1})
+    ])
+    db.execute(insert(UserTags), [{"userid": USER_ID, "tagid": tag_id} for tag_id in range(1, 6)])
+    db.execute(insert(ClubMembership), [
+        {"userid": USER_ID, "clubid": i, "role": "Admin" if i == 1 else "Follower"} for i in range(1, ROWS + 1)
+    ])
+    db.execute(insert(ClubToClubMembership), [
+        {"club1id": i, "club2id": j} for i in range(1, ROWS + 1) for j in (i % ROWS + 1, (i + 1) % ROWS + 1)
+    ])
+    db.execute(insert(Events), [
+        {"eventid": i, "clubid": 1 + i % 3, "title": f"Jazz night {i}", "description": "jazz",
+         "startdatetime": now + timedelta(hours=i), "enddatetime": now + timedelta(hours=i + 2), "location": "Hall"}
+        for i in range(1, ROWS + 1)
+    ])
+    db.execute(insert(Posts), [
+        {"postid": i, "clubid": 1 + i % 3, "title": f"Chess update {i}", "content": "chess",
+         "timestamp": now - timedelta(hours=i)}
+        for i in range(1, ROWS + 1)
+    ])
+    db.execute(insert(Conversations), [
+        {"conversationid": i, "user1id": USER_ID, "user2id": i + 1} for i in range(1, ROWS)
+    ])
+    db.execute(insert(ConversationReadState), [
+        {"userid": user_id, "conversationid": i, "unreadcount": 1, "lastmessagecontent": "hi",
+         "lastmessagesenderid": i + 1, "lastmessagetime": now - timedelta(minutes=i)}
+        for i in range(1, ROWS) for user_id in (USER_ID, i + 1)
+    ])
+    db.commit()
+    db.close()
+    return now
+
+
+def requests_by_route(now: datetime) -> dict:
+    """
+    (method, route path) -> (path, keyword arguments for TestClient.request),
+    or a list of those for routes with more than one query path.
+    """
+    window = {"from": now.isoformat(), "to": (now + timedelta(days=2)).isoformat()}
+    event_body = {
+        "club_id": 1, "title": "New event", "description": "d", "location": "Hall",
+        "start_datetime": (now + timedelta(days=1)).isoformat(), "end_datetime": (now + timedelta(days=1, hours=2)).isoformat(),
+    }
+    return {
+        ("POST", "/api/signup"): ("/api/signup", {"json": {"name": "New", "email": "new@clubr.test", "password": "pw"}}),
+        ("POST", "/api/login"): ("/api/login", {"json": {"email": "new@clubr.test", "password": "pw"}}),
+        ("POST", "/api/save_tags"): ("/api/save_tags", {"json": [f"tag {i}" for i in range(1, 11)]}),
+        ("POST", "/api/events"): ("/api/events", {"json": event_body}),
+        ("GET", "/api/clubs/{club_id}/events"): ("/api/clubs/1/events", {}),
+        ("GET", "/api/events"): [("/api/events", {}), ("/api/events", {"params": window})],
+        ("GET", "/api/clubs/{club_id}/export/{kind}"): ("/api/clubs/1/export/events", {}),
+        ("POST", "/api/posts"): ("/api/posts", {"json": {"club_id": 1, "title": "New post", "content": "c"}}),
+        ("GET", "/api/clubs/{club_id}/posts"): ("/api/clubs/1/posts", {}),
+        ("GET", "/api/clubs/{club_id}/followers"): ("/api/clubs/1/followers", {"params": {"limit": 10}}),
+        ("GET", "/api/clubs/{club_id}/network"): ("/api/clubs/1/network", {}),
+        ("GET", "/api/clubs/rankings"): ("/api/clubs/rankings", {"params": {"by": "following"}}),
+        ("GET", "/api/feed"): ("/api/feed", {}),
+        ("GET", "/api/search"): [
+            ("/api/search", {"params": {"q": "jazz"}}, search_index_building),
+            ("/api/search", {"params": {"q": "jazz"}}, search_index_built),
+        ],
+        ("GET", "/api/recommended_clubs"): ("/api/recommended_clubs", {}),
+        ("GET", "/"): ("/", {}),
+        ("GET", "/health"): ("/health", {}),
+        ("GET", "/metrics"): ("/metrics", {}),
+        ("GET", "/api/cache/stats"): ("/api/cache/stats", {}),
+        ("PUT", "/api/events/{event_id}"): ("/api/events/1", {"json": {"title": "Renamed"}}),
+        ("DELETE", "/api/events/{event_id}"): ("/api/events/3", {}),
+        ("PUT", "/api/posts/{post_id}"): ("/api/posts/3", {"json": {"title": "Renamed"}}),
+        ("DELETE", "/api/posts/{post_id}"): ("/api/posts/6", {}),
+        ("POST", "/api/conversations"): ("/api/conversations", {"json": {"user_id": ROWS}}),
+        ("GET", "/api/conversations"): ("/api/conversations", {}),
+        ("POST", "/api/conversations/{conversation_id}/read"): ("/api/conversations/1/read", {}),
+    }
+
+
+def main():
+    now = seed()
+    headers = {"Authorization": "Bearer " + create_access_token({"sub": f"budget{USER_ID}@clubr.test", "uid": USER_ID})}
+
+    counted = [0]
+    statements = []
+
+    def count_query(conn, cursor, statement, *_):
+        # The background search index build belongs to no request
+        if threading.current_thread().name == LOAD_THREAD_NAME:
+            return
+        counted[0] += 1
+        statements.append(statement)
+
+    for target in (engine, async_engine.sync_engine if async_engine is not None else None):
+        if target is not None:
+            event.listen(target, "after_cursor_execute", count_query)
+
+    requests = requests_by_route(now)
+    failures = []
+    print(f"\n {'route':<52} {'queries':>7} {'budget':>6}")
+    # Server errors come back as responses, as a real client would see them
+    with TestClient(app, raise_server_exceptions=False) as client:
+        for route in app.routes:
+            if not isinstance(route, APIRoute):
+                continue
+            for method in sorted(route.methods):
+                name = f"{method} {route.path}"
+                budget = route_query_budget(route)
+                request = requests.get((method, route.path))
+                if request is None:
+                    failures.append(f"{name}: no request listed in check_query_budgets.py")
+                    continue
+                if budget is None:
+                    failures.append(f"{name}: no query_budget() declared")
+
+                for path, kwargs, *setup in request if isinstance(request, list) else [request]:
+                    label = f"{name}?{'&'.join(kwargs['params'])}" if kwargs.get("params") else name
+                    if setup:
+                        label = f"{label} ({setup[0].__name__})"
+
+                    # Cold path: no cached user, feed page, timeline or club graph
+                    user_cache.clear()
+                    club_graph.reset()
+                    feed_cache.backend.clear()
+                    timeline_store.invalidate_user(USER_ID)
+                    if setup:
+                        setup[0]()
+
+                    counted[0] = 0
+                    statements.clear()
+                    response = client.request(method, path, headers=headers, **kwargs)
+                    response.read()
+                    if budget is not None and counted[0] > budget:
+                        failures.append(
+                            f"{label} ran {counted[0]} queries, budget is {budget} "
+                            f"(status {response.status_code}). Most repeated:\n{_most_repeated(statements)}"
+                        )
+                        print(f"  {label:<52} {counted[0]:>7} {budget:>6}  OVER")
+                        continue
+                    if response.status_code >= 400:
+                        failures.append(f"{label}: returned {response.status_code} {response.text[:200]}")
+                    print(f"  {label:<52} {counted[0]:>7} {budget if budget is not None else '-':>6}")
+
+    if failures:
+        print("\n FAILED")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\n Every route is within its query budget\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Cold-start profile of the serverless entry point (api/index.py). Each run
+# starts a fresh interpreter, imports the Mangum handler, sends it one
+# request and exits. Reports the median of:
+#   process: interpreter start to first response, as seen from outside
+#   import:  importing api.index
+#   first:   the first request through the handler (lazy init lands here)
+# followed by the import time grouped by top-level package and the
+# slowest app modules, from one extra run under -X importtime.
+# Uses an empty SQLite schema in a temp dir.
+# Run from backend/:  python -m benchmarks.cold_start [--runs 7] [--path /api/events]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APP_MODULES = {
+    "api", "app", "auth", "cache", "club_graph", "config", "core_logic", "cpp_bridge", "database", "exports",
+    "importer", "intervals", "messaging", "metrics", "models", "passwords", "queries", "recommendations",
+    "replicas", "search", "timelines",
+}
+
+# Runs in the child interpreter; prints one JSON line on stdout
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from api.index import handler
+imported = time.perf_counter()
+path, _, query = sys.argv[1].partition("?")
+event = {
+    "version": "2.0", "routeKey": "$default", "rawPath": path, "rawQueryString": query,
+    "headers": {"host": "localhost", "accept": "application/json"},
+    "requestContext": {
+        "http": {"method": "GET", "path": path, "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1", "userAgent": "cold-start"},
+        "stage": "$default", "requestId": "cold-start", "accountId": "-", "apiId": "-",
+        "domainName": "localhost", "domainPrefix": "localhost", "time": "", "timeEpoch": 0,
+    },
+    "isBase64Encoded": False,
+}
+response = handler(event, None)
+done = time.perf_counter()
+print(json.dumps({
+    "status": response["statusCode"],
+    "import_ms": (imported - start) * 1000,
+    "first_ms": (done - imported) * 1000,
+}))
+"""
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """(module, self us, cumulative us) for every line of -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|", 1).split("|"))
+        rows.append((name, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def run_once(path: str, env: dict, importtime: bool = False) -> dict:
+    flags = ["-X", "importtime"] if importtime else []
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, *flags, "-c", CHILD, path],
+        capture_output=True, text=True, env=env, cwd=BACKEND_DIR,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        sys.exit(f"Child failed ({proc.returncode}):\n{proc.stderr[-2000:]}")
+    result = json.loads(lines[-1])
+    result["process_ms"] = wall_ms
+    result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the serverless cold start.")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--path", default="/api/events", help="path of the first request")
+    parser.add_argument("--top", type=int, default=12, help="rows in each breakdown")
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix="clubr-cold-")
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(db_dir, 'cold.db')}"}
+    # Schema only, created out of process so the children start cold
+    subprocess.run(
+        [sys.executable, "-c", "import os; from benchmarks.sqlite_db import make_sqlite_session; "
+                               "make_sqlite_session(os.environ['DATABASE_URL']).close()"],
+        check=True, env=env, cwd=BACKEND_DIR,
+    )
+
+    runs = [run_once(args.path, env) for _ in range(args.runs)]
+    median = lambda key: statistics.median(run[key] for run in runs)
+
+    print(f"\n Cold start, GET {args.path} (status {runs[0]['status']}), median of {args.runs} runs")
+    print(f"  process start -> first response {median('process_ms'):8.1f} ms")
+    print(f"  import api.index                {median('import_ms'):8.1f} ms")
+    print(f"  first request                   {median('first_ms'):8.1f} ms")
+
+    # Self time per top-level package
+    typical = run_once(args.path, env, importtime=True)
+    by_package: dict[str, int] = {}
+    for name, self_us, _ in typical["imports"]:
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    total = sum(by_package.values())
+    print(f"\n Import self time by package ({total / 1000:.1f} ms total, includes -X importtime overhead)")
+    for package, self_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        marker = "  (app)" if package in APP_MODULES else ""
+        print(f"  {package:<28} {self_us / 1000:8.1f} ms{marker}")
+
+    print("\n App modules, cumulative (includes what they import first)")
+    app_rows = [(name, cumulative) for name, _, cumulative in typical["imports"] if name.split(".")[0] in APP_MODULES]
+    for name, cumulative in sorted(app_rows, key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {name:<28} {cumulative / 1000:8.1f} ms")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# Local load test for /ws/messages: opens thousands of sockets against an
+# in-process uvicorn server backed by a temporary SQLite database, sends
+# messages between conversation pairs and reports delivery latency.
+# Needs uvicorn and websockets installed.
+# Run from backend/:  python -m benchmarks.load_messaging [--sockets 2000] [--messages 20]
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import tempfile
+import threading
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="clubr-load-"), "load.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+# Keep every message for the persistence check at the end
+os.environ.setdefault("MESSAGE_SOCKET_QUEUE_SIZE", "4096")
+
+import uvicorn
+import websockets
+from sqlalchemy import insert
+
+from app import app
+from auth import create_access_token
+from database import SessionLocal
+from benchmarks.sqlite_db import make_sqlite_session
+from models import Conversations, Messages, Users
+
+
+def raise_fd_limit():
+    # Each socket needs a descriptor on both the client and the server side
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def seed(pairs: int):
+    """
+    Users 1..2*pairs, conversation i between users 2i-1 and 2i.
+    Returns [(conversation_id, token_a, token_b), ...].
+    """
+    db = make_sqlite_session(os.environ["DATABASE_URL"])
+    users = [
+        {"userid": i, "email": f"load{i}@clubr.test", "password": "-", "name": f"Load {i}"}
+        for i in range(1, 2 * pairs + 1)
+    ]
+    conversations = [
+        {"conversationid": i, "user1id": 2 * i - 1, "user2id": 2 * i}
+        for i in range(1, pairs + 1)
+    ]
+    db.execute(insert(Users), users)
+    db.execute(insert(Conversations), conversations)
+    db.commit()
+    db.close()
+
+    def token(user_id):
+        return create_access_token({"sub": f"load{user_id}@clubr.test", "uid": user_id})
+
+    return [(c["conversationid"], token(c["user1id"]), token(c["user2id"])) for c in conversations]
+
+
+def start_server(port: int) -> uvicorn.Server:
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", ws="websockets")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run_pair(url, conversation_id, token_a, token_b, messages, latencies, connect_sem):
+    async with connect_sem:
+        sender = await websockets.connect(f"{url}?token={token_a}", max_queue=None)
+        receiver = await websockets.connect(f"{url}?token={token_b}", max_queue=None)
+        # Wait until both sides are subscribed before sending
+        await sender.recv()
+        await receiver.recv()
+
+    async def receive():
+        for _ in range(messages):
+            data = json.loads(await receiver.recv())
+            latencies.append(time.perf_counter() - float(data["content"]))
+
+    async def drain_echo():
+        # The sender is subscribed too and gets its own messages back
+        for _ in range(messages):
+            await sender.recv()
+
+    async def send():
+        for _ in range(messages):
+            await sender.send(json.dumps({
+                "conversation_id": conversation_id,
+                "content": repr(time.perf_counter()),
+            }))
+            await asyncio.sleep(0.01)
+
+    try:
+        await asyncio.gather(receive(), drain_echo(), send())
+    finally:
+        await sender.close()
+        await receiver.close()
+
+
+async def run_clients(port, seeded, messages, connect_concurrency):
+    url = f"ws://127.0.0.1:{port}/ws/messages"
+    latencies: list[float] = []
+    connect_sem = asyncio.Semaphore(connect_concurrency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_pair(url, conversation_id, token_a, token_b, messages, latencies, connect_sem)
+        for conversation_id, token_a, token_b in seeded
+    ))
+    return latencies, time.perf_counter() - start
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sockets", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=20, help="messages sent per conversation")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    raise_fd_limit()
+    pairs = max(1, args.sockets // 2)
+    seeded = seed(pairs)
+    server = start_server(args.port)
+
+    latencies, elapsed = asyncio.run(
+        run_clients(args.port, seeded, args.messages, args.connect_concurrency)
+    )
+
+    # Let the batched writer catch up before counting rows
+    time.sleep(1)
+    db = SessionLocal()
+    persisted = db.query(Messages).count()
+    db.close()
+    server.should_exit = True
+
+    latencies.sort()
+    total = pairs * args.messages
+    print(f"\n {pairs * 2} sockets, {total} messages in {elapsed:.1f}s")
+    print(f"  delivered: {len(latencies)}, persisted: {persisted}")
+    print(f"  latency ms: p50 {percentile(latencies, 50) * 1000:.2f}"
+          f"  p95 {percentile(latencies, 95) * 1000:.2f}"
+          f"  p99 {percentile(latencies, 99) * 1000:.2f}"
+          f"  max {latencies[-1] * 1000:.2f}"
+          f"  mean {statistics.fmean(latencies) * 1000:.2f}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Local SQLite stand-in for the PostgreSQL schema, used by the benchmarks
+from sqlalchemy import create_engine, event, func, select, text
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+import models  # noqa: F401  (registers every table on Base.metadata)
+
+
+def _serial_columns(tables):
+    """
+    Columns PostgreSQL fills from a sequence but SQLite cannot: integer
+    autoincrement columns that are part of a composite primary key.
+    """
+    for table in tables:
+        if len(table.primary_key.columns) > 1:
+            for column in table.primary_key.columns:
+                if column.autoincrement is True:
+                    yield table, column
+
+
+def _fill_serial_on_flush(column):
+    def before_insert(mapper, connection, target):
+        if getattr(target, column.key) is None:
+            next_id = connection.execute(select(func.max(column))).scalar() or 0
+            setattr(target, column.key, next_id + 1)
+    return before_insert
+
+
+_patched_mappers = set()
+
+
+def make_sqlite_session(url: str = "sqlite://", tables=None):
+    """
+    Create the schema on a fresh SQLite database and return a Session.
+
+    SQLite cannot autoincrement a column that is part of a composite primary
+    key (events, posts, messages, ...). For those columns the stand-in
+    creates them nullable, fills them after Core inserts with a trigger, and
+    fills them before ORM inserts with a mapper hook, so code that inserts
+    without ids behaves as it does on PostgreSQL.
+    """
+    engine = create_engine(url)
+    tables = tables or list(Base.metadata.sorted_tables)
+    serial = list(_serial_columns(tables))
+
+    for _, column in serial:
+        column.autoincrement = False
+        column.nullable = True
+    try:
+        Base.metadata.create_all(engine, tables=tables)
+    finally:
+        for _, column in serial:
+            column.autoincrement = True
+            column.nullable = False
+
+    with engine.begin() as connection:
+        for table, column in serial:
+            connection.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {table.name}_{column.name}_serial "
+                f"AFTER INSERT ON {table.name} WHEN NEW.{column.name} IS NULL "
+                f"BEGIN UPDATE {table.name} SET {column.name} = "
+                f"(SELECT IFNULL(MAX({column.name}), 0) + 1 FROM {table.name}) "
+                f"WHERE rowid = NEW.rowid; END"
+            ))
+
+    for mapper in Base.registry.mappers:
+        for table, column in serial:
+            if mapper.local_table is table and mapper not in _patched_mappers:
+                event.listen(mapper, "before_insert", _fill_serial_on_flush(column))
+                _patched_mappers.add(mapper)
+
+    return sessionmaker(bind=engine, autoflush=False)()
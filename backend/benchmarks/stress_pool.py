@@ -0,0 +1,190 @@
+# Connection-pool stress test for the DB_POOL_MODE / DB_PRE_PING settings.
+# Simulates a burst-and-idle serverless workload: --instances separate
+# engines (one per app instance), each hammered by --concurrency threads in
+# --bursts bursts with --idle seconds of quiet in between. For every mode it
+# reports connections opened, peak connections open at once, pings, and
+# p50/p99 latency of a checkout + query + checkin.
+#
+# On SQLite (the default, a temp file) connecting and round trips cost
+# almost nothing, so --connect-ms and --rtt-ms add a simulated TCP/TLS
+# handshake and network round trip to every connect, query and ping. Point
+# --database-url at a PostgreSQL database to measure the real thing (set
+# --connect-ms 0 --rtt-ms 0); it then also samples pg_stat_activity for the
+# peak number of server-side connections.
+#
+# Run from backend/:
+#   python -m benchmarks.stress_pool [--instances 8] [--concurrency 4] [--bursts 4] [--idle 1.0]
+#   DB_POOL_SIZE=2 DB_MAX_OVERFLOW=2 python -m benchmarks.stress_pool --database-url postgresql://...
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="clubr-pool-"), "pool.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+
+from sqlalchemy import create_engine, event, text
+
+from database import make_engine
+
+# (DB_POOL_MODE, DB_PRE_PING) pairs compared by default
+MODES = [("queue", "always"), ("queue", "idle"), ("queue", "off"), ("null", "off")]
+
+
+class Counters:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connects = 0
+        self.open = 0
+        self.peak_open = 0
+        self.pings = 0
+
+    def opened(self):
+        with self.lock:
+            self.connects += 1
+            self.open += 1
+            self.peak_open = max(self.peak_open, self.open)
+
+    def closed(self):
+        with self.lock:
+            self.open -= 1
+
+    def pinged(self):
+        with self.lock:
+            self.pings += 1
+
+
+def instrument(engine, counters: Counters, connect_s: float, rtt_s: float):
+    def on_connect(dbapi_connection, connection_record):
+        time.sleep(connect_s)
+        counters.opened()
+
+    def on_close(dbapi_connection, connection_record):
+        counters.closed()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(rtt_s)
+
+    event.listen(engine, "connect", on_connect)
+    event.listen(engine, "close", on_close)
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+
+    # Count pings from both pool_pre_ping and the idle pre-ping hook
+    do_ping = engine.dialect.do_ping
+
+    def counting_ping(dbapi_connection):
+        counters.pinged()
+        time.sleep(rtt_s)
+        return do_ping(dbapi_connection)
+
+    engine.dialect.do_ping = counting_ping
+
+
+def server_connection_sampler(url: str, stop: threading.Event, peak: list):
+    """Peak connections to this database as PostgreSQL sees them (minus the sampler's own)."""
+    monitor = create_engine(url)
+    with monitor.connect() as conn:
+        while not stop.is_set():
+            count = conn.execute(text(
+                "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()"
+            )).scalar() - 1
+            peak[0] = max(peak[0], count)
+            time.sleep(0.02)
+    monitor.dispose()
+
+
+def run_mode(url: str, pool_mode: str, pre_ping: str, args) -> dict:
+    counters = Counters()
+    engines = [
+        make_engine(url, pool_mode=pool_mode, pre_ping=pre_ping, idle_seconds=args.idle / 2)
+        for _ in range(args.instances)
+    ]
+    for engine in engines:
+        instrument(engine, counters, args.connect_ms / 1000, args.rtt_ms / 1000)
+
+    server_peak = [0]
+    stop = threading.Event()
+    sampler = None
+    if url.startswith("postgres"):
+        sampler = threading.Thread(target=server_connection_sampler, args=(url, stop, server_peak), daemon=True)
+        sampler.start()
+
+    latencies: list[float] = []
+    latencies_lock = threading.Lock()
+
+    def worker(engine):
+        mine = []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1")).scalar()
+            mine.append(time.perf_counter() - start)
+        with latencies_lock:
+            latencies.extend(mine)
+
+    started = time.perf_counter()
+    for burst in range(args.bursts):
+        if burst:
+            time.sleep(args.idle)
+        threads = [
+            threading.Thread(target=worker, args=(engine,))
+            for engine in engines for _ in range(args.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    if sampler:
+        sampler.join()
+    for engine in engines:
+        engine.dispose()
+
+    latencies.sort()
+    return {
+        "mode": f"{pool_mode}/{pre_ping}",
+        "connects": counters.connects,
+        "peak_open": counters.peak_open,
+        "server_peak": server_peak[0] if sampler else None,
+        "pings": counters.pings,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "elapsed_s": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare connection pool modes under bursty load.")
+    parser.add_argument("--database-url", default=os.environ["DATABASE_URL"])
+    parser.add_argument("--instances", type=int, default=8, help="engines, one per simulated app instance")
+    parser.add_argument("--concurrency", type=int, default=4, help="threads per instance during a burst")
+    parser.add_argument("--requests", type=int, default=25, help="requests per thread per burst")
+    parser.add_argument("--bursts", type=int, default=4)
+    parser.add_argument("--idle", type=float, default=1.0, help="seconds between bursts")
+    parser.add_argument("--connect-ms", type=float, default=20.0, help="simulated connection setup")
+    parser.add_argument("--rtt-ms", type=float, default=1.0, help="simulated round trip per query and ping")
+    parser.add_argument("--modes", help="comma-separated pool/pre_ping pairs, e.g. queue/idle,null/off")
+    args = parser.parse_args()
+
+    modes = [tuple(mode.split("/")) for mode in args.modes.split(",")] if args.modes else MODES
+    total = args.instances * args.concurrency * args.requests * args.bursts
+    print(f"\n {args.instances} instances x {args.concurrency} threads, {args.bursts} bursts of "
+          f"{args.requests} requests, {args.idle}s idle, {total} requests per mode")
+    print(f"  simulated connect {args.connect_ms} ms, round trip {args.rtt_ms} ms\n")
+    print(f"  {'mode':<14} {'connects':>8} {'peak open':>9} {'server':>6} {'pings':>6} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for pool_mode, pre_ping in modes:
+        result = run_mode(args.database_url, pool_mode, pre_ping, args)
+        server = "-" if result["server_peak"] is None else result["server_peak"]
+        print(f"  {result['mode']:<14} {result['connects']:>8} {result['peak_open']:>9} {server:>6} "
+              f"{result['pings']:>6} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['max_ms']:>8.2f}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
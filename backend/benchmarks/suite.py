@@ -0,0 +1,393 @@
+# Microbenchmarks for the backend hot paths at several data sizes:
+# password hashing, the event/post serialisers, get_recommended_clubs,
+# create_user_tags, and every list endpoint through a TestClient. Results
+# go to a JSON file so two commits can be compared:
+#   python -m benchmarks.suite --sizes 100,1000,10000 --output after.json --baseline before.json
+# Uses a SQLite file in a temp dir by default. --database-url points it at
+# an empty throwaway PostgreSQL database instead; the tables are created
+# and dropped again by the suite, and it refuses to run if they exist.
+# Run from backend/.
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the backend microbenchmarks and write JSON results.")
+    parser.add_argument("--sizes", default="100,1000,10000", help="comma-separated event/post counts to seed")
+    parser.add_argument("--repeat", type=int, default=7, help="timed runs per benchmark")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--database-url", help="empty PostgreSQL database to use instead of SQLite")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="median slowdown vs the baseline reported as a regression (0.10 = 10%%)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if anything regressed")
+    return parser.parse_args(argv)
+
+
+# config refuses to import without a DATABASE_URL. main() points settings
+# at the real database before the (lazily created) engines first connect.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, func, insert, inspect, select
+from sqlalchemy.orm import aliased
+
+import cpp_bridge
+import queries
+from app import app
+from auth import create_access_token, user_cache
+from benchmarks.sqlite_db import make_sqlite_session
+from cache import feed_cache
+from club_graph import club_graph
+from core_logic import (
+    EVENT_COLUMNS, POST_COLUMNS, _event_rows_to_dicts, _event_to_dict, _post_rows_to_dicts, _post_to_dict,
+)
+from config import settings
+from database import Base, SessionLocal, get_engine
+from intervals import upcoming_events
+from models import (
+    ClubMembership, ClubTags, ClubToClubMembership, Clubs, ConversationReadState, Conversations, Events, Posts, Tags, UserTags, Users,
+)
+from recommendations import SCORING_MODES, club_tag_index
+from search import search_index
+from timelines import timeline_store
+
+TAG_COUNT = 200
+BENCH_USER_ID = 1
+TAGGING_USER_ID = 2
+WORDS = ("chess robotics jazz hiking debate film poetry climbing coding startup "
+         "volunteer soccer photography anime baking theatre choir rowing").split()
+
+
+# ---------- Timing ----------
+
+def measure(fn, repeat: int, setup=None, warmup: int = 1) -> dict:
+    """
+    Call fn() warmup + repeat times and return its timings in ms.
+    setup(), if given, runs before every call and is not timed.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "min_ms": min(samples),
+        "median_ms": statistics.median(samples),
+        "mean_ms": statistics.fmean(samples),
+        "runs": repeat,
+    }
+
+
+# ---------- Data ----------
+
+def reset_schema():
+    engine = get_engine()
+    Base.metadata.drop_all(engine)
+    if engine.dialect.name == "sqlite":
+        make_sqlite_session(settings.DATABASE_URL).close()
+    else:
+        Base.metadata.create_all(engine)
+
+
+def seed(size: int, rng: random.Random) -> dict:
+    """
+    size events and size posts over size // 20 clubs, a quarter of them in
+    club 1. User 1 follows up to 50 clubs, has 8 tags and size // 10
+    conversations. Every club follows 8 other clubs. Ids are explicit so reruns see the same data.
+    """
+    clubs = max(20, size // 20)
+    users = max(50, size // 20)
+    now = datetime.utcnow().replace(microsecond=0)
+
+    def text(words: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(words))
+
+    def club_for(i: int) -> int:
+        return 1 if i % 4 == 0 else rng.randint(1, clubs)
+
+    tag_names = [f"{rng.choice(WORDS)} {i}" for i in range(1, TAG_COUNT + 1)]
+    events = []
+    for i in range(1, size + 1):
+        start = now + timedelta(minutes=rng.randrange(-30 * 24 * 60, 120 * 24 * 60))
+        events.append({
+            "eventid": i, "clubid": club_for(i), "title": text(4), "description": text(20),
+            "startdatetime": start, "enddatetime": start + timedelta(hours=rng.choice((1, 2, 3, 48))),
+            "location": "Stauffer Library",
+        })
+    posts = [
+        {"postid": i, "clubid": club_for(i), "title": text(5), "content": text(40),
+         "timestamp": now - timedelta(minutes=rng.randrange(90 * 24 * 60))}
+        for i in range(1, size + 1)
+    ]
+    conversations = min(users - 1, max(1, size // 10))
+
+    db = SessionLocal()
+    try:
+        db.execute(insert(Users), [
+            {"userid": i, "email": f"bench{i}@clubr.test", "password": "-", "name": f"Bench {i}"}
+            for i in range(1, users + 1)
+        ])
+        db.execute(insert(Tags), [{"tagid": i, "tagname": name} for i, name in enumerate(tag_names, 1)])
+        db.execute(insert(Clubs), [
+            {"clubid": i, "clubname": f"Club {i}", "description": text(15)} for i in range(1, clubs + 1)
+        ])
+        db.execute(insert(ClubTags), [
+            {"clubid": club_id, "tagid": tag_id}
+            for club_id in range(1, clubs + 1)
+            for tag_id in rng.sample(range(1, TAG_COUNT + 1), 4)
+        ])
+        db.execute(insert(ClubToClubMembership), [
+            {"club1id": club_id, "club2id": other}
+            for club_id in range(1, clubs + 1)
+            for other in rng.sample([c for c in range(1, clubs + 1) if c != club_id], 8)
+        ])
+        db.execute(insert(UserTags), [
+            {"userid": BENCH_USER_ID, "tagid": tag_id} for tag_id in rng.sample(range(1, TAG_COUNT + 1), 8)
+        ])
+        db.execute(insert(ClubMembership), [
+            {"userid": BENCH_USER_ID, "clubid": club_id, "role": "Admin" if club_id == 1 else "Follower"}
+            for club_id in range(1, min(clubs, 50) + 1)
+        ])
+        db.execute(insert(Events), events)
+        db.execute(insert(Posts), posts)
+        db.execute(insert(Conversations), [
+            {"conversationid": i, "user1id": BENCH_USER_ID, "user2id": i + 1} for i in range(1, conversations + 1)
+        ])
+        db.execute(insert(ConversationReadState), [
+            {"userid": user_id, "conversationid": i, "unreadcount": 1, "lastmessagecontent": text(8),
+             "lastmessagesenderid": i + 1, "lastmessagetime": now - timedelta(minutes=i)}
+            for i in range(1, conversations + 1)
+            for user_id in (BENCH_USER_ID, i + 1)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    # Nothing cached from the previous size may survive
+    feed_cache.backend.clear()
+    user_cache.clear()
+    search_index.reset()
+    club_tag_index.reset()
+    club_graph.reset()
+    upcoming_events.invalidate()
+    timeline_store.invalidate_user(BENCH_USER_ID)
+
+    return {"clubs": clubs, "users": users, "conversations": conversations, "tag_names": tag_names, "now": now}
+
+
+# ---------- Benchmarks ----------
+
+def bench_encryption(size: int, repeat: int) -> dict:
+    passwords = [f"password-{i}" for i in range(size)]
+    return measure(lambda: [cpp_bridge.encrypt_password(p) for p in passwords], repeat)
+
+
+def bench_serialisers(size: int, repeat: int) -> dict:
+    db = SessionLocal()
+    try:
+        clubs = {club.clubid: club for club in db.query(Clubs).all()}
+        events = db.query(Events).all()
+        posts = db.query(Posts).all()
+        event_rows = db.query(*EVENT_COLUMNS).all()
+        post_rows = db.query(*POST_COLUMNS).all()
+        names = {club_id: club.clubname for club_id, club in clubs.items()}
+        return {
+            "serialise._event_to_dict": measure(lambda: [_event_to_dict(e, clubs[e.clubid]) for e in events], repeat),
+            "serialise._post_to_dict": measure(lambda: [_post_to_dict(p, clubs[p.clubid]) for p in posts], repeat),
+            "serialise._event_rows_to_dicts": measure(lambda: _event_rows_to_dicts(event_rows, club_names=names), repeat),
+            "serialise._post_rows_to_dicts": measure(lambda: _post_rows_to_dicts(post_rows, club_names=names), repeat),
+        }
+    finally:
+        db.close()
+
+
+def bench_queries(data: dict, repeat: int) -> dict:
+    results = {}
+    db = SessionLocal()
+    try:
+        # The club-tag index is loaded on the first call and kept warm after
+        for scoring in SCORING_MODES:
+            results[f"queries.get_recommended_clubs[{scoring}]"] = measure(
+                lambda: queries.get_recommended_clubs(db, BENCH_USER_ID, scoring, 20), repeat,
+            )
+
+        # Club network from the in-memory graph, next to the same two-hop
+        # suggestion as a SQL self-join
+        results["club_graph.suggest"] = measure(lambda: club_graph.suggest(db, 1, 10), repeat)
+        results["club_graph.mutual_follows"] = measure(lambda: club_graph.mutual_follows(db, 1), repeat)
+        results["club_graph.top_by_degree[in]"] = measure(lambda: club_graph.top_by_degree(db, "in", 10), repeat)
+        partner, candidate = aliased(ClubToClubMembership), aliased(ClubToClubMembership)
+        already = select(ClubToClubMembership.club2id).where(ClubToClubMembership.club1id == 1)
+        two_hop_sql = (
+            select(candidate.club2id, func.count().label("partners"))
+            .join(partner, partner.club2id == candidate.club1id)
+            .where(partner.club1id == 1, candidate.club2id != 1, candidate.club2id.not_in(already))
+            .group_by(candidate.club2id)
+            .order_by(func.count().desc(), candidate.club2id)
+            .limit(10)
+        )
+        results["sql.two_hop_club_suggestions"] = measure(lambda: db.execute(two_hop_sql).all(), repeat)
+
+        # Ten existing tags assigned to a user who has none, as on signup
+        tags = data["tag_names"][:10]
+
+        def clear_user_tags():
+            db.execute(delete(UserTags).where(UserTags.userid == TAGGING_USER_ID))
+            db.commit()
+
+        results["queries.create_user_tags"] = measure(
+            lambda: queries.create_user_tags(db, TAGGING_USER_ID, tags), repeat, setup=clear_user_tags,
+        )
+    finally:
+        db.close()
+    return results
+
+
+def bench_endpoints(client: TestClient, data: dict, repeat: int) -> dict:
+    now = data["now"]
+    week = lambda start: {"from": start.isoformat(), "to": (start + timedelta(days=7)).isoformat()}
+    # Served from the upcoming-events interval tree and from the DB respectively
+    hot_window = week(now)
+    cold_window = week(now + timedelta(days=90))
+
+    # name: (path, params, setup run before every call)
+    uncached = feed_cache.backend.clear
+    endpoints = {
+        "GET /api/events": ("/api/events", {"limit": 50}, uncached),
+        "GET /api/events?from&to (hot)": ("/api/events", {**hot_window, "limit": 50}, None),
+        "GET /api/events?from&to (cold)": ("/api/events", {**cold_window, "limit": 50}, None),
+        "GET /api/events?club_ids": ("/api/events", {"club_ids": "1,2,3", "limit": 50}, None),
+        "GET /api/clubs/{id}/events": ("/api/clubs/1/events", {"limit": 50}, uncached),
+        "GET /api/clubs/{id}/posts": ("/api/clubs/1/posts", {"limit": 50}, uncached),
+        "GET /api/feed": ("/api/feed", {"limit": 50}, lambda: timeline_store.invalidate_user(BENCH_USER_ID)),
+        "GET /api/feed (warm timeline)": ("/api/feed", {"limit": 50}, None),
+        "GET /api/recommended_clubs": ("/api/recommended_clubs", {"limit": 20}, None),
+        # The warm-up call starts the background index build, wait for it
+        "GET /api/search": ("/api/search", {"q": "jazz hik", "limit": 20}, search_index.wait_loaded),
+        "GET /api/clubs/{id}/network": ("/api/clubs/1/network", {}, None),
+        "GET /api/conversations": ("/api/conversations", {}, None),
+    }
+    headers = {"Authorization": "Bearer " + create_access_token(
+        {"sub": f"bench{BENCH_USER_ID}@clubr.test", "uid": BENCH_USER_ID}
+    )}
+
+    results = {}
+    for name, (path, params, setup) in endpoints.items():
+        response = client.get(path, params=params, headers=headers)
+        if response.status_code != 200:
+            raise RuntimeError(f"{name} returned {response.status_code}: {response.text[:200]}")
+        results[name] = measure(lambda: client.get(path, params=params, headers=headers), repeat, setup=setup)
+    return results
+
+
+def run_size(size: int, repeat: int, client: TestClient) -> dict:
+    reset_schema()
+    data = seed(size, random.Random(size))
+    results = {"cpp_bridge.encrypt_password": bench_encryption(size, repeat)}
+    results.update(bench_serialisers(size, repeat))
+    results.update(bench_queries(data, repeat))
+    results.update(bench_endpoints(client, data, repeat))
+    return results
+
+
+# ---------- Results ----------
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Print median ratios against the baseline and return the regressed keys."""
+    regressions = []
+    print(f"\n vs {baseline['meta'].get('commit') or 'baseline'} (median, >{threshold:.0%} slower flagged)")
+    for size, benches in current["results"].items():
+        old_benches = baseline["results"].get(size, {})
+        for name, timing in benches.items():
+            old = old_benches.get(name)
+            if not old or not old["median_ms"]:
+                continue
+            ratio = timing["median_ms"] / old["median_ms"]
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{size}:{name}")
+            print(f"  {size:>7} {name:<42} {old['median_ms']:9.3f} -> {timing['median_ms']:9.3f} ms  {ratio:5.2f}x{flag}")
+    return regressions
+
+
+def main():
+    args = _parse_args()
+    sizes = [int(part) for part in args.sizes.split(",") if part.strip()]
+    if args.database_url:
+        settings.DATABASE_URL = args.database_url
+    else:
+        db_dir = tempfile.mkdtemp(prefix="clubr-suite-")
+        settings.DATABASE_URL = f"sqlite:///{os.path.join(db_dir, 'suite.db')}"
+    engine = get_engine()
+
+    if engine.dialect.name != "sqlite":
+        existing = inspect(engine).get_table_names()
+        if existing:
+            sys.exit(f"Refusing to run: {engine.url.render_as_string()} already has tables ({', '.join(existing[:5])})")
+
+    results = {}
+    try:
+        with TestClient(app) as client:
+            for size in sizes:
+                start = time.perf_counter()
+                timings = run_size(size, args.repeat, client)
+                results[str(size)] = timings
+                print(f"\n size {size} ({time.perf_counter() - start:.1f}s)")
+                for name, timing in timings.items():
+                    print(f"  {name:<42} median {timing['median_ms']:9.3f} ms  min {timing['min_ms']:9.3f} ms")
+    finally:
+        if engine.dialect.name != "sqlite":
+            Base.metadata.drop_all(engine)
+
+    document = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "dialect": engine.dialect.name,
+            "native_encryption": cpp_bridge.get_library() is not None,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    print(f"\n Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(json.load(f), document, args.threshold)
+        print(f"\n {len(regressions)} regression(s)\n")
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
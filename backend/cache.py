@@ -0,0 +1,217 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from config import settings
+
+# ------------ Small in-process caches ------------
+
+class CacheBackend(ABC):
+    """
+    Interface for the storage behind FeedCache.
+
+    Keys are tuples whose first item is a namespace string, so a backend can
+    drop a whole namespace at once (e.g. every cached page of one club's feed).
+    TTLCache below is the in-process default; a shared backend (Redis, ...)
+    only needs to implement these methods.
+    """
+
+    @abstractmethod
+    def get(self, key, default=None):
+        ...
+
+    @abstractmethod
+    def set(self, key, value):
+        ...
+
+    @abstractmethod
+    def delete(self, key):
+        ...
+
+    @abstractmethod
+    def delete_namespace(self, namespace: str):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+class TTLCache(CacheBackend):
+    """
+    Size-bounded LRU cache whose entries also expire after ttl seconds.
+
+    Safe to share between the threadpool workers that run sync routes.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._namespaces: dict = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # Keep the namespace -> keys index in step with _data (lock held)
+    def _forget(self, key):
+        if isinstance(key, tuple) and key:
+            keys = self._namespaces.get(key[0])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._namespaces[key[0]]
+
+    # Return the cached value, or default if missing or expired
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self._forget(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            # Mark as most recently used
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    # Store a value, evicting the least recently used entry when full
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            if isinstance(key, tuple) and key:
+                self._namespaces.setdefault(key[0], set()).add(key)
+            while len(self._data) > self.maxsize:
+                old_key, _ = self._data.popitem(last=False)
+                self._forget(old_key)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self._forget(key)
+
+    def delete_namespace(self, namespace: str):
+        with self._lock:
+            for key in self._namespaces.pop(namespace, ()):
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._namespaces.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+
+# ------------ Read-through cache for club feeds ------------
+
+class FeedCache:
+    """
+    Read-through cache in front of the feed listings in core_logic.py.
+
+    Entries are stored under (namespace, page key). Writers call
+    invalidate(namespace) after committing, which drops every cached page of
+    that namespace. Each namespace also has a generation number so a load
+    that started before an invalidation does not write its stale result back.
+
+    With read replicas, a load shortly after an invalidation may still see
+    the old rows, so for settle_seconds after one nothing is stored for
+    that namespace (loads are served, just not cached).
+    """
+
+    def __init__(self, backend: CacheBackend, settle_seconds: float = 0.0):
+        self.backend = backend
+        self.settle_seconds = settle_seconds
+        self._generations: dict[str, int] = {}
+        self._invalidated_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def set_backend(self, backend: CacheBackend):
+        self.backend = backend
+
+    def _store(self, namespace: str, page_key, generation: int, value):
+        with self._lock:
+            if self._generations.get(namespace, 0) != generation:
+                return
+            if self.settle_seconds and time.monotonic() - self._invalidated_at.get(namespace, float("-inf")) < self.settle_seconds:
+                return
+            self.backend.set((namespace, page_key), value)
+
+    def get_or_load(self, namespace: str, page_key, loader):
+        value = self.backend.get((namespace, page_key))
+        if value is not None:
+            return value
+
+        generation = self._generations.get(namespace, 0)
+        value = loader()
+        self._store(namespace, page_key, generation, value)
+        return value
+
+    async def get_or_load_async(self, namespace: str, page_key, loader):
+        value = self.backend.get((namespace, page_key))
+        if value is not None:
+            return value
+
+        generation = self._generations.get(namespace, 0)
+        value = await loader()
+        self._store(namespace, page_key, generation, value)
+        return value
+
+    def generation(self, namespace: str) -> int:
+        """
+        Changes on every invalidate(namespace), so it can stand in for a
+        content version in page keys without asking the DB.
+        """
+        return self._generations.get(namespace, 0)
+
+    def invalidate(self, *namespaces: str):
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+                self._invalidated_at[namespace] = time.monotonic()
+                self.backend.delete_namespace(namespace)
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+
+# Namespaces used by the feed listings and their writers
+ALL_EVENTS_NAMESPACE = "events:all"
+
+def club_feed_namespace(club_id: int, kind: str) -> str:
+    return f"club:{club_id}:{kind}"
+
+# Shared feed cache for this process
+feed_cache = FeedCache(
+    TTLCache(maxsize=settings.FEED_CACHE_SIZE, ttl=settings.FEED_CACHE_TTL_SECONDS),
+    settle_seconds=settings.REPLICA_MAX_LAG_SECONDS if settings.DATABASE_REPLICA_URLS else 0.0,
+)
@@ -0,0 +1,321 @@
+import bisect
+import heapq
+import threading
+import time
+from array import array
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from config import settings
+from models import ClubToClubMembership
+
+# ------------ In-process club collaboration graph ------------
+
+# Degree rankings: "in" ranks by clubs following a club, "out" by clubs it follows
+DEGREE_DIRECTIONS = ("in", "out")
+
+# Pending edge changes kept on top of the CSR arrays before they are rebuilt
+MIN_PENDING_EDGES = 256
+
+
+class _CSR:
+    """
+    Compressed sparse rows: the neighbours of node i are
+    targets[offsets[i]:offsets[i + 1]], sorted. Nodes added after the
+    arrays were built have no row (no neighbours in the base graph).
+    """
+
+    __slots__ = ("offsets", "targets")
+
+    def __init__(self, n_nodes: int, edges):
+        counts = [0] * (n_nodes + 1)
+        for source, _ in edges:
+            counts[source + 1] += 1
+        for i in range(n_nodes):
+            counts[i + 1] += counts[i]
+        self.offsets = array("l", counts)
+
+        targets = array("l", [0]) * counts[-1]
+        fill = counts[:-1]
+        for source, target in sorted(edges):
+            targets[fill[source]] = target
+            fill[source] += 1
+        self.targets = targets
+
+    def row(self, node: int):
+        if node + 1 >= len(self.offsets):
+            return ()
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def contains(self, node: int, target: int) -> bool:
+        if node + 1 >= len(self.offsets):
+            return False
+        hi = self.offsets[node + 1]
+        i = bisect.bisect_left(self.targets, target, self.offsets[node], hi)
+        return i < hi and self.targets[i] == target
+
+
+class ClubGraph:
+    """
+    Directed club -> club follow graph from the clubtoclubmembership table.
+
+    Clubs are mapped to dense node numbers and both directions (follows and
+    followed-by) are stored as CSR arrays, so a neighbour list is one slice
+    of a flat integer array. Loaded on first use and again once ttl seconds
+    have passed (for follows made through other instances); in between,
+    follow_club_as_club / unfollow_club_as_club in queries.py apply each
+    change as a pending edit on top of the arrays, and the arrays are
+    rebuilt once the pending edits pass an eighth of the graph. A load that
+    overlaps a follow may miss it, so it answers that call but is reloaded
+    on the next one. Degrees are kept exact at all times.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # None until the first load; -inf marks a load that must be redone
+        self._loaded_at: float | None = None
+        # Bumped by every edge change, to spot changes that overlap a load
+        self._generation = 0
+        self._clear()
+
+    def _clear(self):
+        self._node_of: dict[int, int] = {}
+        self._club_of: list[int] = []
+        self._out = _CSR(0, [])
+        self._in = _CSR(0, [])
+        self._n_edges = 0
+        self._out_degree = array("l")
+        self._in_degree = array("l")
+        self._reset_pending()
+
+    # Edits since the last rebuild, per node and direction (lock held)
+    def _reset_pending(self):
+        self._pending = 0
+        self._added_out: dict[int, set[int]] = {}
+        self._added_in: dict[int, set[int]] = {}
+        self._removed_out: dict[int, set[int]] = {}
+        self._removed_in: dict[int, set[int]] = {}
+
+    def _fresh(self) -> bool:
+        loaded_at = self._loaded_at
+        return loaded_at is not None and time.monotonic() - loaded_at <= self.ttl
+
+    # Load every (club1id, club2id) pair in a single query
+    def _ensure_loaded(self, db: Session):
+        if self._fresh():
+            return
+        generation = self._generation
+        self._load_rows(db.query(ClubToClubMembership.club1id, ClubToClubMembership.club2id).all(), generation)
+
+    # Same as _ensure_loaded, for an AsyncSession
+    async def ensure_loaded_async(self, db):
+        if self._fresh():
+            return
+        generation = self._generation
+        result = await db.execute(select(ClubToClubMembership.club1id, ClubToClubMembership.club2id))
+        self._load_rows(result.all(), generation)
+
+    # generation is self._generation as read before the rows were queried
+    def _load_rows(self, rows, generation: int):
+        with self._lock:
+            # Another caller may have finished loading first
+            if self._fresh():
+                return
+            self._clear()
+            edges = {(self._node(source), self._node(target)) for source, target in rows}
+            self._rebuild(edges)
+            self._loaded_at = time.monotonic() if generation == self._generation else float("-inf")
+
+    # Dense node number for a club, assigned on first sight (lock held)
+    def _node(self, club_id: int) -> int:
+        node = self._node_of.get(club_id)
+        if node is None:
+            node = self._node_of[club_id] = len(self._club_of)
+            self._club_of.append(club_id)
+            self._out_degree.append(0)
+            self._in_degree.append(0)
+        return node
+
+    # Build both CSR arrays from a full edge set (lock held)
+    def _rebuild(self, edges):
+        n_nodes = len(self._club_of)
+        self._out = _CSR(n_nodes, edges)
+        self._in = _CSR(n_nodes, [(target, source) for source, target in edges])
+        self._n_edges = len(edges)
+        self._out_degree = array("l", (len(self._out.row(node)) for node in range(n_nodes)))
+        self._in_degree = array("l", (len(self._in.row(node)) for node in range(n_nodes)))
+        self._reset_pending()
+
+    def _has_edge(self, source: int, target: int) -> bool:
+        if target in self._added_out.get(source, ()):
+            return True
+        if target in self._removed_out.get(source, ()):
+            return False
+        return self._out.contains(source, target)
+
+    @staticmethod
+    def _toggle(add_to: dict, drop_from: dict, node: int, other: int):
+        pending = drop_from.get(node)
+        if pending is not None and other in pending:
+            # Undoes an earlier edit, the base arrays are right again
+            pending.discard(other)
+            if not pending:
+                del drop_from[node]
+        else:
+            add_to.setdefault(node, set()).add(other)
+
+    # Compact the pending edits into new arrays once they grow (lock held)
+    def _maybe_rebuild(self):
+        self._pending += 1
+        if self._pending <= max(MIN_PENDING_EDGES, self._n_edges // 8):
+            return
+        edges = {
+            (source, target)
+            for source in range(len(self._club_of))
+            for target in self._neighbours(source, outgoing=True)
+        }
+        self._rebuild(edges)
+
+    # Record that club_id1 now follows club_id2
+    def add_edge(self, club_id1: int, club_id2: int):
+        with self._lock:
+            self._generation += 1
+            # Nothing more to do before the first load, the rows will be read from the DB
+            if self._loaded_at is None:
+                return
+            source, target = self._node(club_id1), self._node(club_id2)
+            if self._has_edge(source, target):
+                return
+            self._toggle(self._added_out, self._removed_out, source, target)
+            self._toggle(self._added_in, self._removed_in, target, source)
+            self._n_edges += 1
+            self._out_degree[source] += 1
+            self._in_degree[target] += 1
+            self._maybe_rebuild()
+
+    # Record that club_id1 no longer follows club_id2
+    def remove_edge(self, club_id1: int, club_id2: int):
+        with self._lock:
+            self._generation += 1
+            if self._loaded_at is None:
+                return
+            source, target = self._node_of.get(club_id1), self._node_of.get(club_id2)
+            if source is None or target is None or not self._has_edge(source, target):
+                return
+            self._toggle(self._removed_out, self._added_out, source, target)
+            self._toggle(self._removed_in, self._added_in, target, source)
+            self._n_edges -= 1
+            self._out_degree[source] -= 1
+            self._in_degree[target] -= 1
+            self._maybe_rebuild()
+
+    # Drop everything so the next call reloads from the DB
+    def reset(self):
+        with self._lock:
+            self._clear()
+            self._loaded_at = None
+            self._generation += 1
+
+    # Node numbers adjacent to node in one direction, pending edits applied (lock held)
+    def _neighbours(self, node: int, outgoing: bool) -> list[int]:
+        if outgoing:
+            row, added, removed = self._out.row(node), self._added_out.get(node), self._removed_out.get(node)
+        else:
+            row, added, removed = self._in.row(node), self._added_in.get(node), self._removed_in.get(node)
+        neighbours = [other for other in row if other not in removed] if removed else list(row)
+        if added:
+            neighbours.extend(added)
+        return neighbours
+
+    def _ids(self, nodes) -> list[int]:
+        return sorted(self._club_of[node] for node in nodes)
+
+    def following(self, db: Session | None, club_id: int) -> list[int]:
+        """Clubs that club_id follows, by id."""
+        if db is not None:
+            self._ensure_loaded(db)
+        with self._lock:
+            node = self._node_of.get(club_id)
+            return [] if node is None else self._ids(self._neighbours(node, outgoing=True))
+
+    def followers(self, db: Session | None, club_id: int) -> list[int]:
+        """Clubs that follow club_id, by id."""
+        if db is not None:
+            self._ensure_loaded(db)
+        with self._lock:
+            node = self._node_of.get(club_id)
+            return [] if node is None else self._ids(self._neighbours(node, outgoing=False))
+
+    def is_mutual(self, db: Session | None, club_id1: int, club_id2: int) -> bool:
+        """True when the two clubs follow each other."""
+        if db is not None:
+            self._ensure_loaded(db)
+        with self._lock:
+            a, b = self._node_of.get(club_id1), self._node_of.get(club_id2)
+            return a is not None and b is not None and self._has_edge(a, b) and self._has_edge(b, a)
+
+    def mutual_follows(self, db: Session | None, club_id: int) -> list[int]:
+        """Clubs that club_id follows and that follow it back, by id."""
+        if db is not None:
+            self._ensure_loaded(db)
+        with self._lock:
+            node = self._node_of.get(club_id)
+            if node is None:
+                return []
+            followers = set(self._neighbours(node, outgoing=False))
+            return self._ids(other for other in self._neighbours(node, outgoing=True) if other in followers)
+
+    def suggest(self, db: Session | None, club_id: int, limit: int | None = None) -> list[tuple[int, int]]:
+        """
+        Clubs followed by the clubs club_id follows (two hops away), which
+        club_id does not follow yet.
+
+        Returns (club_id, partners) pairs, where partners is how many of
+        club_id's followed clubs lead there, most first and ties by club id.
+        """
+        if db is not None:
+            self._ensure_loaded(db)
+        with self._lock:
+            node = self._node_of.get(club_id)
+            if node is None:
+                return []
+            partners = self._neighbours(node, outgoing=True)
+            skip = set(partners)
+            skip.add(node)
+            paths: dict[int, int] = {}
+            for partner in partners:
+                for candidate in self._neighbours(partner, outgoing=True):
+                    if candidate not in skip:
+                        paths[candidate] = paths.get(candidate, 0) + 1
+            ranked = [(self._club_of[candidate], count) for candidate, count in paths.items()]
+
+        def rank_key(item):
+            return (item[1], -item[0])
+
+        if limit is not None:
+            return heapq.nlargest(limit, ranked, key=rank_key)
+        return sorted(ranked, key=rank_key, reverse=True)
+
+    def top_by_degree(self, db: Session | None, direction: str = "in", limit: int = 10) -> list[tuple[int, int]]:
+        """
+        (club_id, degree) pairs with the highest in-degree (followed by the
+        most clubs) or out-degree (following the most), ties by club id.
+        Clubs with degree 0 are left out.
+        """
+        if direction not in DEGREE_DIRECTIONS:
+            raise ValueError(f"Unknown degree direction: {direction}")
+        if db is not None:
+            self._ensure_loaded(db)
+        with self._lock:
+            degrees = self._in_degree if direction == "in" else self._out_degree
+            ranked = heapq.nlargest(
+                limit,
+                ((self._club_of[node], degree) for node, degree in enumerate(degrees) if degree),
+                key=lambda item: (item[1], -item[0]),
+            )
+        return ranked
+
+
+# Shared graph for this process
+club_graph = ClubGraph(ttl=settings.CLUB_GRAPH_TTL_SECONDS)
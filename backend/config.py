@@ -11,9 +11,82 @@ class Settings:
     # CORRECT: Ask for the variable named "DATABASE_URL"
     DATABASE_URL: str = os.getenv("DATABASE_URL")
     
+    # Optional read replicas, comma-separated. Read-only routes go to them
+    # round-robin; see replicas.py. REPLICA_MAX_LAG_SECONDS is how long a user
+    # keeps reading from the primary after a write (and how long fresh reads
+    # are kept out of the caches); a replica that fails to connect is skipped
+    # for REPLICA_RETRY_SECONDS.
+    DATABASE_REPLICA_URLS: list[str] = [
+        url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+    REPLICA_RETRY_SECONDS: float = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
     # CORRECT: Ask for the variable named "JWT_SECRET_KEY"
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY")
 
+    # Password hashing cost and the worker pool that runs it
+    # PASSWORD_HASH_WORKERS=0 means one worker per CPU core
+    PASSWORD_HASH_ITERATIONS: int = int(os.getenv("PASSWORD_HASH_ITERATIONS", "600000"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+    # Read-through cache for club event/post feeds (entries, seconds)
+    FEED_CACHE_SIZE: int = int(os.getenv("FEED_CACHE_SIZE", "2048"))
+    FEED_CACHE_TTL_SECONDS: float = float(os.getenv("FEED_CACHE_TTL_SECONDS", "30"))
+
+    # Home timelines: posts kept per user, clubs above this follower count are
+    # merged at read time instead of fanned out, and how many users to keep
+    # for how long (a memory bound only, every read checks a cached timeline
+    # against its clubs' content versions)
+    TIMELINE_MAX_LENGTH: int = int(os.getenv("TIMELINE_MAX_LENGTH", "500"))
+    TIMELINE_FANOUT_MAX_FOLLOWERS: int = int(os.getenv("TIMELINE_FANOUT_MAX_FOLLOWERS", "5000"))
+    TIMELINE_CACHE_USERS: int = int(os.getenv("TIMELINE_CACHE_USERS", "10000"))
+    TIMELINE_TTL_SECONDS: float = float(os.getenv("TIMELINE_TTL_SECONDS", "600"))
+
+    # In-memory interval tree for time-window event queries near today
+    UPCOMING_EVENTS_LOOKBACK_DAYS: int = int(os.getenv("UPCOMING_EVENTS_LOOKBACK_DAYS", "7"))
+    UPCOMING_EVENTS_HORIZON_DAYS: int = int(os.getenv("UPCOMING_EVENTS_HORIZON_DAYS", "60"))
+    UPCOMING_EVENTS_TTL_SECONDS: float = float(os.getenv("UPCOMING_EVENTS_TTL_SECONDS", "300"))
+
+    # In-memory club tag index, club graph and search index are reloaded
+    # from the DB this long after their last load, so writes made through
+    # other instances show up
+    CLUB_TAG_INDEX_TTL_SECONDS: float = float(os.getenv("CLUB_TAG_INDEX_TTL_SECONDS", "300"))
+    CLUB_GRAPH_TTL_SECONDS: float = float(os.getenv("CLUB_GRAPH_TTL_SECONDS", "300"))
+    SEARCH_INDEX_TTL_SECONDS: float = float(os.getenv("SEARCH_INDEX_TTL_SECONDS", "600"))
+
+    # Messaging: rows per batched insert, max wait before a partial batch is
+    # written, and per-socket outgoing queue size
+    MESSAGE_BATCH_SIZE: int = int(os.getenv("MESSAGE_BATCH_SIZE", "200"))
+    MESSAGE_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("MESSAGE_FLUSH_INTERVAL_SECONDS", "0.05"))
+    MESSAGE_SOCKET_QUEUE_SIZE: int = int(os.getenv("MESSAGE_SOCKET_QUEUE_SIZE", "256"))
+    # Retries of a failed message insert (with doubling waits) before the
+    # batch is written row by row and rows that still fail are logged
+    MESSAGE_WRITE_RETRIES: int = int(os.getenv("MESSAGE_WRITE_RETRIES", "3"))
+
+    # Connection pool per app instance. "queue" keeps up to DB_POOL_SIZE idle
+    # connections (+ DB_MAX_OVERFLOW under load); "null" opens a connection per
+    # checkout and closes it after, for use behind PgBouncer / RDS Proxy.
+    # DB_POOL_RECYCLE_SECONDS=-1 keeps connections until they fail.
+    DB_POOL_MODE: str = os.getenv("DB_POOL_MODE", "queue")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "-1"))
+
+    # Liveness check on checkout: "always" (one round trip per checkout),
+    # "idle" (only for connections unused for DB_PRE_PING_IDLE_SECONDS) or "off"
+    DB_PRE_PING: str = os.getenv("DB_PRE_PING", "always")
+    DB_PRE_PING_IDLE_SECONDS: float = float(os.getenv("DB_PRE_PING_IDLE_SECONDS", "30"))
+
+    # Queries slower than this are printed and counted on /metrics
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+    # What to do when a request runs more queries than its route's budget:
+    # "warn" (print and count on /metrics), "strict" (fail the request) or "off"
+    QUERY_BUDGET_MODE: str = os.getenv("QUERY_BUDGET_MODE", "warn")
+
 # Validate that the DB URL exists
 # If you used your previous code, this would have raised the error because 
 # os.getenv() would return None.
@@ -13,9 +13,12 @@ from sqlalchemy.orm import Session
 # USER / AUTH
 from queries import *
 
+from fastapi.concurrency import run_in_threadpool
+
 from auth import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from passwords import DUMMY_HASH, PasswordHasherBusy, hash_password_async, verify_password_async, needs_rehash
 
-def signup_user_core(user: Any, db: Session) -> dict:
+def signup_user_core(user: Any, db: Session, password_hash: str | None = None) -> dict:
     """
     Core signup logic, extracted from app.py:
 
@@ -32,14 +35,12 @@ def signup_user_core(user: Any, db: Session) -> dict:
         user.password,
         user.name,
         getattr(user, "profiledescription", None),
+        password_hash=password_hash,
     )
 
     if new_user is None:
         # Same error behaviour as before
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User already exists or creation failed",
-        )
+        raise _user_exists()
 
     # 2. Optional tags (new bit of logic)
     user_tags = getattr(user, "tags", None)
@@ -49,7 +50,8 @@ def signup_user_core(user: Any, db: Session) -> dict:
     # 3. JWT creation, using the *existing* helper and config
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": new_user.email}, expires_delta=access_token_expires
+        data={"sub": new_user.email, "uid": new_user.userid},
+        expires_delta=access_token_expires,
     )
 
     # 4. Return SAME JSON shape as original app.py signup route
@@ -82,7 +84,82 @@ def login_user_core(user: Any, db: Session) -> dict:
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": valid_user.email}, expires_delta=access_token_expires
+        data={"sub": valid_user.email, "uid": valid_user.userid},
+        expires_delta=access_token_expires,
+    )
+
+    return {
+        "status": "success",
+        "message": "Login successful",
+        "access_token": access_token,
+        "token_type": "bearer",
+    }
+
+def _user_exists() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="User already exists or creation failed",
+    )
+
+
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please try again",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def signup_user_core_async(user: Any, db: Session) -> dict:
+    """
+    Same as signup_user_core, but the password is hashed on the worker pool
+    (passwords.py) and the DB work runs in the threadpool, so a burst of
+    signups does not tie up the event loop or request threads with hashing.
+    A taken email is turned away before the (deliberately slow) hash.
+    """
+    if await run_in_threadpool(get_user_by_email, db, user.email) is not None:
+        raise _user_exists()
+
+    try:
+        password_hash = await hash_password_async(user.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+
+    return await run_in_threadpool(signup_user_core, user, db, password_hash)
+
+
+async def login_user_core_async(user: Any, db: Session) -> dict:
+    """
+    Same as login_user_core, with verification on the worker pool.
+
+    Legacy (unsalted) hashes are upgraded to the current format on a
+    successful login. An unknown email is checked against DUMMY_HASH, so it
+    costs the same hash as a wrong password and fails the same way.
+    """
+    existing_user = await run_in_threadpool(get_user_by_email, db, user.email)
+
+    try:
+        if existing_user is None:
+            await verify_password_async(user.password, DUMMY_HASH)
+            valid = False
+        else:
+            valid = await verify_password_async(user.password, existing_user.password)
+        if valid and needs_rehash(existing_user.password):
+            new_hash = await hash_password_async(user.password)
+            await run_in_threadpool(update_user_password, db, existing_user.userid, new_hash)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+        )
+
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": existing_user.email, "uid": existing_user.userid},
+        expires_delta=access_token_expires,
     )
 
     return {
@@ -94,12 +171,104 @@ def login_user_core(user: Any, db: Session) -> dict:
 
 from datetime import datetime
 from typing import Any
-
+import base64
+import hashlib
+import json
+
+from sqlalchemy import and_, func, literal, or_, select, tuple_, union_all
+from cache import feed_cache, club_feed_namespace, ALL_EVENTS_NAMESPACE
+# search, timelines, club_graph, intervals and recommendations are imported
+# where they are used, so a cold start only pays for the routes it serves
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import models
 from models import Events, Posts, Clubs
 
 
+# ---------- Keyset pagination ----------
+
+# Page sizes for the list endpoints. Pages are cut on (sort key, id) so every
+# page is a single range scan on the composite indexes declared in models.py.
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _clamp_limit(limit: int | None) -> int:
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def _encode_cursor(sort_value: datetime | None, row_id: int) -> str:
+    """
+    Build an opaque cursor token from the last row of a page.
+    """
+    payload = [sort_value.isoformat() if sort_value else None, row_id]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Reverse of _encode_cursor. Raises HTTPException 400 on a bad token.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+def _apply_keyset(query, sort_col, id_col, page_size: int, cursor: str | None, descending: bool = False):
+    """
+    Add the keyset filter, ordering and limit for one page.
+
+    Works on both a Query (sync) and a select() statement (async). One
+    extra row is requested so the caller can tell whether a next page exists.
+    Rows with a NULL sort key have no place in the order and are left out,
+    as in the feed, so a page never ends on a key the cursor cannot carry.
+    """
+    query = query.filter(sort_col.isnot(None))
+    if cursor:
+        sort_value, row_id = _decode_cursor(cursor)
+        key = tuple_(sort_col, id_col)
+        query = query.filter(key < (sort_value, row_id) if descending else key > (sort_value, row_id))
+
+    if descending:
+        query = query.order_by(sort_col.desc(), id_col.desc())
+    else:
+        query = query.order_by(sort_col.asc(), id_col.asc())
+
+    return query.limit(page_size + 1)
+
+
+def _split_page(rows, sort_col, id_col, page_size: int):
+    """
+    Trim the extra row fetched by _apply_keyset and build next_cursor.
+    """
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, _encode_cursor(getattr(last, sort_col.key), getattr(last, id_col.key))
+
+
+def _paginate(query, sort_col, id_col, limit: int | None, cursor: str | None, descending: bool = False):
+    """
+    Apply keyset pagination on (sort_col, id_col) to a query.
+
+    Returns (rows, next_cursor). next_cursor is None on the last page.
+    """
+    page_size = _clamp_limit(limit)
+    rows = _apply_keyset(query, sort_col, id_col, page_size, cursor, descending).all()
+    return _split_page(rows, sort_col, id_col, page_size)
+
+
 # ---------- Helpers to serialise DB models ----------
 
 def _event_to_dict(event: Events, club: Clubs | None = None) -> dict[str, Any]:
@@ -140,6 +309,151 @@ def _post_to_dict(post: Posts, club: Clubs | None = None) -> dict[str, Any]:
     }
 
 
+# ---------- Row serialisers for the list endpoints ----------
+# The list endpoints select only these columns as plain row tuples instead of
+# loading ORM objects, then build the same dict shapes as _event_to_dict /
+# _post_to_dict in one tight loop. Date and time are sliced out of a single
+# isoformat() call rather than formatted separately.
+
+EVENT_COLUMNS = (
+    Events.eventid,
+    Events.clubid,
+    Events.title,
+    Events.description,
+    Events.startdatetime,
+    Events.enddatetime,
+    Events.location,
+)
+
+POST_COLUMNS = (
+    Posts.postid,
+    Posts.clubid,
+    Posts.title,
+    Posts.content,
+    Posts.timestamp,
+)
+
+
+def _event_rows_to_dicts(rows, club_name: str | None = None, club_names: dict | None = None) -> list[dict[str, Any]]:
+    """
+    rows are EVENT_COLUMNS tuples. Pass club_name for a single club's
+    listing, or club_names ({clubid: clubname}) for a mixed listing.
+    """
+    out = []
+    append = out.append
+    for event_id, club_id, title, description, start, end, location in rows:
+        if start is not None:
+            start_iso = start.isoformat()
+            date, time = start_iso[:10], start_iso[11:16]
+        else:
+            start_iso = date = time = None
+        append({
+            "id": event_id,
+            "clubId": str(club_id),
+            "clubName": club_names.get(club_id) if club_names is not None else club_name,
+            "title": title,
+            "date": date,
+            "time": time,
+            "location": location,
+            "description": description,
+            "startdatetime": start_iso,
+            "enddatetime": end.isoformat() if end is not None else None,
+        })
+    return out
+
+
+def _post_rows_to_dicts(rows, club_name: str | None = None, club_names: dict | None = None) -> list[dict[str, Any]]:
+    """
+    rows are POST_COLUMNS tuples. Pass club_name for a single club's
+    listing, or club_names ({clubid: clubname}) for a mixed listing.
+    """
+    out = []
+    append = out.append
+    for post_id, club_id, title, content, timestamp in rows:
+        append({
+            "id": post_id,
+            "clubId": str(club_id),
+            "clubName": club_names.get(club_id) if club_names is not None else club_name,
+            "title": title,
+            "content": content,
+            "createdAt": timestamp.isoformat() if timestamp is not None else None,
+            "clubAvatar": None,
+            "image": None,
+            "likes": 0,
+        })
+    return out
+
+
+def _club_to_dict(club: Clubs) -> dict[str, Any]:
+    return {
+        "id": str(club.clubid),
+        "name": club.clubname,
+        "description": club.description,
+        "memberCount": club.followercount or 0,
+        # Placeholder fields the frontend type expects
+        "coverImage": None,
+        "category": None,
+    }
+
+
+# ---------- Club feed versions / ETags ----------
+# Every write to a club's events or posts bumps clubs.contentversion in the
+# same transaction. The feed routes derive a strong ETag from that version
+# (plus the page being asked for), so a poll whose ETag still matches can be
+# answered with 304 after reading only the clubs row.
+#
+# The version is also part of every cached page's key. Invalidation only
+# reaches this process's cache, so without it another instance could pair
+# a new ETag with a page it cached before the write.
+#
+# The cross-club event listing has no ETag and no row of its own to read a
+# version from, so its pages are keyed on the feed cache generation of
+# ALL_EVENTS_NAMESPACE instead, which every write that bumps a version it
+# depends on also moves (via _invalidate_event_feeds, or the club edit in
+# queries.py). A hit costs no query; another instance's write shows up here
+# once the page expires (FEED_CACHE_TTL_SECONDS).
+
+def _bump_club_version(db: Session, club_id: int) -> None:
+    db.query(Clubs).filter(Clubs.clubid == club_id).update(
+        {Clubs.contentversion: Clubs.contentversion + 1},
+        synchronize_session=False,
+    )
+
+
+# Drop cached feed pages after a committed write (see cache.FeedCache)
+def _invalidate_event_feeds(club_id: int) -> None:
+    from intervals import upcoming_events
+    feed_cache.invalidate(club_feed_namespace(club_id, "events"), ALL_EVENTS_NAMESPACE)
+    upcoming_events.invalidate()
+
+
+def _invalidate_post_feeds(club_id: int) -> None:
+    feed_cache.invalidate(club_feed_namespace(club_id, "posts"))
+
+
+def club_feed_etag(kind: str, club: Clubs, limit: int | None, cursor: str | None) -> str:
+    page = f"{_clamp_limit(limit)}:{cursor or ''}"
+    page_digest = hashlib.sha1(page.encode("utf-8")).hexdigest()[:12]
+    return f'"{kind}-{club.clubid}-{club.contentversion or 0}-{page_digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    If-None-Match check (weak comparison, as RFC 9110 asks for this header).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
 # ---------- EVENTS CORE LOGIC ----------
 
 def create_event_core(event_in: Any, current_user: models.Users, db: Session) -> dict:
@@ -158,6 +472,7 @@ def create_event_core(event_in: Any, current_user: models.Users, db: Session) ->
     # TODO: If you want to restrict this to club admins,
     #       check ClubMembership here.
 
+    from search import search_index, model_fields
     # Make sure club exists
     club = db.query(Clubs).filter(Clubs.clubid == event_in.club_id).first()
     if club is None:
@@ -177,8 +492,11 @@ def create_event_core(event_in: Any, current_user: models.Users, db: Session) ->
     )
 
     db.add(new_event)
+    _bump_club_version(db, event_in.club_id)
     db.commit()
+    _invalidate_event_feeds(event_in.club_id)
     db.refresh(new_event)
+    search_index.upsert("event", new_event.eventid, model_fields("event", new_event))
 
     return {
         "status": "success",
@@ -187,8 +505,16 @@ def create_event_core(event_in: Any, current_user: models.Users, db: Session) ->
     }
 
 
-def list_events_for_club_core(club_id: int, db: Session) -> dict:
-    club = db.query(Clubs).filter(Clubs.clubid == club_id).first()
+def list_events_for_club_core(
+    club_id: int,
+    db: Session,
+    limit: int | None = None,
+    cursor: str | None = None,
+    club: Clubs | None = None,
+) -> dict:
+    # club can be passed in when the caller already loaded it (ETag check)
+    if club is None:
+        club = db.query(Clubs).filter(Clubs.clubid == club_id).first()
     if club is None:
         from fastapi import HTTPException, status
         raise HTTPException(
@@ -196,39 +522,58 @@ def list_events_for_club_core(club_id: int, db: Session) -> dict:
             detail="Club not found",
         )
 
-    events = (
-        db.query(Events)
-        .filter(Events.clubid == club_id)
-        .order_by(Events.startdatetime.asc())
-        .all()
+    def load():
+        events, next_cursor = _paginate(
+            db.query(*EVENT_COLUMNS).filter(Events.clubid == club_id),
+            Events.startdatetime,
+            Events.eventid,
+            limit,
+            cursor,
+        )
+
+        return {
+            "status": "success",
+            "club_id": club_id,
+            "club_name": club.clubname,
+            "events": _event_rows_to_dicts(events, club.clubname),
+            "next_cursor": next_cursor,
+        }
+
+    return feed_cache.get_or_load(
+        club_feed_namespace(club_id, "events"), (club.contentversion, _clamp_limit(limit), cursor), load
     )
 
-    return {
-        "status": "success",
-        "club_id": club_id,
-        "club_name": club.clubname,
-        "events": [_event_to_dict(e, club) for e in events],
-    }
 
+def list_all_events_core(
+    db: Session,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> dict:
+    def load():
+        events, next_cursor = _paginate(
+            db.query(*EVENT_COLUMNS),
+            Events.startdatetime,
+            Events.eventid,
+            limit,
+            cursor,
+        )
+        club_ids = {e.clubid for e in events}
+        club_names = dict(
+            db.query(Clubs.clubid, Clubs.clubname)
+            .filter(Clubs.clubid.in_(club_ids))
+            .all()
+            if club_ids
+            else []
+        )
 
-def list_all_events_core(db: Session) -> dict:
-    events = db.query(Events).order_by(Events.startdatetime.asc()).all()
-    club_ids = {e.clubid for e in events}
-    clubs = (
-        db.query(Clubs)
-        .filter(Clubs.clubid.in_(club_ids))
-        .all()
-        if club_ids
-        else []
-    )
-    club_map = {c.clubid: c for c in clubs}
+        return {
+            "status": "success",
+            "events": _event_rows_to_dicts(events, club_names=club_names),
+            "next_cursor": next_cursor,
+        }
 
-    return {
-        "status": "success",
-        "events": [
-            _event_to_dict(e, club_map.get(e.clubid)) for e in events
-        ],
-    }
+    version = feed_cache.generation(ALL_EVENTS_NAMESPACE)
+    return feed_cache.get_or_load(ALL_EVENTS_NAMESPACE, (version, _clamp_limit(limit), cursor), load)
 
 
 # ---------- POSTS CORE LOGIC ----------
@@ -243,6 +588,8 @@ def create_post_core(post_in: Any, current_user: models.Users, db: Session) -> d
       - content: str
     """
 
+    from search import search_index, model_fields
+    from timelines import timeline_store
     club = db.query(Clubs).filter(Clubs.clubid == post_in.club_id).first()
     if club is None:
         from fastapi import HTTPException, status
@@ -258,8 +605,15 @@ def create_post_core(post_in: Any, current_user: models.Users, db: Session) -> d
     )
 
     db.add(new_post)
+    _bump_club_version(db, post_in.club_id)
     db.commit()
+    _invalidate_post_feeds(post_in.club_id)
     db.refresh(new_post)
+    search_index.upsert("post", new_post.postid, model_fields("post", new_post))
+
+    # Push into followers' home timelines. Reading the version reloads the
+    # club row (expired by the commit), which the response needs anyway.
+    timeline_store.fan_out(db, new_post.clubid, new_post.timestamp, new_post.postid, club.contentversion or 0)
 
     return {
         "status": "success",
@@ -268,8 +622,16 @@ def create_post_core(post_in: Any, current_user: models.Users, db: Session) -> d
     }
 
 
-def list_posts_for_club_core(club_id: int, db: Session) -> dict:
-    club = db.query(Clubs).filter(Clubs.clubid == club_id).first()
+def list_posts_for_club_core(
+    club_id: int,
+    db: Session,
+    limit: int | None = None,
+    cursor: str | None = None,
+    club: Clubs | None = None,
+) -> dict:
+    # club can be passed in when the caller already loaded it (ETag check)
+    if club is None:
+        club = db.query(Clubs).filter(Clubs.clubid == club_id).first()
     if club is None:
         from fastapi import HTTPException, status
         raise HTTPException(
@@ -277,20 +639,259 @@ def list_posts_for_club_core(club_id: int, db: Session) -> dict:
             detail="Club not found",
         )
 
-    posts = (
-        db.query(Posts)
-        .filter(Posts.clubid == club_id)
-        .order_by(Posts.timestamp.desc())
-        .all()
+    # Newest first
+    def load():
+        posts, next_cursor = _paginate(
+            db.query(*POST_COLUMNS).filter(Posts.clubid == club_id),
+            Posts.timestamp,
+            Posts.postid,
+            limit,
+            cursor,
+            descending=True,
+        )
+
+        return {
+            "status": "success",
+            "club_id": club_id,
+            "club_name": club.clubname,
+            "posts": _post_rows_to_dicts(posts, club.clubname),
+            "next_cursor": next_cursor,
+        }
+
+    return feed_cache.get_or_load(
+        club_feed_namespace(club_id, "posts"), (club.contentversion, _clamp_limit(limit), cursor), load
     )
 
+# ---------- CLUB FOLLOWERS CORE LOGIC ----------
+# Counts come from the clubs row (kept by the membership functions in
+# queries.py) and members are read one keyset page at a time, so neither
+# scales with the size of the club.
+
+def _decode_user_cursor(cursor: str) -> int:
+    """
+    Cursor of the follower listing: same token format as _encode_cursor,
+    with no sort value and the last user id.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, user_id = json.loads(base64.urlsafe_b64decode(padded))
+        if sort_value is not None:
+            raise ValueError(cursor)
+        return int(user_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+def list_club_followers_core(
+    club_id: int,
+    db: Session,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> dict:
+    club = db.query(Clubs).filter(Clubs.clubid == club_id).first()
+    if club is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Club not found",
+        )
+
+    page_size = _clamp_limit(limit)
+    after_user_id = _decode_user_cursor(cursor) if cursor else None
+    rows = get_club_followers_page(db, club_id, after_user_id, page_size + 1)
+    if rows is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not load followers",
+        )
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = _encode_cursor(None, rows[-1].userid)
+
     return {
         "status": "success",
         "club_id": club_id,
-        "club_name": club.clubname,
-        "posts": [_post_to_dict(p, club) for p in posts],
+        "memberCount": club.followercount,
+        "adminCount": club.admincount,
+        "followers": [
+            {"id": str(user_id), "name": name, "role": role}
+            for user_id, name, role in rows
+        ],
+        "next_cursor": next_cursor,
     }
 
+# ---------- CLUB NETWORK CORE LOGIC ----------
+# Club -> club follows are answered from the in-memory graph (club_graph.py);
+# the DB is only read to (re)load it and to fetch the clubs to show.
+
+# ?by= for the rankings: clubs followed by the most clubs, or following the most
+RANKING_DIRECTIONS = {"followers": "in", "following": "out"}
+
+
+def _clubs_by_id(db: Session, club_ids) -> dict[int, Clubs]:
+    club_ids = set(club_ids)
+    if not club_ids:
+        return {}
+    return {c.clubid: c for c in db.query(Clubs).filter(Clubs.clubid.in_(club_ids)).all()}
+
+
+def get_club_network_core(club_id: int, db: Session, limit: int | None = None) -> dict:
+    """
+    A club's place in the club network: how many clubs it follows and is
+    followed by, the clubs it follows mutually, and two-hop suggestions
+    (clubs its followed clubs follow), each with the number of partner
+    clubs leading there.
+    """
+    from club_graph import club_graph
+    club = db.query(Clubs).filter(Clubs.clubid == club_id).first()
+    if club is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Club not found",
+        )
+
+    following = club_graph.following(db, club_id)
+    followers = club_graph.followers(None, club_id)
+    mutual = club_graph.mutual_follows(None, club_id)
+    suggestions = club_graph.suggest(None, club_id, _clamp_limit(limit))
+
+    clubs = _clubs_by_id(db, mutual + [i for i, _ in suggestions])
+    return {
+        "status": "success",
+        "club_id": club_id,
+        "followingCount": len(following),
+        "followerCount": len(followers),
+        "mutual": [_club_to_dict(clubs[i]) for i in mutual if i in clubs],
+        "suggestions": [
+            {**_club_to_dict(clubs[i]), "partners": partners}
+            for i, partners in suggestions if i in clubs
+        ],
+    }
+
+
+def list_club_rankings_core(db: Session, by: str = "followers", limit: int | None = None) -> dict:
+    from club_graph import club_graph
+    if by not in RANKING_DIRECTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"by must be one of {', '.join(RANKING_DIRECTIONS)}",
+        )
+
+    ranked = club_graph.top_by_degree(db, RANKING_DIRECTIONS[by], _clamp_limit(limit))
+    clubs = _clubs_by_id(db, [i for i, _ in ranked])
+    return {
+        "status": "success",
+        "by": by,
+        "clubs": [{**_club_to_dict(clubs[i]), "degree": degree} for i, degree in ranked if i in clubs],
+    }
+
+# ---------- HOME FEED CORE LOGIC ----------
+
+def get_home_feed_core(
+    current_user: models.Users,
+    db: Session,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> dict:
+    """
+    Posts from every club the user follows, newest first.
+
+    Entries come from the user's materialized timeline (see timelines.py),
+    merged with read-time pulls for very large clubs. Posts are then loaded
+    in one query for the page.
+    """
+    from timelines import timeline_store
+    page_size = _clamp_limit(limit)
+    before_key = _decode_cursor(cursor) if cursor else None
+
+    # One extra entry tells us whether there is a next page
+    entries = timeline_store.page(db, current_user.userid, before_key, page_size + 1)
+    next_cursor = None
+    if len(entries) > page_size:
+        entries = entries[:page_size]
+        next_cursor = _encode_cursor(entries[-1][0], entries[-1][1])
+
+    post_ids = [entry[1] for entry in entries]
+    rows = db.query(*POST_COLUMNS).filter(Posts.postid.in_(post_ids)).all() if post_ids else []
+    row_map = {row.postid: row for row in rows}
+
+    club_ids = {row.clubid for row in rows}
+    club_names = dict(
+        db.query(Clubs.clubid, Clubs.clubname).filter(Clubs.clubid.in_(club_ids)).all()
+        if club_ids
+        else []
+    )
+
+    # Keep timeline order, skipping posts deleted since they were fanned out
+    ordered = [row_map[post_id] for post_id in post_ids if post_id in row_map]
+
+    return {
+        "status": "success",
+        "posts": _post_rows_to_dicts(ordered, club_names=club_names),
+        "next_cursor": next_cursor,
+    }
+
+
+# ---------- CONVERSATIONS CORE LOGIC ----------
+
+def list_conversations_core(current_user: models.Users, db: Session) -> dict:
+    """
+    The user's inbox: one entry per conversation with the other participant,
+    the last message and the unread count, most recent first.
+
+    Everything comes from the user's read state rows, which are maintained
+    when messages are written (see create_messages_bulk).
+    """
+    rows = get_inbox(db, current_user.userid)
+    if rows is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not load conversations",
+        )
+
+    return {
+        "status": "success",
+        "conversations": [
+            {
+                "id": row.conversationid,
+                "userId": row.userid,
+                "userName": row.name,
+                "lastMessage": row.lastmessagecontent or "",
+                "lastMessageSenderId": row.lastmessagesenderid,
+                "lastMessageTime": row.lastmessagetime.isoformat() if row.lastmessagetime else None,
+                "unreadCount": row.unreadcount,
+            }
+            for row in rows
+        ],
+    }
+
+
+def mark_conversation_read_core(
+    conversation_id: int,
+    current_user: models.Users,
+    db: Session,
+) -> dict:
+    """
+    Reset the user's unread count for a conversation.
+    """
+    updated = mark_conversation_read(db, current_user.userid, conversation_id)
+    if updated is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not mark the conversation read",
+        )
+    if not updated:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found",
+        )
+    return {"status": "success"}
+
+
 # ---------- EVENT UPDATE / DELETE CORE LOGIC ----------
 
 def update_event_core(
@@ -304,6 +905,8 @@ def update_event_core(
 
     Only fields that are not None on event_in will be updated.
     """
+    from search import search_index, model_fields
+    from intervals import duration_class
     event = db.query(Events).filter(Events.eventid == event_id).first()
     if event is None:
         raise HTTPException(
@@ -324,9 +927,13 @@ def update_event_core(
         event.enddatetime = event_in.end_datetime
     if getattr(event_in, "location", None) is not None:
         event.location = event_in.location
+    event.durationclass = duration_class(event.startdatetime, event.enddatetime)
 
+    _bump_club_version(db, event.clubid)
     db.commit()
+    _invalidate_event_feeds(event.clubid)
     db.refresh(event)
+    search_index.upsert("event", event.eventid, model_fields("event", event))
 
     club = db.query(Clubs).filter(Clubs.clubid == event.clubid).first()
 
@@ -345,6 +952,7 @@ def delete_event_core(
     """
     Delete an existing event.
     """
+    from search import search_index
     event = db.query(Events).filter(Events.eventid == event_id).first()
     if event is None:
         raise HTTPException(
@@ -354,8 +962,12 @@ def delete_event_core(
 
     # TODO: enforce that only club admins can delete
 
+    club_id = event.clubid
     db.delete(event)
+    _bump_club_version(db, club_id)
     db.commit()
+    _invalidate_event_feeds(club_id)
+    search_index.remove("event", event_id)
 
     return {
         "status": "success",
@@ -376,6 +988,7 @@ def update_post_core(
 
     Only fields that are not None on post_in will be updated.
     """
+    from search import search_index, model_fields
     post = db.query(Posts).filter(Posts.postid == post_id).first()
     if post is None:
         raise HTTPException(
@@ -390,8 +1003,11 @@ def update_post_core(
     if getattr(post_in, "content", None) is not None:
         post.content = post_in.content
 
+    _bump_club_version(db, post.clubid)
     db.commit()
+    _invalidate_post_feeds(post.clubid)
     db.refresh(post)
+    search_index.upsert("post", post.postid, model_fields("post", post))
 
     club = db.query(Clubs).filter(Clubs.clubid == post.clubid).first()
 
@@ -410,6 +1026,7 @@ def delete_post_core(
     """
     Delete an existing post.
     """
+    from search import search_index
     post = db.query(Posts).filter(Posts.postid == post_id).first()
     if post is None:
         raise HTTPException(
@@ -419,10 +1036,387 @@ def delete_post_core(
 
     # TODO: enforce that only the post author or club admin can delete
 
+    club_id = post.clubid
     db.delete(post)
+    _bump_club_version(db, club_id)
     db.commit()
+    _invalidate_post_feeds(club_id)
+    search_index.remove("post", post_id)
 
     return {
         "status": "success",
         "message": "Post deleted successfully",
     }
+
+
+# ---------- RECOMMENDATIONS CORE LOGIC ----------
+
+def list_recommended_clubs_core(
+    current_user: models.Users,
+    db: Session,
+    scoring: str = "count",
+    limit: int | None = None,
+) -> dict:
+    try:
+        clubs = get_recommended_clubs(db, current_user.userid, scoring, limit)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+    return {
+        "status": "success",
+        "clubs": [_club_to_dict(c) for c in clubs],
+    }
+
+
+# ---------- SEARCH CORE LOGIC ----------
+
+SEARCH_MODELS = {"club": (Clubs, Clubs.clubid), "post": (Posts, Posts.postid), "event": (Events, Events.eventid)}
+
+
+def _search_sql(db: Session, q: str, kinds, limit: int) -> list[tuple[str, int, float]]:
+    """
+    Stand-in for search_index.search while the index is first built: every
+    query term must appear (case-insensitive substring, so prefixes match
+    too) in one of the indexed fields. Unranked, so score is 0 and results
+    are newest first per kind. One query for all kinds.
+    """
+    from search import tokenize, FIELD_WEIGHTS, SEARCH_KINDS
+    tokens = list(dict.fromkeys(tokenize(q)))
+    if not tokens:
+        return []
+
+    selects = []
+    for kind in kinds or SEARCH_KINDS:
+        model, id_col = SEARCH_MODELS[kind]
+        columns = [getattr(model, name) for name, _ in FIELD_WEIGHTS[kind]]
+        stmt = (
+            select(literal(kind).label("kind"), id_col.label("id"))
+            .where(*(or_(*(column.icontains(token, autoescape=True) for column in columns)) for token in tokens))
+            .order_by(id_col.desc())
+            .limit(limit)
+        )
+        selects.append(select(stmt.subquery()))
+
+    rows = db.execute(union_all(*selects)).all()
+    rows.sort(key=lambda row: (SEARCH_KINDS.index(row.kind), -row.id))
+    return [(row.kind, row.id, 0.0) for row in rows[:limit]]
+
+
+def search_core(
+    q: str,
+    db: Session,
+    kind: str | None = None,
+    limit: int | None = None,
+) -> dict:
+    """
+    Full-text search over clubs, posts and events (see search.py).
+
+    Results keep the BM25 rank order; each carries its kind, score and the
+    same dict the list endpoints return for that kind. Rows are loaded with
+    one query per kind. While a cold instance builds the index in the
+    background, matches come from SQL instead (unranked, see _search_sql).
+    """
+    from search import search_index, SEARCH_KINDS
+    if kind is not None and kind not in SEARCH_KINDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown search type: {kind}",
+        )
+
+    kinds = (kind,) if kind else None
+    if search_index.ensure_loading():
+        hits = search_index.search(q, kinds=kinds, limit=_clamp_limit(limit))
+    else:
+        hits = _search_sql(db, q, kinds, _clamp_limit(limit))
+
+    ids: dict[str, list[int]] = {k: [] for k in SEARCH_KINDS}
+    for hit_kind, doc_id, _ in hits:
+        ids[hit_kind].append(doc_id)
+
+    items: dict[tuple[str, int], dict] = {}
+    club_ids = set(ids["club"])
+    post_rows = db.query(*POST_COLUMNS).filter(Posts.postid.in_(ids["post"])).all() if ids["post"] else []
+    event_rows = db.query(*EVENT_COLUMNS).filter(Events.eventid.in_(ids["event"])).all() if ids["event"] else []
+    club_ids.update(row.clubid for row in post_rows)
+    club_ids.update(row.clubid for row in event_rows)
+
+    clubs = {c.clubid: c for c in db.query(Clubs).filter(Clubs.clubid.in_(club_ids)).all()} if club_ids else {}
+    club_names = {club_id: club.clubname for club_id, club in clubs.items()}
+
+    for club_id in ids["club"]:
+        if club_id in clubs:
+            items[("club", club_id)] = _club_to_dict(clubs[club_id])
+    for row, item in zip(post_rows, _post_rows_to_dicts(post_rows, club_names=club_names)):
+        items[("post", row.postid)] = item
+    for row, item in zip(event_rows, _event_rows_to_dicts(event_rows, club_names=club_names)):
+        items[("event", row.eventid)] = item
+
+    return {
+        "status": "success",
+        "results": [
+            {"type": hit_kind, "score": round(score, 4), "item": items[(hit_kind, doc_id)]}
+            for hit_kind, doc_id, score in hits
+            # Skip anything deleted since it was indexed
+            if (hit_kind, doc_id) in items
+        ],
+    }
+
+
+# ---------- ASYNC READ PATHS ----------
+# Same behaviour and response shapes as the sync functions above, but run on
+# an AsyncSession so the hot read routes do not hold a threadpool worker.
+
+async def get_club_or_404_async(club_id: int, db: AsyncSession) -> Clubs:
+    club = await db.get(Clubs, club_id)
+    if club is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Club not found",
+        )
+    return club
+
+
+async def _page_async(db: AsyncSession, stmt, sort_col, id_col, limit: int | None, cursor: str | None, descending: bool = False):
+    page_size = _clamp_limit(limit)
+    stmt = _apply_keyset(stmt, sort_col, id_col, page_size, cursor, descending)
+    rows = (await db.execute(stmt)).all()
+    return _split_page(rows, sort_col, id_col, page_size)
+
+
+async def list_events_for_club_core_async(
+    club_id: int,
+    db: AsyncSession,
+    limit: int | None = None,
+    cursor: str | None = None,
+    club: Clubs | None = None,
+) -> dict:
+    if club is None:
+        club = await get_club_or_404_async(club_id, db)
+
+    async def load():
+        events, next_cursor = await _page_async(
+            db,
+            select(*EVENT_COLUMNS).where(Events.clubid == club_id),
+            Events.startdatetime,
+            Events.eventid,
+            limit,
+            cursor,
+        )
+
+        return {
+            "status": "success",
+            "club_id": club_id,
+            "club_name": club.clubname,
+            "events": _event_rows_to_dicts(events, club.clubname),
+            "next_cursor": next_cursor,
+        }
+
+    return await feed_cache.get_or_load_async(
+        club_feed_namespace(club_id, "events"), (club.contentversion, _clamp_limit(limit), cursor), load
+    )
+
+
+async def list_all_events_core_async(
+    db: AsyncSession,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> dict:
+    async def load():
+        events, next_cursor = await _page_async(
+            db,
+            select(*EVENT_COLUMNS),
+            Events.startdatetime,
+            Events.eventid,
+            limit,
+            cursor,
+        )
+        club_ids = {e.clubid for e in events}
+        club_names = dict(
+            (await db.execute(select(Clubs.clubid, Clubs.clubname).where(Clubs.clubid.in_(club_ids)))).all()
+            if club_ids
+            else []
+        )
+
+        return {
+            "status": "success",
+            "events": _event_rows_to_dicts(events, club_names=club_names),
+            "next_cursor": next_cursor,
+        }
+
+    version = feed_cache.generation(ALL_EVENTS_NAMESPACE)
+    return await feed_cache.get_or_load_async(ALL_EVENTS_NAMESPACE, (version, _clamp_limit(limit), cursor), load)
+
+
+# ---------- Time-window event queries ----------
+# An event overlaps [from, to] when it starts by `to` and ends at or after
+# `from`. The end bound alone cannot use an index, so each duration class
+# (see intervals.py) contributes its own start-time range: an event lasting
+# at most D must start in [from - D, to]. Work is then proportional to the
+# events in the window plus a little slack per class, not to the table.
+# Windows near today are answered from the in-memory upcoming_events tree.
+
+def _event_window_filter(window_from: datetime | None, window_to: datetime | None):
+    from intervals import MAX_DURATION_CLASS, UNBOUNDED_DURATION_CLASS, duration_class_span
+    conditions = []
+    if window_to is not None:
+        conditions.append(Events.startdatetime <= window_to)
+    if window_from is not None:
+        conditions.append(func.coalesce(Events.enddatetime, Events.startdatetime) >= window_from)
+        conditions.append(or_(
+            *(
+                and_(Events.durationclass == c, Events.startdatetime >= window_from - duration_class_span(c))
+                for c in range(MAX_DURATION_CLASS + 1)
+            ),
+            Events.durationclass == UNBOUNDED_DURATION_CLASS,
+            # Rows written before the column existed, until backfilled
+            Events.durationclass.is_(None),
+        ))
+    return and_(*conditions)
+
+
+def _page_rows(rows, limit: int | None, cursor: str | None):
+    """
+    Keyset page over in-memory EVENT_COLUMNS rows, same cursor format as
+    the DB listings.
+    """
+    page_size = _clamp_limit(limit)
+    rows = sorted(
+        (row for row in rows if row.startdatetime is not None),
+        key=lambda row: (row.startdatetime, row.eventid),
+    )
+    if cursor:
+        after = _decode_cursor(cursor)
+        rows = [row for row in rows if (row.startdatetime, row.eventid) > after]
+    return _split_page(rows[:page_size + 1], Events.startdatetime, Events.eventid, page_size)
+
+
+async def list_events_in_window_core_async(
+    db: AsyncSession,
+    window_from: datetime | None,
+    window_to: datetime | None,
+    club_ids: list[int] | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> dict:
+    """
+    Events whose [startdatetime, enddatetime] overlaps [window_from,
+    window_to], optionally only for some clubs, ordered by start time.
+    Either bound may be left open.
+    """
+    from intervals import as_naive_utc, upcoming_events
+    window_from = as_naive_utc(window_from)
+    window_to = as_naive_utc(window_to)
+    if window_from is not None and window_to is not None and window_from > window_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'from' must not be after 'to'",
+        )
+
+    async def load(a: datetime, b: datetime):
+        return (await db.execute(select(*EVENT_COLUMNS).where(_event_window_filter(a, b)))).all()
+
+    rows = await upcoming_events.overlapping_async(
+        window_from, window_to, load,
+        start_key=EVENT_COLUMNS.index(Events.startdatetime),
+        end_key=EVENT_COLUMNS.index(Events.enddatetime),
+    )
+    if rows is not None:
+        if club_ids:
+            wanted = set(club_ids)
+            rows = [row for row in rows if row.clubid in wanted]
+        events, next_cursor = _page_rows(rows, limit, cursor)
+    else:
+        stmt = select(*EVENT_COLUMNS).where(_event_window_filter(window_from, window_to))
+        if club_ids:
+            stmt = stmt.where(Events.clubid.in_(club_ids))
+        events, next_cursor = await _page_async(db, stmt, Events.startdatetime, Events.eventid, limit, cursor)
+
+    ids = {e.clubid for e in events}
+    club_names = dict(
+        (await db.execute(select(Clubs.clubid, Clubs.clubname).where(Clubs.clubid.in_(ids)))).all()
+        if ids
+        else []
+    )
+
+    return {
+        "status": "success",
+        "events": _event_rows_to_dicts(events, club_names=club_names),
+        "next_cursor": next_cursor,
+    }
+
+
+async def list_posts_for_club_core_async(
+    club_id: int,
+    db: AsyncSession,
+    limit: int | None = None,
+    cursor: str | None = None,
+    club: Clubs | None = None,
+) -> dict:
+    if club is None:
+        club = await get_club_or_404_async(club_id, db)
+
+    # Newest first
+    async def load():
+        posts, next_cursor = await _page_async(
+            db,
+            select(*POST_COLUMNS).where(Posts.clubid == club_id),
+            Posts.timestamp,
+            Posts.postid,
+            limit,
+            cursor,
+            descending=True,
+        )
+
+        return {
+            "status": "success",
+            "club_id": club_id,
+            "club_name": club.clubname,
+            "posts": _post_rows_to_dicts(posts, club.clubname),
+            "next_cursor": next_cursor,
+        }
+
+    return await feed_cache.get_or_load_async(
+        club_feed_namespace(club_id, "posts"), (club.contentversion, _clamp_limit(limit), cursor), load
+    )
+
+
+async def list_recommended_clubs_core_async(
+    current_user: models.Users,
+    db: AsyncSession,
+    scoring: str = "count",
+    limit: int | None = None,
+) -> dict:
+    from recommendations import club_tag_index, SCORING_MODES
+    if scoring not in SCORING_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown scoring mode: {scoring}",
+        )
+
+    user_tag_ids = {
+        tag_id
+        for tag_id in (
+            await db.execute(select(UserTags.tagid).where(UserTags.userid == current_user.userid))
+        ).scalars()
+    }
+    if not user_tag_ids:
+        return {"status": "success", "clubs": []}
+
+    await club_tag_index.ensure_loaded_async(db)
+    ranked = club_tag_index.score(None, user_tag_ids, scoring=scoring, limit=limit)
+    club_ids = [club_id for club_id, _ in ranked]
+
+    clubs = (
+        (await db.execute(select(Clubs).where(Clubs.clubid.in_(club_ids)))).scalars().all()
+        if club_ids
+        else []
+    )
+    club_map = {c.clubid: c for c in clubs}
+
+    return {
+        "status": "success",
+        "clubs": [_club_to_dict(club_map[i]) for i in club_ids if i in club_map],
+    }
@@ -1,6 +1,6 @@
-import ctypes
 import os
 import platform
+import threading
 
 # 1. Detect the Operating System
 system_name = platform.system()
@@ -19,38 +19,125 @@ else:
 current_dir = os.path.dirname(os.path.abspath(__file__))
 lib_path = os.path.join(current_dir, lib_name)
 
-try:
-    # 3. Load the C++ library
-    cpp_lib = ctypes.CDLL(lib_path)
-
-    # 4. Define the function arguments
-    # Argument 1: Input String (char*)
-    # Argument 2: Output Buffer (char*)
-    cpp_lib.manual_encrypt.argtypes = [ctypes.c_char_p, ctypes.c_char_p]
-    cpp_lib.manual_encrypt.restype = None 
-
-    def encrypt_password(password: str) -> str:
-        """
-        Sends the password to C++, gets a Hash back.
-        """
-        input_bytes = password.encode('utf-8')
-        
-        # Create a fixed-size buffer (256 bytes)
-        # This is safer for Hashing than using len(input)
-        output_buffer = ctypes.create_string_buffer(256)
-        
-        # Call C++
-        cpp_lib.manual_encrypt(input_bytes, output_buffer)
-        
-        # Decode result
-        return output_buffer.value.decode('utf-8', errors='ignore')
-
-except OSError:
-    # This block runs if the compiled file is missing
-    print(f"\nWARNING: Could not find '{lib_name}' at:")
-    print(f"  {lib_path}")
-    print("  Please run the compile command for your OS.\n")
-    
-    # Fallback function so the app doesn't crash during testing
-    def encrypt_password(password: str) -> str:
-        return f"Unencrypted_{password}"
\ No newline at end of file
+# Each digest takes 64 hex chars + a null terminator in the output buffer
+DIGEST_SLOT = 65
+
+# The library is loaded on the first hash rather than at import, which keeps
+# ctypes and the dlopen off the cold-start path. Only legacy password
+# checks and the benchmarks need it.
+_cpp_lib = None
+_load_attempted = False
+_load_lock = threading.Lock()
+
+
+def get_library():
+    """
+    The loaded C++ library, or None if the compiled file is missing.
+    """
+    global _cpp_lib, _load_attempted
+    if _load_attempted:
+        return _cpp_lib
+
+    with _load_lock:
+        if _load_attempted:
+            return _cpp_lib
+        import ctypes
+
+        try:
+            # 3. Load the C++ library
+            lib = ctypes.CDLL(lib_path)
+
+            # 4. Define the function arguments
+            # Argument 1: Input String (char*)
+            # Argument 2: Output Buffer (char*)
+            lib.manual_encrypt.argtypes = [ctypes.c_char_p, ctypes.c_char_p]
+            lib.manual_encrypt.restype = None
+
+            # 5. Batch entry point (older builds of the library may not have it)
+            if hasattr(lib, "manual_encrypt_batch"):
+                # Arguments: packed input bytes, offsets (count + 1), count, output buffer
+                lib.manual_encrypt_batch.argtypes = [
+                    ctypes.c_char_p,
+                    ctypes.POINTER(ctypes.c_uint64),
+                    ctypes.c_uint64,
+                    ctypes.c_char_p,
+                ]
+                lib.manual_encrypt_batch.restype = None
+            else:
+                print(f"\nWARNING: '{lib_name}' has no manual_encrypt_batch, recompile it for batch hashing.\n")
+
+            _cpp_lib = lib
+
+        except OSError:
+            # This block runs if the compiled file is missing
+            print(f"\nWARNING: Could not find '{lib_name}' at:")
+            print(f"  {lib_path}")
+            print("  Please run the compile command for your OS.\n")
+
+        _load_attempted = True
+    return _cpp_lib
+
+
+# manual_encrypt reads a C string, so it has always hashed a password only up
+# to its first NUL (and stored legacy hashes were made that way). The batch
+# path takes explicit lengths, so both paths cut there to give the same digest.
+def _c_string(password: str) -> bytes:
+    return password.encode('utf-8').split(b"\0", 1)[0]
+
+
+def encrypt_password(password: str) -> str:
+    """
+    Sends the password to C++, gets a Hash back.
+    """
+    cpp_lib = get_library()
+    if cpp_lib is None:
+        # Fallback so the app doesn't crash during testing
+        return f"Unencrypted_{password}"
+    import ctypes
+
+    input_bytes = _c_string(password)
+
+    # Create a fixed-size buffer (256 bytes)
+    # This is safer for Hashing than using len(input)
+    output_buffer = ctypes.create_string_buffer(256)
+
+    # Call C++
+    cpp_lib.manual_encrypt(input_bytes, output_buffer)
+
+    # Decode result
+    return output_buffer.value.decode('utf-8', errors='ignore')
+
+
+def encrypt_passwords_batch(passwords: list[str]) -> list[str]:
+    """
+    Hashes many passwords in one C++ call (for bulk imports/migrations).
+    Gives the same digests as calling encrypt_password on each one, also
+    for passwords containing NUL (see _c_string).
+    """
+    cpp_lib = get_library()
+    if cpp_lib is None or not hasattr(cpp_lib, "manual_encrypt_batch"):
+        return [encrypt_password(p) for p in passwords]
+    import ctypes
+
+    count = len(passwords)
+    if count == 0:
+        return []
+
+    encoded = [_c_string(p) for p in passwords]
+
+    # Pack every input into one buffer and record where each one starts
+    offsets = (ctypes.c_uint64 * (count + 1))()
+    position = 0
+    for i, item in enumerate(encoded):
+        offsets[i] = position
+        position += len(item)
+    offsets[count] = position
+
+    output_buffer = ctypes.create_string_buffer(count * DIGEST_SLOT)
+    cpp_lib.manual_encrypt_batch(b"".join(encoded), offsets, count, output_buffer)
+
+    raw = output_buffer.raw
+    return [
+        raw[i * DIGEST_SLOT:i * DIGEST_SLOT + 64].decode('ascii')
+        for i in range(count)
+    ]
@@ -1,14 +1,128 @@
-from sqlalchemy import create_engine
+import threading
+import time
+
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool
 from config import settings
+from metrics import instrument_engine
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+except ImportError:
+    create_async_engine = None
+
+# --- Connection pool strategy ---
+
+POOL_MODES = ("queue", "null")
+PRE_PING_MODES = ("always", "idle", "off")
+
+def _is_memory_sqlite(url: str) -> bool:
+    scheme, _, rest = url.partition("://")
+    return scheme.startswith("sqlite") and rest in ("", "/", "/:memory:")
+
+def pool_options(url: str, pool_mode: str, pre_ping: str) -> dict:
+    """create_engine / create_async_engine keyword arguments for a pool mode."""
+    if pool_mode not in POOL_MODES:
+        raise ValueError(f"Unknown DB_POOL_MODE: {pool_mode}")
+    if pre_ping not in PRE_PING_MODES:
+        raise ValueError(f"Unknown DB_PRE_PING: {pre_ping}")
+
+    if pool_mode == "null":
+        # Every checkout is a fresh connection, so there is nothing to ping
+        return {"poolclass": NullPool}
+
+    options = {"pool_pre_ping": pre_ping == "always"}
+    # In-memory SQLite uses a single shared connection and takes no sizing
+    if not _is_memory_sqlite(url):
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        )
+    return options
+
+def enable_idle_pre_ping(engine, idle_seconds: float):
+    """
+    Ping a pooled connection on checkout only if it sat unused for at least
+    idle_seconds. A connection in steady use skips the extra round trip; one
+    that idled long enough for the server or a NAT to drop it is checked.
+    Takes a sync Engine (or an AsyncEngine's sync_engine).
+    """
+    dialect = engine.dialect
+
+    def on_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+        try:
+            dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            # The pool drops this connection and retries with another one
+            raise exc.DisconnectionError(f"Pre-ping after idle failed: {e}") from e
+
+    event.listen(engine, "checkin", on_checkin)
+    event.listen(engine, "checkout", on_checkout)
+
+def make_engine(url: str, pool_mode: str | None = None, pre_ping: str | None = None,
+                idle_seconds: float | None = None):
+    """A sync Engine for url, configured from DB_POOL_* / DB_PRE_PING unless overridden."""
+    pool_mode = pool_mode or settings.DB_POOL_MODE
+    pre_ping = pre_ping or settings.DB_PRE_PING
+    new_engine = create_engine(url, **pool_options(url, pool_mode, pre_ping))
+    if pool_mode == "queue" and pre_ping == "idle":
+        enable_idle_pre_ping(new_engine, idle_seconds if idle_seconds is not None else settings.DB_PRE_PING_IDLE_SECONDS)
+    instrument_engine(new_engine)
+    return new_engine
+
+def make_async_engine(url: str, pool_mode: str | None = None, pre_ping: str | None = None,
+                      idle_seconds: float | None = None):
+    """An AsyncEngine for url (already an async driver URL), same settings as make_engine."""
+    pool_mode = pool_mode or settings.DB_POOL_MODE
+    pre_ping = pre_ping or settings.DB_PRE_PING
+    new_engine = create_async_engine(url, **pool_options(url, pool_mode, pre_ping))
+    if pool_mode == "queue" and pre_ping == "idle":
+        enable_idle_pre_ping(
+            new_engine.sync_engine, idle_seconds if idle_seconds is not None else settings.DB_PRE_PING_IDLE_SECONDS
+        )
+    instrument_engine(new_engine.sync_engine)
+    return new_engine
+
+# The engines are created on first use rather than at import, so a cold
+# start does not pay for the DB driver imports before it has to (and a
+# request that never touches the DB never does). Module attributes
+# `engine`, `async_engine` and `AsyncSessionLocal` still work, see __getattr__.
+_engine = None
+_async_engine = None
+_async_sessionmaker = None
+_async_resolved = False
+_init_lock = threading.Lock()
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _init_lock:
+            if _engine is None:
+                _engine = make_engine(settings.DATABASE_URL)
+    return _engine
+
+
+class LazySessionmaker(sessionmaker):
+    """sessionmaker that binds to get_engine() when the first session is made."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
 
-# Create the database engine
-# 'pool_pre_ping=True' helps reconnect if the database drops the connection
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
 
 # Create a SessionLocal class
 # Each request will create its own instance of this class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = LazySessionmaker(autocommit=False, autoflush=False)
 
 # Base class for your database models to inherit from
 Base = declarative_base()
@@ -19,4 +133,115 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# --- Async engine (used by the async read routes) ---
+
+# Map the sync driver in DATABASE_URL to its asyncio counterpart
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+}
+
+# libpq query parameters asyncpg does not understand: renamed, or None to drop
+ASYNCPG_PARAMS = {"sslmode": "ssl", "channel_binding": None}
+
+def to_async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    async_scheme = ASYNC_DRIVERS.get(scheme, scheme)
+    if async_scheme == "postgresql+asyncpg" and "?" in rest:
+        from urllib.parse import parse_qsl, urlencode
+        rest, _, query = rest.partition("?")
+        params = []
+        for key, value in parse_qsl(query, keep_blank_values=True):
+            key = ASYNCPG_PARAMS.get(key, key)
+            if key is not None:
+                params.append((key, value))
+        if params:
+            rest += "?" + urlencode(params)
+    return async_scheme + sep + rest
+
+def _init_async():
+    global _async_engine, _async_sessionmaker, _async_resolved
+    with _init_lock:
+        if _async_resolved:
+            return
+        try:
+            if create_async_engine is None:
+                raise ImportError("sqlalchemy.ext.asyncio is not available")
+
+            _async_engine = make_async_engine(to_async_url(settings.DATABASE_URL))
+            _async_sessionmaker = async_sessionmaker(
+                bind=_async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+            )
+
+        except ImportError as e:
+            # Runs if the async driver (asyncpg / aiosqlite) is not installed
+            print(f"\nWARNING: Async database engine disabled: {e}")
+            print("  Async routes use the sync engine in the threadpool instead.")
+            print("  Install asyncpg (PostgreSQL) or aiosqlite (SQLite) to enable it.\n")
+        _async_resolved = True
+
+# The async engine, or None if the async driver is not installed
+def get_async_engine():
+    if not _async_resolved:
+        _init_async()
+    return _async_engine
+
+def get_async_sessionmaker():
+    if not _async_resolved:
+        _init_async()
+    return _async_sessionmaker
+
+def __getattr__(name):
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    if name == "AsyncSessionLocal":
+        return get_async_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class ThreadedSession:
+    """
+    Stand-in for an AsyncSession when the async driver is missing: runs the
+    calls the async routes make (execute, get) on a sync Session in the
+    threadpool, so those routes keep working on the sync engine.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    async def execute(self, *args, **kwargs):
+        from fastapi.concurrency import run_in_threadpool
+        return await run_in_threadpool(self.db.execute, *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        from fastapi.concurrency import run_in_threadpool
+        return await run_in_threadpool(self.db.get, *args, **kwargs)
+
+    async def connection(self):
+        from fastapi.concurrency import run_in_threadpool
+        return await run_in_threadpool(self.db.connection)
+
+    async def close(self):
+        self.db.close()
+
+# Async dependency function, same lifecycle as get_db. Falls back to the
+# sync engine (see ThreadedSession) if the async driver is not installed
+async def get_async_db():
+    session_factory = get_async_sessionmaker()
+    if session_factory is None:
+        db = ThreadedSession(SessionLocal())
+        try:
+            yield db
+        finally:
+            await db.close()
+        return
+    async with session_factory() as db:
+        yield db
@@ -51,14 +51,51 @@ inline uint32_t gamma1(uint32_t x) {
     return rotr(x, 17) ^ rotr(x, 19) ^ (x >> 10);
 }
 
+// Initial hash state (shared by the single and batch paths)
+static const uint32_t H0[8] = {
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a,
+    0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19
+};
+
+// Number of messages hashed side by side in manual_encrypt_batch
+static const uint64_t LANES = 4;
+
+// Data + 0x80 byte + 8 bytes size, rounded up to whole 64-byte blocks
+inline uint64_t padded_length(uint64_t len) {
+    uint64_t padded_len = len + 1 + 8;
+    uint64_t remainder = padded_len % 64;
+    if (remainder != 0) {
+        padded_len += (64 - remainder);
+    }
+    return padded_len;
+}
+
+// Build the 64-byte padded block starting at `offset` without copying the
+// whole message (same padding as manual_encrypt)
+inline void load_block(const uint8_t* msg, uint64_t len, uint64_t padded_len,
+                       uint64_t offset, uint8_t block[64]) {
+    uint64_t bits_len = len * 8;
+    for (uint64_t i = 0; i < 64; i++) {
+        uint64_t pos = offset + i;
+        uint8_t byte = 0;
+        if (pos < len) {
+            byte = msg[pos];
+        } else if (pos == len) {
+            byte = 0x80;
+        } else if (pos >= padded_len - 8) {
+            // Length in bits, Big Endian, in the last 8 bytes
+            byte = (bits_len >> ((padded_len - 1 - pos) * 8)) & 0xFF;
+        }
+        block[i] = byte;
+    }
+}
+
 // --- 3. MAIN EXPORT FUNCTION ---
 extern "C" {
     EXPORT void manual_encrypt(const char* input, char* output) {
 
-        uint32_t H[8] = {
-            0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a,
-            0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19
-        };
+        uint32_t H[8];
+        for (int i = 0; i < 8; i++) H[i] = H0[i];
 
         // Determine length
         uint64_t initial_len = 0;
@@ -168,4 +205,118 @@ extern "C" {
         // Null terminate string
         *out_ptr = 0;
     }
-}
\ No newline at end of file
+
+
+    // --- 4. BATCH EXPORT FUNCTION ---
+    // Hashes `count` messages in one call. Message i is the byte range
+    // data[offsets[i] .. offsets[i + 1]) so offsets holds count + 1 entries.
+    // Digest i is written to output + i * 65 (64 hex chars + null terminator),
+    // so the caller must provide count * 65 bytes.
+    //
+    // Messages are processed LANES at a time: each round of the message
+    // schedule and compression loop is applied to every lane before moving
+    // on, which gives the compiler independent work to interleave (and
+    // vectorize) instead of one long dependency chain per message.
+    // Blocks are built on the fly, so there is no 4096-byte input limit here.
+    EXPORT void manual_encrypt_batch(const char* data, const uint64_t* offsets,
+                                     uint64_t count, char* output) {
+        const char* hex_chars = "0123456789abcdef";
+
+        for (uint64_t first = 0; first < count; first += LANES) {
+            uint64_t lanes = (count - first < LANES) ? (count - first) : LANES;
+
+            uint32_t H[LANES][8];
+            const uint8_t* msg[LANES];
+            uint64_t len[LANES];
+            uint64_t padded_len[LANES];
+            uint64_t max_blocks = 0;
+
+            for (uint64_t l = 0; l < LANES; l++) {
+                for (int i = 0; i < 8; i++) H[l][i] = H0[i];
+
+                if (l < lanes) {
+                    msg[l] = (const uint8_t*)data + offsets[first + l];
+                    len[l] = offsets[first + l + 1] - offsets[first + l];
+                } else {
+                    // Unused lane: hashes an empty message and is discarded
+                    msg[l] = (const uint8_t*)data;
+                    len[l] = 0;
+                }
+                padded_len[l] = padded_length(len[l]);
+                if (padded_len[l] / 64 > max_blocks) max_blocks = padded_len[l] / 64;
+            }
+
+            for (uint64_t blk = 0; blk < max_blocks; blk++) {
+                uint64_t offset = blk * 64;
+                uint32_t W[64][LANES];
+
+                // 1. First 16 words of each lane's current block
+                for (uint64_t l = 0; l < LANES; l++) {
+                    uint8_t block[64];
+                    if (offset < padded_len[l]) {
+                        load_block(msg[l], len[l], padded_len[l], offset, block);
+                    } else {
+                        for (int i = 0; i < 64; i++) block[i] = 0;
+                    }
+                    for (int t = 0; t < 16; t++) {
+                        W[t][l] = ((uint32_t)block[t * 4] << 24) |
+                                  ((uint32_t)block[t * 4 + 1] << 16) |
+                                  ((uint32_t)block[t * 4 + 2] << 8) |
+                                  ((uint32_t)block[t * 4 + 3]);
+                    }
+                }
+
+                // 2. Message schedule expansion, all lanes per step
+                for (int t = 16; t < 64; t++) {
+                    for (uint64_t l = 0; l < LANES; l++) {
+                        W[t][l] = gamma1(W[t - 2][l]) + W[t - 7][l] + gamma0(W[t - 15][l]) + W[t - 16][l];
+                    }
+                }
+
+                // 3. Working variables
+                uint32_t a[LANES], b[LANES], c[LANES], d[LANES];
+                uint32_t e[LANES], f[LANES], g[LANES], h[LANES];
+                for (uint64_t l = 0; l < LANES; l++) {
+                    a[l] = H[l][0]; b[l] = H[l][1]; c[l] = H[l][2]; d[l] = H[l][3];
+                    e[l] = H[l][4]; f[l] = H[l][5]; g[l] = H[l][6]; h[l] = H[l][7];
+                }
+
+                // 4. Compression loop, all lanes per round
+                for (int t = 0; t < 64; t++) {
+                    for (uint64_t l = 0; l < LANES; l++) {
+                        uint32_t T1 = h[l] + sigma1(e[l]) + choose(e[l], f[l], g[l]) + K[t] + W[t][l];
+                        uint32_t T2 = sigma0(a[l]) + majority(a[l], b[l], c[l]);
+
+                        h[l] = g[l];
+                        g[l] = f[l];
+                        f[l] = e[l];
+                        e[l] = d[l] + T1;
+                        d[l] = c[l];
+                        c[l] = b[l];
+                        b[l] = a[l];
+                        a[l] = T1 + T2;
+                    }
+                }
+
+                // 5. Only lanes that still had a block keep the result
+                for (uint64_t l = 0; l < LANES; l++) {
+                    if (offset >= padded_len[l]) continue;
+                    H[l][0] += a[l]; H[l][1] += b[l]; H[l][2] += c[l]; H[l][3] += d[l];
+                    H[l][4] += e[l]; H[l][5] += f[l]; H[l][6] += g[l]; H[l][7] += h[l];
+                }
+            }
+
+            // 6. Hex output for the real lanes
+            for (uint64_t l = 0; l < lanes; l++) {
+                char* out_ptr = output + (first + l) * 65;
+                for (int i = 0; i < 8; i++) {
+                    uint32_t val = H[l][i];
+                    for (int j = 7; j >= 0; j--) {
+                        *out_ptr++ = hex_chars[(val >> (j * 4)) & 0x0F];
+                    }
+                }
+                *out_ptr = 0;
+            }
+        }
+    }
+}
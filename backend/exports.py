@@ -0,0 +1,155 @@
+# Streaming exports of a club's events, posts and members as NDJSON or CSV.
+# Rows are read with yield_per (a server-side cursor on PostgreSQL) and
+# encoded one chunk at a time, so memory stays flat however many rows
+# the club has. Used by GET /api/clubs/{club_id}/export/{kind} and from
+# the command line:
+#   python -m exports --club-id 3 --kind events --format csv --output events.csv
+import argparse
+import csv
+import io
+import json
+import sys
+
+from sqlalchemy import select
+
+from core_logic import EVENT_COLUMNS, POST_COLUMNS, _event_rows_to_dicts, _post_rows_to_dicts
+from database import SessionLocal
+from models import ClubMembership, Clubs, Events, Posts, Users
+
+try:
+    import orjson
+
+    def _dumps(value) -> bytes:
+        return orjson.dumps(value)
+except ImportError:
+    def _dumps(value) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+# Rows fetched from the cursor and encoded per chunk
+EXPORT_CHUNK_ROWS = 1000
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# CSV columns per kind. NDJSON lines carry the full dicts, the same shapes
+# the list endpoints return.
+EXPORT_FIELDS = {
+    "events": ["id", "clubId", "clubName", "title", "date", "time", "location",
+               "description", "startdatetime", "enddatetime"],
+    "posts": ["id", "clubId", "clubName", "title", "content", "createdAt"],
+    "members": ["userId", "name", "role"],
+}
+
+EXPORT_KINDS = tuple(EXPORT_FIELDS)
+
+
+def _event_chunks(db, club_id: int, club_name: str):
+    stmt = (
+        select(*EVENT_COLUMNS)
+        .where(Events.clubid == club_id)
+        .order_by(Events.startdatetime, Events.eventid)
+        .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+    )
+    for rows in db.execute(stmt).partitions():
+        yield _event_rows_to_dicts(rows, club_name)
+
+
+def _post_chunks(db, club_id: int, club_name: str):
+    stmt = (
+        select(*POST_COLUMNS)
+        .where(Posts.clubid == club_id)
+        .order_by(Posts.timestamp, Posts.postid)
+        .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+    )
+    for rows in db.execute(stmt).partitions():
+        yield _post_rows_to_dicts(rows, club_name)
+
+
+def _member_chunks(db, club_id: int, club_name: str):
+    stmt = (
+        select(Users.userid, Users.name, ClubMembership.role)
+        .join(ClubMembership, ClubMembership.userid == Users.userid)
+        .where(ClubMembership.clubid == club_id)
+        .order_by(Users.userid)
+        .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+    )
+    for rows in db.execute(stmt).partitions():
+        yield [{"userId": user_id, "name": name, "role": role} for user_id, name, role in rows]
+
+
+_CHUNK_READERS = {
+    "events": _event_chunks,
+    "posts": _post_chunks,
+    "members": _member_chunks,
+}
+
+
+def _encode_ndjson(chunks):
+    for chunk in chunks:
+        yield b"".join(_dumps(item) + b"\n" for item in chunk)
+
+
+def _encode_csv(chunks, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue().encode("utf-8")
+    for chunk in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def stream_club_export(club_id: int, kind: str, fmt: str, session_factory=SessionLocal):
+    """
+    Yield the encoded export chunk by chunk.
+
+    The generator opens its own session and closes it when it is exhausted
+    or closed, so it can outlive the request's session when handed to a
+    StreamingResponse. kind and fmt must already be validated.
+    """
+    db = session_factory()
+    try:
+        club_name = db.query(Clubs.clubname).filter(Clubs.clubid == club_id).scalar()
+        chunks = _CHUNK_READERS[kind](db, club_id, club_name)
+        if fmt == "csv":
+            yield from _encode_csv(chunks, EXPORT_FIELDS[kind])
+        else:
+            yield from _encode_ndjson(chunks)
+    finally:
+        db.close()
+
+
+def export_filename(club_id: int, kind: str, fmt: str) -> str:
+    return f"club-{club_id}-{kind}.{fmt}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a club's events, posts or members.")
+    parser.add_argument("--club-id", type=int, required=True)
+    parser.add_argument("--kind", choices=EXPORT_KINDS, required=True)
+    parser.add_argument("--format", choices=tuple(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--output", help="file to write, stdout if omitted")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if db.query(Clubs.clubid).filter(Clubs.clubid == args.club_id).first() is None:
+            sys.exit(f"Club {args.club_id} not found")
+    finally:
+        db.close()
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for data in stream_club_export(args.club_id, args.kind, args.format):
+            out.write(data)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# Bulk import of a club directory (clubs, their tags and club-tag links)
+# from CSV, JSON or NDJSON. Everything is deduplicated in memory, tag ids are
+# resolved in bulk, and rows go in as batched multi-row inserts with
+# ON CONFLICT DO NOTHING, one transaction for the tags plus one per batch
+# of clubs. Existing clubs, tags and links are left alone, so re-running
+# an import only adds what is missing.
+#   python -m importer directory.csv [--batch-size 2000]
+#
+# CSV columns: name, description, tags ("music;live shows;jazz").
+# JSON: a list (or {"clubs": [...]}) of {"name", "description", "tags": [...]},
+# NDJSON: one such object per line.
+import argparse
+import csv
+import json
+import re
+import sys
+import time
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import ClubTags, Clubs, Tags
+from queries import lookup_tag_ids
+from recommendations import club_tag_index
+from search import search_index
+
+# Clubs written per transaction, and values per IN (...) lookup
+IMPORT_BATCH_SIZE = 2000
+LOOKUP_CHUNK_SIZE = 1000
+
+_TAG_SPLIT_RE = re.compile(r"[;|]")
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _insert_ignoring_conflicts(db: Session, table, rows: list[dict], *returning) -> list:
+    """
+    Multi-row insert that skips rows hitting a unique constraint, so two
+    imports (or an import and the app) can race without failing. Returns
+    the returning columns of the rows actually inserted, so skipped rows
+    are not counted as created.
+    """
+    if not rows:
+        return []
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return db.execute(insert(table).returning(*returning), rows).all()
+    return db.execute(dialect_insert(table).on_conflict_do_nothing().returning(*returning), rows).all()
+
+
+# ---------- Reading the directory ----------
+
+def _split_tags(value) -> list[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = _TAG_SPLIT_RE.split(value)
+    return [str(tag).strip() for tag in value if str(tag).strip()]
+
+
+def _record(item: dict) -> dict:
+    return {
+        "name": (item.get("name") or item.get("clubname") or "").strip(),
+        "description": (item.get("description") or "").strip(),
+        "tags": _split_tags(item.get("tags")),
+    }
+
+
+def read_directory(path: str):
+    """
+    Yield {"name", "description", "tags"} records from a CSV, JSON or
+    NDJSON file, picked by extension.
+    """
+    if path.endswith((".ndjson", ".jsonl")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield _record(json.loads(line))
+    elif path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for item in data.get("clubs", []) if isinstance(data, dict) else data:
+            yield _record(item)
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                yield _record(row)
+
+
+def dedupe_directory(records) -> tuple[dict[str, dict], int]:
+    """
+    Merge records by club name. The last non-empty description wins and
+    tags are unioned, case-insensitively, keeping the first spelling seen.
+    Returns ({name: {"description", "tags": {lower: spelling}}}, records read).
+    """
+    clubs: dict[str, dict] = {}
+    read = 0
+    for record in records:
+        read += 1
+        if not record["name"]:
+            continue
+        club = clubs.setdefault(record["name"], {"description": "", "tags": {}})
+        if record["description"]:
+            club["description"] = record["description"]
+        for tag in record["tags"]:
+            club["tags"].setdefault(tag.lower(), tag)
+    return clubs, read
+
+
+# ---------- Writing ----------
+
+# spellings: {str.lower() of the tag: spelling}, see queries.lookup_tag_ids
+def _tag_ids(db: Session, spellings: dict[str, str]) -> dict[str, int]:
+    found = {}
+    for chunk in _chunks(list(spellings.items()), LOOKUP_CHUNK_SIZE):
+        for lower, tag_id in lookup_tag_ids(db, dict(chunk)).items():
+            found.setdefault(lower, tag_id)
+    return found
+
+
+def _club_ids(db: Session, names: list[str]) -> dict[str, int]:
+    found = {}
+    for chunk in _chunks(names, LOOKUP_CHUNK_SIZE):
+        found.update(
+            (name, club_id) for club_id, name in
+            db.execute(select(Clubs.clubid, Clubs.clubname).where(Clubs.clubname.in_(chunk)))
+        )
+    return found
+
+
+def import_club_directory(db: Session, clubs: dict[str, dict], batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """
+    Write deduplicated clubs (see dedupe_directory) and return counts of
+    what was created and what already existed.
+    """
+    stats = {"clubs_created": 0, "clubs_existing": 0, "tags_created": 0, "links_created": 0, "links_existing": 0}
+
+    # 1. Tags, in one transaction
+    spellings: dict[str, str] = {}
+    for club in clubs.values():
+        for lower, tag in club["tags"].items():
+            spellings.setdefault(lower, tag)
+
+    tag_ids = _tag_ids(db, spellings)
+    missing = [spellings[lower] for lower in spellings if lower not in tag_ids]
+    created_tags = []
+    for chunk in _chunks(missing, batch_size):
+        created_tags += _insert_ignoring_conflicts(
+            db, Tags.__table__, [{"tagname": tag} for tag in chunk], Tags.tagid, Tags.tagname,
+        )
+    db.commit()
+    for tag_id, name in created_tags:
+        tag_ids[name.lower()] = tag_id
+        club_tag_index.add_tag(tag_id)
+    stats["tags_created"] = len(created_tags)
+    if len(created_tags) < len(missing):
+        # Someone else created the rest in the meantime
+        tag_ids.update(_tag_ids(db, {lower: spellings[lower] for lower in spellings if lower not in tag_ids}))
+
+    # 2. Clubs and their links, one transaction per batch of clubs
+    for names in _chunks(list(clubs), batch_size):
+        club_ids = _club_ids(db, names)
+        new_clubs = [
+            {"clubname": name, "description": clubs[name]["description"]}
+            for name in names if name not in club_ids
+        ]
+        created_clubs = _insert_ignoring_conflicts(db, Clubs.__table__, new_clubs, Clubs.clubid, Clubs.clubname)
+        club_ids.update((name, club_id) for club_id, name in created_clubs)
+        if len(created_clubs) < len(new_clubs):
+            club_ids = _club_ids(db, names)
+
+        wanted = {
+            (club_ids[name], tag_ids[lower])
+            for name in names
+            for lower in clubs[name]["tags"]
+        }
+        existing = set()
+        for chunk in _chunks(list({club_id for club_id, _ in wanted}), LOOKUP_CHUNK_SIZE):
+            existing.update(
+                (club_id, tag_id) for club_id, tag_id in
+                db.execute(select(ClubTags.clubid, ClubTags.tagid).where(ClubTags.clubid.in_(chunk)))
+            )
+        new_links = sorted(wanted - existing)
+        created_links = _insert_ignoring_conflicts(db, ClubTags.__table__, [
+            {"clubid": club_id, "tagid": tag_id} for club_id, tag_id in new_links
+        ], ClubTags.clubid, ClubTags.tagid)
+        db.commit()
+
+        stats["clubs_created"] += len(created_clubs)
+        stats["clubs_existing"] += len(names) - len(created_clubs)
+        stats["links_created"] += len(created_links)
+        stats["links_existing"] += len(wanted) - len(created_links)
+
+        # Keep this process's in-memory indexes in sync (no-ops until loaded)
+        for club_id, name in created_clubs:
+            search_index.upsert("club", club_id, {"clubname": name, "description": clubs[name]["description"]})
+        links_by_club: dict[int, list[int]] = {}
+        for club_id, tag_id in created_links:
+            links_by_club.setdefault(club_id, []).append(tag_id)
+        for club_id, added in links_by_club.items():
+            club_tag_index.add_club_tags(club_id, added)
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a club directory (CSV, JSON or NDJSON).")
+    parser.add_argument("path")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="clubs per transaction")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    clubs, read = dedupe_directory(read_directory(args.path))
+    db = SessionLocal()
+    try:
+        stats = import_club_directory(db, clubs, args.batch_size)
+    except Exception as e:
+        db.rollback()
+        sys.exit(f"Import failed, batches already committed are kept and a re-run will skip them: {e}")
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - start
+
+    written = stats["clubs_created"] + stats["tags_created"] + stats["links_created"]
+    print(f"Read {read} records ({len(clubs)} unique clubs) in {elapsed:.2f}s, {read / elapsed:.0f} records/s")
+    print(f"Clubs: {stats['clubs_created']} created, {stats['clubs_existing']} already present")
+    print(f"Tags: {stats['tags_created']} created")
+    print(f"Club tags: {stats['links_created']} created, {stats['links_existing']} already present")
+    print(f"Wrote {written} rows, {written / elapsed:.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import bisect
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from config import settings
+
+# ------------ Interval helpers for time-window event queries ------------
+
+# Events are split into duration classes: class c holds events lasting at
+# most 2**c hours. Within one class, an event that overlaps [from, to] must
+# start in [from - 2**c hours, to], which is a plain range scan on the
+# (durationclass, startdatetime) index. Longer events, and events with no
+# class yet, go in UNBOUNDED_DURATION_CLASS and are checked on start alone.
+MAX_DURATION_CLASS = 13  # 2**13 hours is a little under a year
+UNBOUNDED_DURATION_CLASS = MAX_DURATION_CLASS + 1
+
+
+def as_naive_utc(value: datetime | None) -> datetime | None:
+    # Event times are stored as naive UTC timestamps
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def duration_class(start: datetime | None, end: datetime | None) -> int:
+    if start is None:
+        return UNBOUNDED_DURATION_CLASS
+    # A partial update can pair an aware new time with a naive stored one
+    start, end = as_naive_utc(start), as_naive_utc(end)
+    # An event without an end is treated as an instant
+    hours = max((end - start).total_seconds(), 0.0) / 3600 if end is not None else 0.0
+    for c in range(MAX_DURATION_CLASS + 1):
+        if hours <= 2 ** c:
+            return c
+    return UNBOUNDED_DURATION_CLASS
+
+
+def duration_class_span(c: int) -> timedelta:
+    return timedelta(hours=2 ** c)
+
+
+class IntervalTree:
+    """
+    Static centered interval tree over (start, end, value) triples.
+
+    overlapping(a, b) returns every value whose [start, end] overlaps
+    [a, b] in O(log n + k). The tree is rebuilt rather than updated, so it
+    suits a small, read-mostly set such as the upcoming events.
+    """
+
+    __slots__ = ("center", "by_start", "starts", "by_end", "ends", "left", "right")
+
+    def __init__(self, intervals):
+        intervals = list(intervals)
+        self.left = self.right = None
+        self.by_start = self.by_end = []
+        self.starts = self.ends = []
+        if not intervals:
+            self.center = None
+            return
+
+        points = sorted(p for start, end, _ in intervals for p in (start, end))
+        self.center = points[len(points) // 2]
+
+        here, left, right = [], [], []
+        for interval in intervals:
+            if interval[1] < self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                here.append(interval)
+
+        # Intervals containing the center: by start ascending, by end descending
+        self.by_start = sorted(here, key=lambda interval: interval[0])
+        self.starts = [interval[0] for interval in self.by_start]
+        self.by_end = sorted(here, key=lambda interval: interval[1], reverse=True)
+        self.ends = [interval[1] for interval in self.by_end]
+        if left:
+            self.left = IntervalTree(left)
+        if right:
+            self.right = IntervalTree(right)
+
+    def overlapping(self, a, b) -> list:
+        out = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.center is None:
+                continue
+            if b < node.center:
+                # Every interval here ends at or after the center, past b
+                count = bisect.bisect_right(node.starts, b)
+                out.extend(interval[2] for interval in node.by_start[:count])
+                if node.left:
+                    stack.append(node.left)
+            elif a > node.center:
+                # Every interval here starts at or before the center, before a.
+                # ends is descending, so count the leading ends >= a.
+                lo, hi = 0, len(node.ends)
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if node.ends[mid] >= a:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                out.extend(interval[2] for interval in node.by_end[:lo])
+                if node.right:
+                    stack.append(node.right)
+            else:
+                out.extend(interval[2] for interval in node.by_start)
+                if node.left:
+                    stack.append(node.left)
+                if node.right:
+                    stack.append(node.right)
+        return out
+
+
+class UpcomingEvents:
+    """
+    Interval tree over every event overlapping [now - lookback, now + horizon],
+    for the calendar and "this week" views.
+
+    Built on first use from rows returned by a loader, and rebuilt after
+    invalidate() (called on every event write), once ttl seconds have
+    passed, or when a window falls outside the range loaded last time.
+    Windows outside the hot range go to the DB instead. A tree loaded within
+    settle_seconds of an invalidation (a replica may still be behind) is
+    used for that request but not kept.
+    """
+
+    def __init__(self, lookback: timedelta, horizon: timedelta, ttl: float, settle_seconds: float = 0.0):
+        self.lookback = lookback
+        self.horizon = horizon
+        self.ttl = ttl
+        self.settle_seconds = settle_seconds
+        self._invalidated_at = float("-inf")
+        self._lock = threading.Lock()
+        self._tree: IntervalTree | None = None
+        self._window: tuple[datetime, datetime] | None = None
+        self._built_at = 0.0
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._tree = None
+            self._generation += 1
+            self._invalidated_at = time.monotonic()
+
+    def _hot_range(self) -> tuple[datetime, datetime]:
+        now = datetime.utcnow()
+        return now - self.lookback, now + self.horizon
+
+    # The current tree if it is fresh and was loaded for a range holding the window
+    def _usable_tree(self, window_from: datetime, window_to: datetime):
+        with self._lock:
+            if self._tree is None or time.monotonic() - self._built_at > self.ttl:
+                return None
+            loaded_from, loaded_to = self._window
+            if loaded_from <= window_from and window_to <= loaded_to:
+                return self._tree
+            return None
+
+    async def overlapping_async(self, window_from, window_to, load, start_key: int, end_key: int):
+        """
+        Rows overlapping [window_from, window_to], or None when the window is
+        outside the hot range. load(a, b) is awaited for the rows overlapping
+        [a, b] when the tree needs (re)building. start_key / end_key index the
+        start and end in each row.
+        """
+        if window_from is None or window_to is None:
+            return None
+        hot_from, hot_to = self._hot_range()
+        if not (hot_from <= window_from and window_to <= hot_to):
+            return None
+
+        tree = self._usable_tree(window_from, window_to)
+        if tree is None:
+            generation = self._generation
+            loaded = (hot_from, hot_to)
+            rows = await load(*loaded)
+            tree = IntervalTree(
+                (row[start_key], row[end_key] or row[start_key], row)
+                for row in rows
+                if row[start_key] is not None
+            )
+            with self._lock:
+                # A write during the load may be missing from these rows, so
+                # answer this request from them but do not keep the tree
+                settled = time.monotonic() - self._invalidated_at >= self.settle_seconds
+                if generation == self._generation and settled:
+                    self._tree = tree
+                    self._window = loaded
+                    self._built_at = time.monotonic()
+
+        return tree.overlapping(window_from, window_to)
+
+
+# Shared upcoming-events tree for this process
+upcoming_events = UpcomingEvents(
+    lookback=timedelta(days=settings.UPCOMING_EVENTS_LOOKBACK_DAYS),
+    horizon=timedelta(days=settings.UPCOMING_EVENTS_HORIZON_DAYS),
+    ttl=settings.UPCOMING_EVENTS_TTL_SECONDS,
+    settle_seconds=settings.REPLICA_MAX_LAG_SECONDS if settings.DATABASE_REPLICA_URLS else 0.0,
+)
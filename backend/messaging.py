@@ -0,0 +1,255 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+
+from config import settings
+from database import SessionLocal
+from queries import create_messages_bulk, get_user_conversation_ids, is_conversation_member
+
+# ------------ Real-time messaging ------------
+# Messages sent over a socket are published to every socket subscribed to
+# the conversation straight away, and only then queued for a batched insert.
+# Delivery latency therefore never includes a DB commit.
+
+
+class MessageBroker:
+    """
+    In-process pub/sub keyed by conversation id.
+
+    Each subscriber is the outgoing asyncio.Queue of one socket. Everything
+    runs on the worker's event loop, so no locking is needed.
+    """
+
+    def __init__(self):
+        self._subscribers: dict[int, set[asyncio.Queue]] = {}
+
+    def subscribe(self, conversation_id: int, queue: asyncio.Queue):
+        self._subscribers.setdefault(conversation_id, set()).add(queue)
+
+    def unsubscribe(self, conversation_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(conversation_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[conversation_id]
+
+    def publish(self, conversation_id: int, payload: str) -> int:
+        """
+        Hand an already-encoded message to every subscriber. Returns the
+        number of sockets it was queued for. A socket whose queue is full is
+        too slow to keep up, so the message is dropped for that socket only.
+        """
+        delivered = 0
+        for queue in self._subscribers.get(conversation_id, ()):
+            try:
+                queue.put_nowait(payload)
+                delivered += 1
+            except asyncio.QueueFull:
+                print(f"Dropping message for a slow subscriber of conversation {conversation_id}")
+        return delivered
+
+    def subscriber_count(self, conversation_id: int) -> int:
+        return len(self._subscribers.get(conversation_id, ()))
+
+
+# Queued by MessageWriter.flush to tell the background task to stop
+_STOP = object()
+
+
+class MessageWriter:
+    """
+    Collects messages and writes them with one INSERT per batch.
+
+    A batch is written when MESSAGE_BATCH_SIZE rows are waiting or
+    MESSAGE_FLUSH_INTERVAL_SECONDS after the first row arrived, whichever
+    comes first. The insert itself runs in the threadpool. A failed insert
+    is retried MESSAGE_WRITE_RETRIES times, then the batch is written row
+    by row and any row that still fails is logged in full, so a delivered
+    message is never dropped without a trace.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, retries: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    # Started lazily on the running loop (Mangum runs without lifespan events)
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def enqueue(self, row: dict):
+        self._ensure_started()
+        self._queue.put_nowait(row)
+
+    # Returns (rows, stop); stop is True once the _STOP marker was taken
+    async def _next_batch(self) -> tuple[list[dict], bool]:
+        first = await self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                row = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if row is _STOP:
+                return batch, True
+            batch.append(row)
+        return batch, False
+
+    async def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = await self._next_batch()
+            if batch:
+                await self._write_with_retries(batch)
+
+    async def _write_with_retries(self, rows: list[dict]):
+        delay = self.flush_interval
+        for attempt in range(self.retries + 1):
+            if await run_in_threadpool(self._write, rows):
+                return
+            if attempt < self.retries:
+                await asyncio.sleep(delay)
+                delay *= 2
+
+        # One bad row (e.g. a conversation deleted meanwhile) must not sink the rest
+        for row in rows:
+            if not await run_in_threadpool(self._write, [row]):
+                print(f"ERROR: Could not save message, content follows: {json.dumps(row, default=str)}")
+
+    @staticmethod
+    def _write(rows: list[dict]) -> bool:
+        db = SessionLocal()
+        try:
+            return create_messages_bulk(db, rows)
+        except Exception as e:
+            print(f"Error has occured when saving {len(rows)} messages: {e}")
+            return False
+        finally:
+            db.close()
+
+    async def flush(self):
+        """
+        Write every queued message, including a batch the background task
+        is collecting right now, then stop the task.
+        """
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            self._queue.put_nowait(_STOP)
+            await task
+        if self._queue is not None:
+            rows = []
+            while not self._queue.empty():
+                row = self._queue.get_nowait()
+                if row is not _STOP:
+                    rows.append(row)
+            if rows:
+                await self._write_with_retries(rows)
+
+
+# Shared broker and writer for this worker
+broker = MessageBroker()
+message_writer = MessageWriter(
+    batch_size=settings.MESSAGE_BATCH_SIZE,
+    flush_interval=settings.MESSAGE_FLUSH_INTERVAL_SECONDS,
+    retries=settings.MESSAGE_WRITE_RETRIES,
+)
+
+
+def _load_conversation_ids(user_id: int) -> set[int]:
+    db = SessionLocal()
+    try:
+        return get_user_conversation_ids(db, user_id)
+    finally:
+        db.close()
+
+
+def _check_member(conversation_id: int, user_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        return is_conversation_member(db, conversation_id, user_id)
+    finally:
+        db.close()
+
+
+async def _send_loop(websocket: WebSocket, queue: asyncio.Queue):
+    while True:
+        payload = await queue.get()
+        await websocket.send_text(payload)
+
+
+async def handle_message_socket(websocket: WebSocket, user):
+    """
+    Serve one accepted socket for an authenticated user.
+
+    Client -> server: {"conversation_id": int, "content": str, "client_id": any}
+    Server -> client: {"type": "ready", ...} once live delivery has started,
+    then {"type": "message", ...} for every message in the user's
+    conversations, or {"type": "error", "detail": str}.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.MESSAGE_SOCKET_QUEUE_SIZE)
+    conversation_ids = await run_in_threadpool(_load_conversation_ids, user.userid)
+    for conversation_id in conversation_ids:
+        broker.subscribe(conversation_id, queue)
+    # Anything sent before this frame must be fetched from history instead
+    await websocket.send_text(json.dumps({"type": "ready", "conversationIds": sorted(conversation_ids)}))
+
+    sender = asyncio.create_task(_send_loop(websocket, queue))
+    try:
+        while True:
+            try:
+                data = json.loads(await websocket.receive_text())
+                conversation_id = int(data["conversation_id"])
+                content = str(data["content"])
+            except (ValueError, KeyError, TypeError):
+                await websocket.send_text(json.dumps({"type": "error", "detail": "Invalid message"}))
+                continue
+
+            # Conversations created after connecting are checked once, then subscribed
+            if conversation_id not in conversation_ids:
+                if not await run_in_threadpool(_check_member, conversation_id, user.userid):
+                    await websocket.send_text(json.dumps({"type": "error", "detail": "Conversation not found"}))
+                    continue
+                conversation_ids.add(conversation_id)
+                broker.subscribe(conversation_id, queue)
+
+            sent_at = datetime.now(timezone.utc)
+
+            # 1. Deliver
+            broker.publish(conversation_id, json.dumps({
+                "type": "message",
+                "conversationId": conversation_id,
+                "senderId": user.userid,
+                "senderName": user.name,
+                "content": content,
+                "timestamp": sent_at.isoformat(),
+                "clientId": data.get("client_id"),
+            }))
+
+            # 2. Persist in the background
+            message_writer.enqueue({
+                "conversationid": conversation_id,
+                "senderid": user.userid,
+                "content": content,
+                "timestamp": sent_at,
+            })
+
+    except WebSocketDisconnect:
+        pass
+
+    finally:
+        sender.cancel()
+        for conversation_id in conversation_ids:
+            broker.unsubscribe(conversation_id, queue)
@@ -0,0 +1,301 @@
+import bisect
+import contextvars
+import threading
+import time
+
+from fastapi import Depends
+from sqlalchemy import event
+
+from config import settings
+
+# ------------ Request and query metrics (Prometheus text format) ------------
+
+# Latency buckets in seconds, shared by the request and DB time histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.label_names, labels)} {_number(value)}" for labels, value in values]
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram. Each label set keeps one count per bucket
+    (plus +Inf), the sum and the total count, as Prometheus expects.
+    """
+
+    def __init__(self, name: str, help_text: str, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [per-bucket counts (last one is +Inf), sum]
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            snapshot = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+REQUESTS = Counter(
+    "clubr_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"),
+)
+REQUEST_LATENCY = Histogram(
+    "clubr_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"),
+)
+IN_FLIGHT = Gauge("clubr_http_requests_in_flight", "HTTP requests currently being served.")
+REQUEST_QUERIES = Histogram(
+    "clubr_http_request_db_queries", "DB queries run per HTTP request.", ("method", "route"), QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "clubr_http_request_db_duration_seconds", "Time spent in DB queries per HTTP request.", ("method", "route"),
+)
+QUERY_LATENCY = Histogram("clubr_db_query_duration_seconds", "Latency of single DB queries.")
+SLOW_QUERIES = Counter("clubr_db_slow_queries_total", "DB queries slower than SLOW_QUERY_MS.")
+BUDGET_EXCEEDED = Counter(
+    "clubr_query_budget_exceeded_total", "Requests that ran more DB queries than their route's budget.",
+    ("method", "route"),
+)
+
+ALL_METRICS = (
+    REQUESTS, REQUEST_LATENCY, IN_FLIGHT, REQUEST_QUERIES, REQUEST_DB_TIME, QUERY_LATENCY, SLOW_QUERIES,
+    BUDGET_EXCEEDED,
+)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in ALL_METRICS:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# ---------- Per-request DB accounting ----------
+
+class RequestStats:
+    """Queries and DB time of one request, shared by every task/thread serving it."""
+
+    __slots__ = ("scope", "queries", "db_seconds", "statements")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+        # Every statement run, kept only in strict budget mode for the error message
+        self.statements = [] if settings.QUERY_BUDGET_MODE == "strict" else None
+
+
+# Set by MetricsMiddleware. Threadpool workers and the async engine's
+# greenlets run in a copy of the request's context, so they see the same
+# RequestStats object and add to it.
+current_request_stats: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar(
+    "current_request_stats", default=None
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    QUERY_LATENCY.observe(elapsed)
+
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        if stats.statements is not None:
+            stats.statements.append(statement)
+
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        SLOW_QUERIES.inc()
+        where = f"{stats.scope['method']} {stats.scope['path']}" if stats is not None else "no request"
+        print(f"Slow query ({elapsed * 1000:.1f} ms, {where}): {' '.join(statement.split())[:500]}")
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(engine):
+    """Count and time every statement run on a sync Engine (or an AsyncEngine's sync_engine)."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+# ---------- Query budgets ----------
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def _most_repeated(statements, count: int = 3) -> str:
+    repeated: dict[str, int] = {}
+    for statement in statements:
+        key = " ".join(statement.split())[:200]
+        repeated[key] = repeated.get(key, 0) + 1
+    top = sorted(repeated.items(), key=lambda item: item[1], reverse=True)[:count]
+    return "\n".join(f"  {times}x {statement}" for statement, times in top)
+
+
+def query_budget(max_queries: int):
+    """
+    Route dependency capping the DB queries one request may run:
+
+        @app.get("/api/feed", dependencies=[query_budget(4)])
+
+    Every query of the request counts, including those run by other
+    dependencies such as get_current_user. Checked when the route function
+    returns and before the response is sent (a function-scoped dependency;
+    the default request scope would only run the check after the response
+    went out). Queries run while a StreamingResponse is being sent are not
+    counted. QUERY_BUDGET_MODE=warn prints a warning and counts it on
+    /metrics, strict raises QueryBudgetExceeded so the request fails with a
+    500, off skips the check.
+    """
+    async def check_query_budget():
+        stats = current_request_stats.get()
+        yield
+        if stats is None or stats.queries <= max_queries or settings.QUERY_BUDGET_MODE == "off":
+            return
+
+        route_path = getattr(stats.scope.get("route"), "path", stats.scope["path"])
+        message = f"{stats.scope['method']} {route_path} ran {stats.queries} queries, budget is {max_queries}"
+        if settings.QUERY_BUDGET_MODE == "strict":
+            raise QueryBudgetExceeded(f"{message}. Most repeated:\n{_most_repeated(stats.statements)}")
+        BUDGET_EXCEEDED.inc(stats.scope["method"], route_path)
+        print(f"WARNING: {message}")
+
+    check_query_budget.max_queries = max_queries
+    return Depends(check_query_budget, scope="function")
+
+
+def route_query_budget(route) -> int | None:
+    """The budget declared on a route with query_budget(), or None."""
+    for dependency in getattr(route, "dependencies", ()):
+        max_queries = getattr(dependency.dependency, "max_queries", None)
+        if max_queries is not None:
+            return max_queries
+    return None
+
+
+# ---------- ASGI middleware ----------
+
+class MetricsMiddleware:
+    """
+    Records latency, status and DB usage for every HTTP request, labelled
+    by the route template (/api/clubs/{club_id}/events) rather than the raw
+    path so the number of series stays bounded. Paths that match no route
+    are labelled "unmatched". Websockets are passed through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            current_request_stats.reset(token)
+
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            REQUESTS.inc(method, route_path, str(status_code))
+            REQUEST_LATENCY.observe(elapsed, method, route_path)
+            REQUEST_QUERIES.observe(stats.queries, method, route_path)
+            REQUEST_DB_TIME.observe(stats.db_seconds, method, route_path)
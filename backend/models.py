@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, TIMESTAMP
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, SmallInteger, String, Text, TIMESTAMP, func
 # from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from database import Base
@@ -20,6 +20,12 @@ class Tags(Base):
     tagid = Column(Integer, primary_key=True, index=True, autoincrement=True)
     tagname = Column(String(255), unique=True, index=True)
 
+    # Case-insensitive tag lookups (queries.lookup_tag_ids).
+    # Existing databases: see schema_upgrades.sql
+    __table_args__ = (
+        Index("ix_tags_lower_tagname", func.lower(tagname)),
+    )
+
 # DB model for clubs
 class Clubs(Base):
     __tablename__ = "clubs"
@@ -27,6 +33,13 @@ class Clubs(Base):
     clubid = Column(Integer, primary_key=True, index=True, autoincrement=True)
     clubname = Column(String(255), unique=True, index=True)
     description = Column(Text)
+    # Bumped on every event/post write for the club, used for feed ETags
+    contentversion = Column(Integer, nullable=False, default=0, server_default="0")
+    # Memberships (admins included) and admins, kept in step by the
+    # membership functions in queries.py, so counts never scan clubmembership.
+    # Existing databases: see schema_upgrades.sql, then backfill_club_member_counts
+    followercount = Column(Integer, nullable=False, default=0, server_default="0")
+    admincount = Column(Integer, nullable=False, default=0, server_default="0")
 
 # DB model for club's tags/interests
 class ClubTags(Base):
@@ -50,6 +63,11 @@ class ClubMembership(Base):
     clubid = Column(Integer, ForeignKey("clubs.clubid"), primary_key=True)
     role = Column(String(255))
 
+    # Keyset pagination index for a club's follower listing
+    __table_args__ = (
+        Index("ix_clubmembership_club_user", "clubid", "userid"),
+    )
+
 # DB model for membership between club to club (for admin mode)
 class ClubToClubMembership(Base):
     __tablename__ = "clubtoclubmembership"
@@ -73,7 +91,36 @@ class Messages(Base):
     conversationid = Column(Integer, ForeignKey("conversations.conversationid"), primary_key=True)
     senderid = Column(Integer, ForeignKey("users.userid"), primary_key=True)
     content = Column(Text)
-    timestamp = Column(TIMESTAMP, default=datetime.now(timezone.utc))
+    # Callable so each message gets its own send time
+    timestamp = Column(TIMESTAMP, default=lambda: datetime.now(timezone.utc))
+
+# DB model for per-user conversation state, kept up to date on every message
+# insert and mark-as-read so the inbox never has to scan messages
+class ConversationReadState(Base):
+    __tablename__ = "conversationreadstate"
+
+    userid = Column(Integer, ForeignKey("users.userid"), primary_key=True)
+    conversationid = Column(Integer, ForeignKey("conversations.conversationid"), primary_key=True)
+    unreadcount = Column(Integer, nullable=False, default=0, server_default="0")
+    lastmessagecontent = Column(Text)
+    lastmessagesenderid = Column(Integer, ForeignKey("users.userid"))
+    lastmessagetime = Column(TIMESTAMP)
+    lastreadtime = Column(TIMESTAMP)
+
+    # Inbox listing: a user's conversations, most recent first, in the same
+    # order as get_inbox sorts them. SQLite has no NULLS LAST in index
+    # definitions, but its DESC already puts NULLs last. Existing databases:
+    # see schema_upgrades.sql.
+    __table_args__ = (
+        Index(
+            "ix_readstate_user_lastmessage_conversation",
+            userid, lastmessagetime.desc().nulls_last(), conversationid.desc(),
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_readstate_user_lastmessage_conversation",
+            userid, lastmessagetime.desc(), conversationid.desc(),
+        ).ddl_if(callable_=lambda ddl, target, bind, dialect, **kw: dialect.name != "postgresql"),
+    )
 
 # DB model for posts
 class Posts(Base):
@@ -83,7 +130,19 @@ class Posts(Base):
     clubid = Column(Integer, ForeignKey("clubs.clubid"), primary_key=True)
     title = Column(String(255))
     content = Column(Text)
-    timestamp = Column(TIMESTAMP, default=datetime.now(timezone.utc))
+    # Callable so each post gets its own creation time
+    timestamp = Column(TIMESTAMP, default=lambda: datetime.now(timezone.utc))
+
+    # Keyset pagination index for a club's feed (newest first)
+    __table_args__ = (
+        Index("ix_posts_club_timestamp_postid", "clubid", "timestamp", "postid"),
+    )
+
+# Works for ORM and bulk Core inserts alike, the row's own times are in the context
+def _default_duration_class(context):
+    from intervals import duration_class
+    params = context.get_current_parameters()
+    return duration_class(params.get("startdatetime"), params.get("enddatetime"))
 
 # DB model for events
 class Events(Base):
@@ -96,3 +155,15 @@ class Events(Base):
     startdatetime = Column(TIMESTAMP)
     enddatetime = Column(TIMESTAMP)
     location = Column(String(255))
+    # Duration bucket for time-window queries (see intervals.py), filled in
+    # on insert; update_event_core recomputes it when the times change.
+    # Existing databases: see schema_upgrades.sql
+    durationclass = Column(SmallInteger, default=_default_duration_class)
+
+    # Keyset pagination indexes for the global and per-club event listings
+    __table_args__ = (
+        Index("ix_events_start_eventid", "startdatetime", "eventid"),
+        Index("ix_events_club_start_eventid", "clubid", "startdatetime", "eventid"),
+        # Time windows: one start-time range scan per duration class
+        Index("ix_events_duration_start_eventid", "durationclass", "startdatetime", "eventid"),
+    )
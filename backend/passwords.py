@@ -0,0 +1,139 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import threading
+
+from config import settings
+from cpp_bridge import encrypt_password
+
+# ------------ Salted, tunable-cost password hashing ------------
+
+# Stored format: $pbkdf2-sha256$<iterations>$<salt>$<hash>  (salt/hash are base64)
+# Anything without this prefix is a legacy unsalted hash from cpp_bridge.
+HASH_SCHEME = "pbkdf2-sha256"
+SALT_BYTES = 16
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hashes are already queued on the worker pool."""
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def hash_password(password: str, iterations: int | None = None) -> str:
+    """
+    Hash a password with a random salt. Runs in the caller's process.
+    """
+    iterations = iterations or settings.PASSWORD_HASH_ITERATIONS
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"${HASH_SCHEME}${iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+# Stands in for the stored hash when a login names an unknown email, so the
+# answer takes as long as a wrong password for a real account (no timing
+# oracle for which emails are registered). No password matches it.
+DUMMY_HASH = (
+    f"${HASH_SCHEME}${settings.PASSWORD_HASH_ITERATIONS}"
+    f"${_b64encode(bytes(SALT_BYTES))}${_b64encode(bytes(32))}"
+)
+
+
+def verify_password(password: str, stored: str | None) -> bool:
+    """
+    Check a password against a stored hash in either format.
+    """
+    if not stored:
+        return False
+
+    if not stored.startswith(f"${HASH_SCHEME}$"):
+        # Legacy hash from the C++ library
+        return hmac.compare_digest(encrypt_password(password).encode("utf-8"), stored.encode("utf-8"))
+
+    try:
+        _, _, iterations, salt, expected = stored.split("$")
+        digest = hashlib.pbkdf2_hmac(
+            "sha256", password.encode("utf-8"), _b64decode(salt), int(iterations)
+        )
+    except ValueError:
+        return False
+    return hmac.compare_digest(_b64encode(digest), expected)
+
+
+def needs_rehash(stored: str | None) -> bool:
+    """
+    True for legacy hashes and for hashes made with a lower cost than configured.
+    """
+    if not stored or not stored.startswith(f"${HASH_SCHEME}$"):
+        return True
+    try:
+        iterations = int(stored.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return iterations < settings.PASSWORD_HASH_ITERATIONS
+
+
+# ------------ Worker pool ------------
+# Hashing is CPU bound, so the async helpers below run it on a process pool
+# and keep the event loop free. The semaphore caps how many hashes can be
+# queued at once; past that, callers get PasswordHasherBusy instead of
+# piling up latency.
+
+_pool = None
+_pool_lock = threading.Lock()
+_queue_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_MAX_QUEUE)
+
+
+def _get_pool():
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None:
+            # Imported here, the pool is only needed once someone logs in
+            from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+            workers = settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+            try:
+                _pool = ProcessPoolExecutor(max_workers=workers)
+            except (OSError, NotImplementedError) as e:
+                # Some serverless sandboxes cannot start processes;
+                # pbkdf2_hmac releases the GIL so threads still help
+                print(f"\nWARNING: Process pool unavailable ({e}), hashing on threads.\n")
+                _pool = ThreadPoolExecutor(max_workers=workers)
+    return _pool
+
+
+async def _run_in_pool(fn, *args):
+    if not _queue_slots.acquire(blocking=False):
+        raise PasswordHasherBusy("Password hashing queue is full")
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_pool(), fn, *args)
+    finally:
+        _queue_slots.release()
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_pool(hash_password, password, settings.PASSWORD_HASH_ITERATIONS)
+
+
+async def verify_password_async(password: str, stored: str | None) -> bool:
+    return await _run_in_pool(verify_password, password, stored)
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
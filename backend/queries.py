@@ -1,21 +1,28 @@
+from sqlalchemy import bindparam, func, insert, or_, update
+from sqlalchemy.orm import aliased
 from sqlalchemy.orm import Session
 from models import *
 
-from cpp_bridge import encrypt_password
+from auth import invalidate_cached_user
+from cache import feed_cache, club_feed_namespace, ALL_EVENTS_NAMESPACE
+from passwords import DUMMY_HASH, hash_password, verify_password
+# The in-process indexes (timelines, recommendations, club_graph, search,
+# intervals) are imported where they are used, see core_logic.py
 
 # ------------ DB + Core Functions for Users ------------
 
 # Function for creating a user (signing up)
 # CHANGE: Added 'db: Session' as the first argument
-def create_user(db: Session, email: str, password: str, name: str, profiledescription: str | None = None):
+# password_hash can be passed in when the caller already hashed off the request thread
+def create_user(db: Session, email: str, password: str, name: str, profiledescription: str | None = None, password_hash: str | None = None):
     # 1. Check if user already exists   
     existing_user = db.query(Users).filter(Users.email == email).first()
     if existing_user:
         print(f"User with email {email} already exists.")
         return None
     
-    # 2. ENCRYPT THE PASSWORD (C++ Bridge)
-    hashed_password = encrypt_password(password)
+    # 2. HASH THE PASSWORD (salted, see passwords.py)
+    hashed_password = password_hash or hash_password(password)
 
     # 3. Create the User Object
     new_user = Users(
@@ -45,15 +52,14 @@ def check_existing_user(db: Session, email: str, password: str):
         existing_user = db.query(Users).filter(Users.email == email).first()
 
         if existing_user is None:
+            # Same hashing cost as a wrong password, see DUMMY_HASH
+            verify_password(password, DUMMY_HASH)
             print(f"Login failed: User not found")
             return None
         
-        # 2. ENCRYPT INPUT PASSWORD AND COMPARE
-        # We hash the input "password123" -> "1a2b..." 
-        # and check if it matches the stored hash.
-        input_hash = encrypt_password(password)
-        
-        if existing_user.password == input_hash:
+        # 2. VERIFY INPUT PASSWORD AGAINST THE STORED HASH
+        # Works for both salted hashes and legacy C++ hashes
+        if verify_password(password, existing_user.password):
             print(f"Login successful for {email}")
             return existing_user
         else:
@@ -64,6 +70,28 @@ def check_existing_user(db: Session, email: str, password: str):
         # Rollback in case of error
         print(f"Error has occured when trying to add log in: {e}")
 
+# Function for getting a user by email
+def get_user_by_email(db: Session, email: str):
+    try:
+        return db.query(Users).filter(Users.email == email).first()
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error has occured when trying to get user {email}: {e}")
+        return None
+
+# Function for replacing a user's stored password hash (e.g. upgrading a legacy hash)
+def update_user_password(db: Session, user_id: int, password_hash: str):
+    try:
+        db.query(Users).filter(Users.userid == user_id).update({"password": password_hash})
+        db.commit()
+        return True
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error has occured when trying to update password for user {user_id}: {e}")
+        return False
+
 # Function for updating user profile info (name and profile description)
 def update_user_profile(db: Session, email: str, name: str, profiledescription: str):
     user = db.query(Users).filter(Users.email == email).first()
@@ -78,6 +106,9 @@ def update_user_profile(db: Session, email: str, name: str, profiledescription:
         user.profiledescription = profiledescription
         db.commit()
         db.refresh(user)
+
+        # Cached principal is now stale
+        invalidate_cached_user(user.userid)
         return user
 
     # Rollback and print error mssg in case of error
@@ -91,6 +122,7 @@ def update_user_profile(db: Session, email: str, name: str, profiledescription:
 # Function for creating a club
 def create_clubs(db: Session, clubname: str, description: str):
     
+    from search import search_index, model_fields
     new_club = Clubs(clubname=clubname, description=description)
 
     try:
@@ -100,6 +132,7 @@ def create_clubs(db: Session, clubname: str, description: str):
 
         # Refresh object to get its ID
         db.refresh(new_club)
+        search_index.upsert("club", new_club.clubid, model_fields("club", new_club))
 
         print(f"New club has been successfully added.")
         return new_club
@@ -122,6 +155,7 @@ def get_all_clubs(db: Session):
 
 # Function for updating club profile info (name and profile description)
 def update_club_profile(db: Session, club_id: int, name: str, profiledescription: str):
+    from search import search_index, model_fields
     club = db.query(Clubs).filter_by(clubid=club_id).first()
     
     # If club does not exist, return None
@@ -132,8 +166,18 @@ def update_club_profile(db: Session, club_id: int, name: str, profiledescription
     try:
         club.clubname = name
         club.description = profiledescription
+        # Feed pages show the club name, so their ETags must change too
+        club.contentversion = Clubs.contentversion + 1
         db.commit()
         db.refresh(club)
+        search_index.upsert("club", club_id, model_fields("club", club))
+
+        # Cached feed pages carry the club name
+        feed_cache.invalidate(
+            club_feed_namespace(club_id, "events"),
+            club_feed_namespace(club_id, "posts"),
+            ALL_EVENTS_NAMESPACE,
+        )
         return club
 
     # Rollback and print error mssg in case of error
@@ -147,6 +191,7 @@ def update_club_profile(db: Session, club_id: int, name: str, profiledescription
 # Function for creating a tag
 def create_tags(db: Session, tagname: str):
     
+    from recommendations import club_tag_index
     new_tag = Tags(tagname=tagname)
 
     try:
@@ -157,6 +202,9 @@ def create_tags(db: Session, tagname: str):
         # Refresh object to get its ID
         db.refresh(new_tag)
 
+        # Keep the recommendation index in sync
+        club_tag_index.add_tag(new_tag.tagid)
+
         print(f"New tag has been successfully added.")
         return new_tag
     
@@ -165,27 +213,88 @@ def create_tags(db: Session, tagname: str):
         db.rollback()
         print(f"Error has occured when trying to add new tag: {e}")
 
-# Function for adding user tags that reflects user's selected interests during sign up
-def create_user_tags(db: Session, user_id: int, tags: list[str]):
-    tag_ids = []
+# Function for finding existing tags case-insensitively in one query
+# spellings: {str.lower() of the tag: spelling}. SQL lower() only folds ASCII
+# on SQLite, so tags are also matched on their exact spelling, and the result
+# is keyed on str.lower() of the name the DB returns (lowest tag id wins).
+# Both conditions are indexed (ix_tags_lower_tagname and the unique tagname).
+def lookup_tag_ids(db: Session, spellings: dict[str, str]) -> dict[str, int]:
+    found = {}
+    if not spellings:
+        return found
+    rows = db.query(Tags.tagid, Tags.tagname).filter(or_(
+        func.lower(Tags.tagname).in_(list(spellings)),
+        Tags.tagname.in_(list(spellings.values())),
+    )).order_by(Tags.tagid).all()
+    for tag_id, name in rows:
+        if name.lower() in spellings:
+            found.setdefault(name.lower(), tag_id)
+    return found
+
+# Function to look up tag ids for a list of tag names in one case-insensitive query
+# Returns ({lowercase name: tag id}, [names in request order, deduped])
+def resolve_tag_ids(db: Session, tags: list[str]):
+    spellings = {}
     for tag in tags:
-        tag = db.query(Tags).filter(Tags.tagname.ilike(tag)).first()
-        if tag:
-            tag_ids.append(tag.tagid)
-    
-    for tag_id in tag_ids:
-        # Check if already exists to prevent errors
-        existing_tag = db.query(UserTags).filter(
-            UserTags.userid == user_id, 
-            UserTags.tagid == tag_id
-        ).first()
-        
-        if not existing_tag:
-            user_tag = UserTags(userid=user_id, tagid=tag_id)
-            db.add(user_tag)
-            db.commit()
+        spellings.setdefault(tag.strip().lower(), tag.strip())
+    spellings.pop("", None)
+
+    return lookup_tag_ids(db, spellings), list(spellings.values())
+
+# Function for linking tags to a user or club in a single transaction
+# owner_column is the link table's owner key column (UserTags.userid or ClubTags.clubid)
+# Returns (report, added tag ids), report lists added, skipped (already linked) and unknown
+# tag names; report is None on error
+def _bulk_assign_tags(db: Session, link_model, owner_column, owner_id: int, tags: list[str]):
+    report = {"added": [], "skipped": [], "unknown": []}
+
+    # 1. Resolve every tag name in one query
+    tag_ids_by_name, names = resolve_tag_ids(db, tags)
+    if not names:
+        return report, []
+
+    wanted = {}
+    for name in names:
+        tag_id = tag_ids_by_name.get(name.lower())
+        if tag_id is None:
+            report["unknown"].append(name)
         else:
-            print(f"User {user_id} already has tag {tag_id}")
+            wanted[tag_id] = name
+
+    if not wanted:
+        return report, []
+
+    try:
+        # 2. Find the links that already exist in one query
+        existing = {
+            tag_id for (tag_id,) in db.query(link_model.tagid)
+            .filter(owner_column == owner_id, link_model.tagid.in_(wanted.keys()))
+            .all()
+        }
+
+        # 3. Insert the missing links in one statement and one commit
+        new_rows = [
+            {owner_column.key: owner_id, "tagid": tag_id}
+            for tag_id in wanted if tag_id not in existing
+        ]
+        if new_rows:
+            db.execute(insert(link_model), new_rows)
+            db.commit()
+
+        report["added"] = [wanted[row["tagid"]] for row in new_rows]
+        report["skipped"] = [wanted[tag_id] for tag_id in wanted if tag_id in existing]
+        return report, [row["tagid"] for row in new_rows]
+
+    except Exception as e:
+        # Rollback in case of error
+        db.rollback()
+        print(f"Error has occured when trying to add tags for {owner_column.key} {owner_id}: {e}")
+        return None, []
+
+# Function for adding user tags that reflects user's selected interests during sign up
+def create_user_tags(db: Session, user_id: int, tags: list[str]):
+    report, _ = _bulk_assign_tags(db, UserTags, UserTags.userid, user_id, tags)
+    return report
 
 # Function to get all tags from a specific user
 def get_user_tags(db: Session, user_id: int):
@@ -201,25 +310,14 @@ def get_user_tags(db: Session, user_id: int):
 
 # Function for adding club tags
 def create_club_tags(db: Session, club_id: int, tags: list[str]):
-    tag_ids = []
-    for tag in tags:
-        tag = db.query(Tags).filter(Tags.tagname.ilike(tag)).first()
-        if tag:
-            tag_ids.append(tag.tagid)
-    
-    for tag_id in tag_ids:
-        # Check if already exists to prevent errors
-        existing_tag = db.query(ClubTags).filter(
-            ClubTags.clubid == club_id, 
-            ClubTags.tagid == tag_id
-        ).first()
-        
-        if not existing_tag:
-            club_tag = ClubTags(clubid=club_id, tagid=tag_id)
-            db.add(club_tag)
-            db.commit()
-        else:
-            print(f"Club {club_tag} already has tag {tag_id}")
+    from recommendations import club_tag_index
+    report, added_ids = _bulk_assign_tags(db, ClubTags, ClubTags.clubid, club_id, tags)
+
+    # Keep the recommendation index in sync
+    if added_ids:
+        club_tag_index.add_club_tags(club_id, added_ids)
+
+    return report
 
 # Function to get all tags from a specific club
 def get_club_tags(db: Session, club_id: int):
@@ -233,43 +331,33 @@ def get_club_tags(db: Session, club_id: int):
         db.rollback()
         print(f"Error has occured when trying to get club tags: {e}")
 
-# Function to get list of recommended clubs based on tags for a specific user 
-def get_recommended_clubs(db: Session, user_id: int):
+# Function to get list of recommended clubs based on tags for a specific user
+# Clubs are ranked by tag overlap using the in-process inverted index
+# scoring: "count" (shared tags), "jaccard" or "idf" (rare tags weigh more)
+def get_recommended_clubs(db: Session, user_id: int, scoring: str = "count", limit: int | None = None):
+    from recommendations import club_tag_index, SCORING_MODES
+    if scoring not in SCORING_MODES:
+        raise ValueError(f"Unknown scoring mode: {scoring}")
+
     try:
 
-        # Get all tags from specific user
-        user_tags = get_user_tags(db, user_id)
-        if not user_tags:
+        # Get all tag ids from specific user
+        user_tag_ids = {tag_id for (tag_id,) in db.query(UserTags.tagid).filter(UserTags.userid == user_id).all()}
+        if not user_tag_ids:
             return []
-        
-        # Convert into set of user tag ids
-        user_tag_ids = set()
-        for tag in user_tags:
-            user_tag_ids.add(tag.tagid)
-
-        # Get all clubs
-        all_clubs = get_all_clubs(db)
 
-        recommended_clubs = []
-
-        # Check club tags for all clubs
-        for club in all_clubs:
-            club_tags = get_club_tags(db, club.clubid)
+        # Rank clubs that share at least one tag with the user
+        ranked = club_tag_index.score(db, user_tag_ids, scoring=scoring, limit=limit)
+        if not ranked:
+            return []
 
-            # Convert into set of club tag ids
-            club_tag_ids = set()
-            for tag in club_tags:
-                club_tag_ids.add(tag.tagid)
-        
-            # Compare user's tags and club's tags 
-            common_interests = user_tag_ids.intersection(club_tag_ids)
+        # Load the ranked clubs in one query and keep the ranking order
+        club_ids = [club_id for club_id, _ in ranked]
+        clubs = db.query(Clubs).filter(Clubs.clubid.in_(club_ids)).all()
+        club_map = {club.clubid: club for club in clubs}
 
-            # If shared tags exist, then add to list of recommended clubs
-            if common_interests:
-                recommended_clubs.append(club)
-        
         # Return list of recommended clubs
-        return recommended_clubs
+        return [club_map[club_id] for club_id in club_ids if club_id in club_map]
 
     except Exception as e:
         # Rollback in case of error
@@ -279,6 +367,16 @@ def get_recommended_clubs(db: Session, user_id: int):
 
 # ------------ DB + Core Functions for Membership ------------
 
+# Function for adjusting a club's follower/admin counts inside the caller's transaction
+# The UPDATE adds to the stored value, so concurrent writers cannot lose an increment
+def _adjust_member_counts(db: Session, club_id: int, followers: int = 0, admins: int = 0):
+    if not followers and not admins:
+        return
+    db.query(Clubs).filter(Clubs.clubid == club_id).update(
+        {Clubs.followercount: Clubs.followercount + followers, Clubs.admincount: Clubs.admincount + admins},
+        synchronize_session=False,
+    )
+
 # Function for checking membership
 def check_membership(db: Session, user_id: int, club_id: int):
     try:
@@ -294,6 +392,7 @@ def check_membership(db: Session, user_id: int, club_id: int):
 # Function for following a club
 def follow_club(db: Session, user_id: int, club_id: int):
 
+    from timelines import timeline_store
     # Check if already following
     existing_follower = check_membership(db, user_id, club_id)
 
@@ -303,11 +402,16 @@ def follow_club(db: Session, user_id: int, club_id: int):
     # Create ClubMembership Object
     new_follower = ClubMembership(userid=user_id, clubid=club_id, role="Follower")
 
-    # Save to DB
+    # Save to DB, with the count in the same transaction
     try:
         db.add(new_follower)
+        db.flush()
+        _adjust_member_counts(db, club_id, followers=1)
         db.commit()
         db.refresh(new_follower)
+
+        # Home timeline is rebuilt with the new club on next read
+        timeline_store.invalidate_user(user_id)
         return new_follower
 
     except Exception as e:
@@ -318,6 +422,7 @@ def follow_club(db: Session, user_id: int, club_id: int):
 # Function for unfollowing a club
 def unfollow_club(db: Session, user_id: int, club_id: int):
 
+    from timelines import timeline_store
     # Check if already following
     existing_follower = check_membership(db, user_id, club_id)
 
@@ -326,10 +431,16 @@ def unfollow_club(db: Session, user_id: int, club_id: int):
         return None
 
     try:
-        # Unfollow
-        db.query(ClubMembership).filter_by(userid=user_id, clubid=club_id).delete()
+        # Unfollow, counting only the rows this transaction actually deleted
+        membership = db.query(ClubMembership).filter_by(userid=user_id, clubid=club_id)
+        admins_removed = membership.filter(ClubMembership.role == "Admin").delete(synchronize_session=False)
+        removed = admins_removed + membership.delete(synchronize_session=False)
+        _adjust_member_counts(db, club_id, followers=-removed, admins=-admins_removed)
         db.commit()
 
+        # Home timeline is rebuilt without the club on next read
+        timeline_store.invalidate_user(user_id)
+
     # Rollback and print error mssg in case of error
     except Exception as e:
         db.rollback()
@@ -350,6 +461,7 @@ def get_all_followed_clubs(db: Session, user_id: int):
         return None
 
 # Function for getting all followers for a specific club
+# Loads every follower, use get_club_followers_page for large clubs
 def get_all_club_followers(db: Session, club_id: int):
     try:
         # Get all followers for that club
@@ -410,6 +522,7 @@ def get_all_admin_clubs_for_user(db: Session, user_id: int):
 
 # Function to add new club admin
 def add_club_admin(db: Session, user_id: int, club_id: int):
+    from timelines import timeline_store
     try:
         # Check club membership table
         membership = check_membership(db, user_id, club_id)
@@ -420,17 +533,26 @@ def add_club_admin(db: Session, user_id: int, club_id: int):
             # Create new ClubMembership object with Admin role
             new_admin = ClubMembership(userid=user_id, clubid=club_id, role="Admin")
 
-            # Save to DB
+            # Save to DB, with the counts in the same transaction
             db.add(new_admin)
+            db.flush()
+            _adjust_member_counts(db, club_id, followers=1, admins=1)
             db.commit()
+
+            # Admins follow the club too
+            timeline_store.invalidate_user(user_id)
             return new_admin
         
         # If membership exists
         else:
-            # If role is not Admin, change to Admin
+            # If role is not Admin, change to Admin (counted only if this update did it)
             if membership.role!="Admin":
-                membership.role="Admin"
+                promoted = db.query(ClubMembership).filter(
+                    ClubMembership.userid == user_id, ClubMembership.clubid == club_id, ClubMembership.role != "Admin"
+                ).update({"role": "Admin"}, synchronize_session=False)
+                _adjust_member_counts(db, club_id, admins=promoted)
                 db.commit()
+                db.refresh(membership)
             return membership
 
     except Exception as e:
@@ -452,8 +574,11 @@ def remove_club_admin(db: Session, user_id: int, club_id: int):
         # If membership role is Admin
         if membership.role=="Admin":
 
-            # Update role from Admin to Follower
-            db.query(ClubMembership).filter_by(userid=user_id, clubid=club_id).update({"role": "Follower"})
+            # Update role from Admin to Follower (counted only if this update did it)
+            demoted = db.query(ClubMembership).filter_by(userid=user_id, clubid=club_id, role="Admin").update(
+                {"role": "Follower"}, synchronize_session=False
+            )
+            _adjust_member_counts(db, club_id, admins=-demoted)
             db.commit()
     
     # Rollback and print error mssg in case of error
@@ -462,6 +587,52 @@ def remove_club_admin(db: Session, user_id: int, club_id: int):
         print(f"Error has occured when removing club admin {user_id} from club {club_id}: {e}")
         return None
     
+# Function for getting one page of a club's followers, ordered by user id
+# Returns [(userid, name, role)] for users after after_user_id, at most limit rows
+def get_club_followers_page(db: Session, club_id: int, after_user_id: int | None = None, limit: int = 50):
+    try:
+        query = db.query(Users.userid, Users.name, ClubMembership.role).join(
+            ClubMembership, Users.userid == ClubMembership.userid
+        ).filter(ClubMembership.clubid == club_id)
+        if after_user_id is not None:
+            query = query.filter(ClubMembership.userid > after_user_id)
+        return query.order_by(ClubMembership.userid).limit(limit).all()
+
+    except Exception as e:
+        # Rollback in case of error
+        db.rollback()
+        print(f"Error has occured when getting followers for club {club_id}: {e}")
+        return None
+
+# Function for recomputing every club's follower/admin counts from clubmembership
+# For rows written before the columns existed, or after bulk loads that bypass follow_club
+# Returns the number of clubs with members
+def backfill_club_member_counts(db: Session):
+    try:
+        counts = db.query(
+            ClubMembership.clubid,
+            func.count(),
+            func.count().filter(ClubMembership.role == "Admin"),
+        ).group_by(ClubMembership.clubid).all()
+
+        # Clubs with no members at all get zeros
+        db.query(Clubs).update({Clubs.followercount: 0, Clubs.admincount: 0}, synchronize_session=False)
+        if counts:
+            db.execute(
+                update(Clubs.__table__).where(Clubs.clubid == bindparam("b_clubid")),
+                [
+                    {"b_clubid": club_id, "followercount": followers, "admincount": admins}
+                    for club_id, followers, admins in counts
+                ],
+            )
+        db.commit()
+        return len(counts)
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error has occured when backfilling club member counts: {e}")
+        return None
+
 # ------------ DB + Core Functions for Admin Mode ------------
 
 # Function for checking membership/follow-status between clubs
@@ -479,6 +650,7 @@ def check_club_to_club_membership(db: Session, club_id1: int, club_id2: int):
 # Function for following a club as a club
 def follow_club_as_club(db: Session, club_id1: int, club_id2: int):
 
+    from club_graph import club_graph
     # Check if already following
     existing_follower = check_club_to_club_membership(db, club_id1, club_id2)
 
@@ -494,6 +666,9 @@ def follow_club_as_club(db: Session, club_id1: int, club_id2: int):
         db.add(new_follower)
         db.commit()
         db.refresh(new_follower)
+
+        # Keep the in-memory club graph in step
+        club_graph.add_edge(club_id1, club_id2)
         return new_follower
 
     except Exception as e:
@@ -504,6 +679,7 @@ def follow_club_as_club(db: Session, club_id1: int, club_id2: int):
 # Function for unfollowing a club as a club
 def unfollow_club_as_club(db: Session, club_id1: int, club_id2: int):
 
+    from club_graph import club_graph
     # Check if already following
     existing_follower = check_club_to_club_membership(db, club_id1, club_id2)
 
@@ -516,6 +692,9 @@ def unfollow_club_as_club(db: Session, club_id1: int, club_id2: int):
         db.query(ClubToClubMembership).filter_by(club1id=club_id1, club2id=club_id2).delete()
         db.commit()
 
+        # Keep the in-memory club graph in step
+        club_graph.remove_edge(club_id1, club_id2)
+
     # Rollback and print error mssg in case of error
     except Exception as e:
         db.rollback()
@@ -523,6 +702,7 @@ def unfollow_club_as_club(db: Session, club_id1: int, club_id2: int):
         return None
 
 # Function for getting all clubs followed by a club
+# For ids only, club_graph.following(db, club_id) answers from memory
 def get_all_followed_clubs_by_club(db: Session, club_id: int):
     try:
         # Get all clubs that the club follows
@@ -534,3 +714,256 @@ def get_all_followed_clubs_by_club(db: Session, club_id: int):
         db.rollback()
         print(f"Error has occured when getting all followed clubs for club {club_id}: {e}")
         return None
+
+# ------------ DB + Core Functions for Events ------------
+
+# Function for filling Events.durationclass on rows written before the column existed
+# Returns the number of events updated
+def backfill_event_duration_classes(db: Session, batch_size: int = 1000):
+    from intervals import duration_class
+    updated = 0
+    try:
+        while True:
+            rows = db.query(Events.eventid, Events.startdatetime, Events.enddatetime).filter(
+                Events.durationclass.is_(None)
+            ).limit(batch_size).all()
+            if not rows:
+                return updated
+            db.execute(
+                update(Events.__table__).where(Events.eventid == bindparam("b_eventid")),
+                [
+                    {"b_eventid": event_id, "durationclass": duration_class(start, end)}
+                    for event_id, start, end in rows
+                ],
+            )
+            db.commit()
+            updated += len(rows)
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error has occured when backfilling event duration classes: {e}")
+        return None
+
+# ------------ DB + Core Functions for Messaging ------------
+
+# Function for getting (or creating) the conversation between two users
+def get_or_create_conversation(db: Session, user_id1: int, user_id2: int):
+    # Store each pair once, lowest user id first
+    low, high = sorted((user_id1, user_id2))
+    try:
+        conversation = db.query(Conversations).filter_by(user1id=low, user2id=high).first()
+        if conversation:
+            return conversation
+
+        conversation = Conversations(user1id=low, user2id=high)
+        db.add(conversation)
+        db.flush()
+        # Both inbox rows are created with the conversation
+        db.add_all([
+            ConversationReadState(userid=low, conversationid=conversation.conversationid),
+            ConversationReadState(userid=high, conversationid=conversation.conversationid),
+        ])
+        db.commit()
+        db.refresh(conversation)
+        return conversation
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error has occured when getting conversation for users {low} and {high}: {e}")
+        return None
+
+# Function for getting the ids of every conversation a user takes part in
+def get_user_conversation_ids(db: Session, user_id: int):
+    try:
+        rows = db.query(Conversations.conversationid).filter(
+            (Conversations.user1id == user_id) | (Conversations.user2id == user_id)
+        ).all()
+        return {conversation_id for (conversation_id,) in rows}
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error has occured when getting conversations for user {user_id}: {e}")
+        return set()
+
+# Function for checking that a user takes part in a conversation
+def is_conversation_member(db: Session, conversation_id: int, user_id: int):
+    try:
+        return db.query(Conversations.conversationid).filter(
+            Conversations.conversationid == conversation_id,
+            (Conversations.user1id == user_id) | (Conversations.user2id == user_id),
+        ).first() is not None
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error has occured when checking conversation {conversation_id} for user {user_id}: {e}")
+        return False
+
+# Function for saving a batch of messages in one statement and one commit
+# rows are dicts with conversationid, senderid, content and timestamp
+def create_messages_bulk(db: Session, rows: list[dict]):
+    if not rows:
+        return True
+    try:
+        db.execute(insert(Messages), rows)
+        _apply_read_state_updates(db, rows)
+        db.commit()
+        return True
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error has occured when saving {len(rows)} messages: {e}")
+        return False
+
+
+# Statements for keeping ConversationReadState in step with new messages,
+# run as executemany inside the message insert transaction
+_read_state = ConversationReadState.__table__
+
+_bump_unread = (
+    update(_read_state)
+    .where(
+        _read_state.c.conversationid == bindparam("b_conversationid"),
+        _read_state.c.userid != bindparam("b_senderid"),
+    )
+    .values(unreadcount=_read_state.c.unreadcount + bindparam("b_count"))
+)
+
+_set_last_message = (
+    update(_read_state)
+    .where(
+        _read_state.c.conversationid == bindparam("b_conversationid"),
+        (_read_state.c.lastmessagetime.is_(None))
+        | (_read_state.c.lastmessagetime <= bindparam("b_timestamp")),
+    )
+    .values(
+        lastmessagecontent=bindparam("b_content"),
+        lastmessagesenderid=bindparam("b_senderid"),
+        lastmessagetime=bindparam("b_timestamp"),
+    )
+)
+
+# Fold a batch of message rows into per-conversation counter and last-message updates
+# Does not commit, the caller commits together with the messages
+def _apply_read_state_updates(db: Session, rows: list[dict]):
+    counts: dict[tuple[int, int], int] = {}
+    latest: dict[int, dict] = {}
+    for row in rows:
+        key = (row["conversationid"], row["senderid"])
+        counts[key] = counts.get(key, 0) + 1
+        current = latest.get(row["conversationid"])
+        if current is None or row["timestamp"] >= current["timestamp"]:
+            latest[row["conversationid"]] = row
+
+    # Everyone in the conversation except the sender gets the messages as unread
+    db.execute(_bump_unread, [
+        {"b_conversationid": conversation_id, "b_senderid": sender_id, "b_count": count}
+        for (conversation_id, sender_id), count in counts.items()
+    ])
+    db.execute(_set_last_message, [
+        {
+            "b_conversationid": conversation_id,
+            "b_content": row["content"],
+            "b_senderid": row["senderid"],
+            "b_timestamp": row["timestamp"],
+        }
+        for conversation_id, row in latest.items()
+    ])
+
+# Function for marking every message in a conversation as read for a user
+# Returns False if the user has no read state for that conversation, None on a DB error
+def mark_conversation_read(db: Session, user_id: int, conversation_id: int):
+    try:
+        result = db.execute(
+            update(_read_state)
+            .where(
+                _read_state.c.userid == user_id,
+                _read_state.c.conversationid == conversation_id,
+            )
+            .values(
+                unreadcount=0,
+                lastreadtime=func.coalesce(_read_state.c.lastmessagetime, _read_state.c.lastreadtime),
+            )
+        )
+        db.commit()
+        return result.rowcount > 0
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error has occured when marking conversation {conversation_id} read for user {user_id}: {e}")
+        return None
+
+# Function for listing a user's conversations, most recent message first
+# One query on the user's read state rows, however long the histories are
+def get_inbox(db: Session, user_id: int):
+    other = aliased(Users)
+    other_id = func.coalesce(
+        func.nullif(Conversations.user1id, user_id), Conversations.user2id
+    )
+    try:
+        return db.query(
+            ConversationReadState.conversationid,
+            ConversationReadState.unreadcount,
+            ConversationReadState.lastmessagecontent,
+            ConversationReadState.lastmessagesenderid,
+            ConversationReadState.lastmessagetime,
+            other.userid,
+            other.name,
+        ).join(
+            Conversations, Conversations.conversationid == ConversationReadState.conversationid
+        ).join(
+            other, other.userid == other_id
+        ).filter(
+            ConversationReadState.userid == user_id
+        ).order_by(
+            ConversationReadState.lastmessagetime.desc().nulls_last(),
+            ConversationReadState.conversationid.desc(),
+        ).all()
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error has occured when getting the inbox for user {user_id}: {e}")
+        return None
+
+# Function for rebuilding every read state row from the messages table
+# Used once to backfill existing conversations, and to repair counters
+# Messages newer than lastreadtime count as unread
+def rebuild_conversation_read_states(db: Session):
+    try:
+        conversations = db.query(
+            Conversations.conversationid, Conversations.user1id, Conversations.user2id
+        ).all()
+        existing = {
+            (state.userid, state.conversationid): state
+            for state in db.query(ConversationReadState).all()
+        }
+
+        for conversation_id, user1_id, user2_id in conversations:
+            last = db.query(Messages).filter(
+                Messages.conversationid == conversation_id
+            ).order_by(Messages.timestamp.desc(), Messages.messageid.desc()).first()
+
+            for user_id, other_id in ((user1_id, user2_id), (user2_id, user1_id)):
+                state = existing.get((user_id, conversation_id))
+                if state is None:
+                    state = ConversationReadState(userid=user_id, conversationid=conversation_id)
+                    db.add(state)
+
+                unread = db.query(func.count(Messages.messageid)).filter(
+                    Messages.conversationid == conversation_id,
+                    Messages.senderid == other_id,
+                )
+                if state.lastreadtime is not None:
+                    unread = unread.filter(Messages.timestamp > state.lastreadtime)
+
+                state.unreadcount = unread.scalar() or 0
+                state.lastmessagecontent = last.content if last else None
+                state.lastmessagesenderid = last.senderid if last else None
+                state.lastmessagetime = last.timestamp if last else None
+
+        db.commit()
+        return len(conversations)
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error has occured when rebuilding conversation read states: {e}")
+        return None
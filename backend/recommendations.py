@@ -0,0 +1,152 @@
+import heapq
+import math
+import threading
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from config import settings
+from models import ClubTags
+
+# ------------ In-process recommendation engine ------------
+
+# Supported ways of scoring a club against a user's interests
+SCORING_MODES = ("count", "jaccard", "idf")
+
+
+class ClubTagIndex:
+    """
+    Inverted index of tag -> clubs (plus the forward club -> tags map).
+
+    The index is loaded from the clubtags table on first use, kept up to
+    date by create_tags / create_club_tags in queries.py, and reloaded once
+    ttl seconds have passed (for writes made through other instances). A
+    load that overlaps a write may miss it, so it answers that call but is
+    reloaded on the next one. Scoring a user only touches the posting lists
+    of the user's own tags, so the cost does not grow with the total number
+    of clubs.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # None until the first load; -inf marks a load that must be redone
+        self._loaded_at: float | None = None
+        # Bumped by every write, to spot writes that overlap a load
+        self._generation = 0
+        self.tag_to_clubs: dict[int, set[int]] = {}
+        self.club_to_tags: dict[int, set[int]] = {}
+
+    def _fresh(self) -> bool:
+        loaded_at = self._loaded_at
+        return loaded_at is not None and time.monotonic() - loaded_at <= self.ttl
+
+    # Load every (clubid, tagid) pair in a single query
+    def _ensure_loaded(self, db: Session):
+        if self._fresh():
+            return
+        generation = self._generation
+        self._load_rows(db.query(ClubTags.clubid, ClubTags.tagid).all(), generation)
+
+    # Same as _ensure_loaded, for an AsyncSession
+    async def ensure_loaded_async(self, db):
+        if self._fresh():
+            return
+        generation = self._generation
+        result = await db.execute(select(ClubTags.clubid, ClubTags.tagid))
+        self._load_rows(result.all(), generation)
+
+    # generation is self._generation as read before the rows were queried
+    def _load_rows(self, rows, generation: int):
+        tag_to_clubs: dict[int, set[int]] = {}
+        club_to_tags: dict[int, set[int]] = {}
+        for club_id, tag_id in rows:
+            tag_to_clubs.setdefault(tag_id, set()).add(club_id)
+            club_to_tags.setdefault(club_id, set()).add(tag_id)
+        with self._lock:
+            # Another caller may have finished loading first
+            if self._fresh():
+                return
+            self.tag_to_clubs = tag_to_clubs
+            self.club_to_tags = club_to_tags
+            self._loaded_at = time.monotonic() if generation == self._generation else float("-inf")
+
+    # Register a new tag with an empty posting list
+    def add_tag(self, tag_id: int):
+        with self._lock:
+            self._generation += 1
+            if self._loaded_at is None:
+                return
+            self.tag_to_clubs.setdefault(tag_id, set())
+
+    # Record that a club now has the given tags
+    def add_club_tags(self, club_id: int, tag_ids):
+        with self._lock:
+            self._generation += 1
+            # Nothing more to do before the first load, the rows will be read from the DB
+            if self._loaded_at is None:
+                return
+            club_tags = self.club_to_tags.setdefault(club_id, set())
+            for tag_id in tag_ids:
+                self.tag_to_clubs.setdefault(tag_id, set()).add(club_id)
+                club_tags.add(tag_id)
+
+    # Drop everything so the next call reloads from the DB
+    def reset(self):
+        with self._lock:
+            self.tag_to_clubs = {}
+            self.club_to_tags = {}
+            self._loaded_at = None
+            self._generation += 1
+
+    def _idf(self, tag_id: int) -> float:
+        # Smoothed inverse document frequency, rare tags weigh more
+        n_clubs = len(self.club_to_tags)
+        df = len(self.tag_to_clubs.get(tag_id, ()))
+        return math.log((n_clubs + 1) / (df + 1)) + 1.0
+
+    def score(self, db: Session, user_tag_ids, scoring: str = "count", limit: int | None = None):
+        """
+        Rank clubs by how well their tags overlap the user's tags.
+
+        Returns a list of (club_id, score) pairs, best first. Ties are broken
+        by club id so the order is stable between calls.
+        """
+        if scoring not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode: {scoring}")
+
+        # db may be None when the caller has already loaded the index
+        if db is not None:
+            self._ensure_loaded(db)
+        user_tag_ids = set(user_tag_ids)
+        if not user_tag_ids:
+            return []
+
+        # Accumulate per-club scores by walking only the user's posting lists
+        overlap: dict[int, float] = {}
+        with self._lock:
+            for tag_id in user_tag_ids:
+                clubs = self.tag_to_clubs.get(tag_id)
+                if not clubs:
+                    continue
+                weight = self._idf(tag_id) if scoring == "idf" else 1.0
+                for club_id in clubs:
+                    overlap[club_id] = overlap.get(club_id, 0.0) + weight
+
+            if scoring == "jaccard":
+                n_user = len(user_tag_ids)
+                for club_id, shared in overlap.items():
+                    n_club = len(self.club_to_tags.get(club_id, ()))
+                    overlap[club_id] = shared / (n_user + n_club - shared)
+
+        # Top-k selection instead of a full sort when a limit is given
+        def rank_key(item):
+            return (item[1], -item[0])
+
+        if limit is not None:
+            return heapq.nlargest(limit, overlap.items(), key=rank_key)
+        return sorted(overlap.items(), key=rank_key, reverse=True)
+
+
+# Shared index for this process
+club_tag_index = ClubTagIndex(ttl=settings.CLUB_TAG_INDEX_TTL_SECONDS)
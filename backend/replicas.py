@@ -0,0 +1,179 @@
+import itertools
+import math
+import threading
+import time
+from http.cookies import SimpleCookie
+
+from fastapi import Request
+from sqlalchemy import exc
+
+from config import settings
+from database import get_async_db, make_async_engine, to_async_url
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+except ImportError:
+    async_sessionmaker = None
+
+# ------------ Read replica routing ------------
+#
+# With DATABASE_REPLICA_URLS set, routes that only read and can live with
+# a few seconds of replication lag take their session from get_read_async_db
+# instead of get_async_db. Everything else stays on the primary, and so do:
+#   - a client that wrote something in the last REPLICA_MAX_LAG_SECONDS, so
+#     it sees its own post/event straight away (read-your-writes). The write
+#     time travels with the client in the last-write cookie (and the
+#     X-Last-Write header, for clients that do not keep cookies), so this
+#     holds whichever instance serves the next request.
+#   - every request while all replicas are marked down
+#
+# A replica session reads in one REPEATABLE READ snapshot, so a club's
+# contentversion (the ETag and feed cache key) always matches the rows
+# served with it.
+
+class ReplicaRouter:
+    """
+    Round-robin over the replica URLs. Engines are created the first time a
+    replica is picked. A replica that fails to connect is skipped for
+    REPLICA_RETRY_SECONDS, then tried again.
+    """
+
+    def __init__(self, urls: list[str], retry_seconds: float):
+        self.urls = list(urls)
+        self.retry_seconds = retry_seconds
+        self._sessionmakers: list = [None] * len(self.urls)
+        self._down_until = [0.0] * len(self.urls)
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.urls)
+
+    def _sessionmaker(self, index: int):
+        if self._sessionmakers[index] is None:
+            with self._lock:
+                if self._sessionmakers[index] is None:
+                    self._sessionmakers[index] = async_sessionmaker(
+                        bind=make_async_engine(to_async_url(self.urls[index])),
+                        class_=AsyncSession, autoflush=False, expire_on_commit=False,
+                    )
+        return self._sessionmakers[index]
+
+    def pick(self) -> int | None:
+        """Index of the next healthy replica, or None if all are down."""
+        now = time.monotonic()
+        for _ in range(len(self.urls)):
+            index = next(self._next) % len(self.urls)
+            if self._down_until[index] <= now:
+                return index
+        return None
+
+    def mark_down(self, index: int):
+        self._down_until[index] = time.monotonic() + self.retry_seconds
+
+    def session(self, index: int):
+        return self._sessionmaker(index)()
+
+
+replica_router = ReplicaRouter(settings.DATABASE_REPLICA_URLS if async_sessionmaker else [],
+                               settings.REPLICA_RETRY_SECONDS)
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Unix time of the client's last write, set by ReadYourWritesMiddleware
+LAST_WRITE_COOKIE = "last-write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+
+def _last_write(scope) -> float | None:
+    for name, value in scope.get("headers", ()):
+        if name == LAST_WRITE_HEADER.lower().encode("latin-1"):
+            raw = value.decode("latin-1").strip()
+            break
+        if name == b"cookie":
+            morsel = SimpleCookie(value.decode("latin-1")).get(LAST_WRITE_COOKIE)
+            if morsel is not None:
+                raw = morsel.value
+                break
+    else:
+        return None
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+
+def _is_recent_writer(scope) -> bool:
+    written_at = _last_write(scope)
+    return written_at is not None and 0 <= time.time() - written_at < settings.REPLICA_MAX_LAG_SECONDS
+
+
+def _last_write_headers() -> list[tuple[bytes, bytes]]:
+    now = f"{time.time():.3f}"
+    max_age = math.ceil(settings.REPLICA_MAX_LAG_SECONDS)
+    cookie = f"{LAST_WRITE_COOKIE}={now}; Max-Age={max_age}; Path=/; HttpOnly; SameSite=Lax"
+    return [
+        (b"set-cookie", cookie.encode("latin-1")),
+        (LAST_WRITE_HEADER.lower().encode("latin-1"), now.encode("latin-1")),
+    ]
+
+
+class ReadYourWritesMiddleware:
+    """
+    Marks clients that just wrote: a successful (status < 400) non-GET
+    response carries the write time in the last-write cookie and the
+    X-Last-Write header, and a request sending either back within
+    REPLICA_MAX_LAG_SECONDS reads from the primary. Nothing is kept in the
+    process. Does nothing when no replicas are set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not replica_router or scope["type"] != "http" or scope["method"] in READ_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            # Stamped on the response itself, so the client's next request
+            # carries it to whichever instance serves it
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                message = {**message, "headers": [*message.get("headers", ()), *_last_write_headers()]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+# Drop-in for get_async_db on read-only routes
+async def get_read_async_db(request: Request):
+    index = replica_router.pick() if replica_router else None
+    if index is not None and _is_recent_writer(request.scope):
+        index = None
+
+    if index is not None:
+        db = None
+        try:
+            db = replica_router.session(index)
+            # Connect now so a dead replica falls back before the route runs.
+            # One snapshot per request keeps contentversion and rows in step.
+            if db.bind.dialect.name == "postgresql":
+                await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            else:
+                await db.connection()
+        except (exc.DBAPIError, OSError, ImportError) as e:
+            if db is not None:
+                await db.close()
+            replica_router.mark_down(index)
+            print(f"WARNING: Replica {index} unavailable, reading from the primary for "
+                  f"{replica_router.retry_seconds:g}s: {e}")
+            index = None
+        else:
+            try:
+                yield db
+            finally:
+                await db.close()
+            return
+
+    async for db in get_async_db():
+        yield db
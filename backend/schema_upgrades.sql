@@ -0,0 +1,53 @@
+-- Schema changes for databases created before them (PostgreSQL).
+-- New databases get all of this from Base.metadata.create_all. Apply the
+-- sections that are missing, in order; each is safe to re-run.
+
+-- Events and posts: keyset pagination indexes, one per listing order, so
+-- every page of /api/events, /api/clubs/{id}/events and
+-- /api/clubs/{id}/posts is a single range scan instead of a full sort.
+CREATE INDEX IF NOT EXISTS ix_events_start_eventid ON events (startdatetime, eventid);
+CREATE INDEX IF NOT EXISTS ix_events_club_start_eventid ON events (clubid, startdatetime, eventid);
+CREATE INDEX IF NOT EXISTS ix_posts_club_timestamp_postid ON posts (clubid, timestamp, postid);
+
+-- Tags: case-insensitive lookups when tags are assigned or imported.
+CREATE INDEX IF NOT EXISTS ix_tags_lower_tagname ON tags (lower(tagname));
+
+-- Clubs: content version behind the club feed ETags.
+ALTER TABLE clubs ADD COLUMN IF NOT EXISTS contentversion INTEGER NOT NULL DEFAULT 0;
+
+-- Events: duration class for time-window queries (see intervals.py).
+-- Every Events select reads this column, so add it before deploying.
+ALTER TABLE events ADD COLUMN IF NOT EXISTS durationclass SMALLINT;
+CREATE INDEX IF NOT EXISTS ix_events_duration_start_eventid ON events (durationclass, startdatetime, eventid);
+-- Rows with a NULL class are still found by the window queries, just less
+-- efficiently. Fill them in afterwards with:
+--   python -c "from database import SessionLocal; from queries import backfill_event_duration_classes; print(backfill_event_duration_classes(SessionLocal()))"
+
+-- Clubs: maintained follower/admin counts, and the follower listing index.
+-- Every ORM query on clubs reads the new columns, so add them before
+-- deploying, then fill them in once (new rows start at 0):
+ALTER TABLE clubs ADD COLUMN IF NOT EXISTS followercount INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE clubs ADD COLUMN IF NOT EXISTS admincount INTEGER NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS ix_clubmembership_club_user ON clubmembership (clubid, userid);
+--   python -c "from database import SessionLocal; from queries import backfill_club_member_counts; print(backfill_club_member_counts(SessionLocal()))"
+
+-- Conversation read state: one row per user and conversation, kept up to
+-- date on every message and mark-as-read so the inbox never scans
+-- messages. The inbox and every message write use it, so create it before
+-- deploying, then fill it in once from the existing messages:
+CREATE TABLE IF NOT EXISTS conversationreadstate (
+    userid INTEGER NOT NULL REFERENCES users (userid),
+    conversationid INTEGER NOT NULL REFERENCES conversations (conversationid),
+    unreadcount INTEGER NOT NULL DEFAULT 0,
+    lastmessagecontent TEXT,
+    lastmessagesenderid INTEGER REFERENCES users (userid),
+    lastmessagetime TIMESTAMP WITHOUT TIME ZONE,
+    lastreadtime TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (userid, conversationid)
+);
+--   python -c "from database import SessionLocal; from queries import rebuild_conversation_read_states; print(rebuild_conversation_read_states(SessionLocal()))"
+-- The inbox index matches get_inbox's ORDER BY, so the listing is read in
+-- index order without a sort (it replaces ix_readstate_user_lastmessage).
+CREATE INDEX IF NOT EXISTS ix_readstate_user_lastmessage_conversation
+    ON conversationreadstate (userid, lastmessagetime DESC NULLS LAST, conversationid DESC);
+DROP INDEX IF EXISTS ix_readstate_user_lastmessage;
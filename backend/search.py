@@ -0,0 +1,508 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+
+from config import settings
+from database import SessionLocal
+from models import Clubs, Events, Posts
+
+# ------------ In-process full-text search ------------
+
+# Document kinds that can be searched
+SEARCH_KINDS = ("club", "post", "event")
+
+# Per-field weights: a term in a title counts more than one in a body
+FIELD_WEIGHTS = {
+    "club": (("clubname", 3.0), ("description", 1.0)),
+    "post": (("title", 2.0), ("content", 1.0)),
+    "event": (("title", 2.0), ("description", 1.0), ("location", 1.0)),
+}
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# The last query term also matches longer terms starting with it, as long as
+# it has at least this many characters. A short prefix can match thousands of
+# terms, so only the MAX_PREFIX_EXPANSIONS most frequent ones are used.
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSIONS = 32
+
+# Posting lists shorter than this are scored in full. Longer ones keep a
+# copy sorted by score, so a query can stop reading them once the top
+# results are settled. The copy is rebuilt when the document count or
+# average length has drifted by more than SCORED_LIST_DRIFT since it was
+# sorted.
+SCORED_LIST_MIN_DF = 2048
+SCORED_LIST_DRIFT = 0.1
+
+# Sorted lists are read this many entries at a time between checks of the
+# stopping threshold; reading a few entries past the stop is cheaper than
+# recomputing the threshold after every one
+THRESHOLD_CHECK_EVERY = 16
+
+# Very common words carry no ranking signal and have the longest posting lists
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from has have in is it its of on or that the
+this to was were will with we our you your i
+""".split())
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Name of the thread that (re)builds the index, see SearchIndex.ensure_loading
+LOAD_THREAD_NAME = "search-index-load"
+
+
+def _bm25(idf: float, avg_length: float, tf: float, length: float) -> float:
+    return idf * tf * (BM25_K1 + 1.0) / (tf + BM25_K1 * (1.0 - BM25_B + BM25_B * length / avg_length))
+
+
+def tokenize(text: str | None) -> list[str]:
+    if not text:
+        return []
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+
+
+# Pull the indexed columns off a Clubs / Posts / Events object
+def model_fields(kind: str, obj) -> dict:
+    return {name: getattr(obj, name) for name, _ in FIELD_WEIGHTS[kind]}
+
+
+class _ScoredList:
+    """
+    One term's postings scored with fixed collection stats. For long lists,
+    entries holds (-score, doc) pairs in ascending order (best first); short
+    lists leave it as None. Random access scores for the same term must use
+    the same stats as the sorted entries, so both go through score().
+    """
+
+    __slots__ = ("posting", "entries", "idf", "avg_length", "n_docs")
+
+    def __init__(self, posting: dict[int, float], doc_lengths: list[float], n_docs: int, avg_length: float, sort: bool):
+        self.posting = posting
+        self.n_docs = n_docs
+        self.avg_length = avg_length
+        df = len(posting)
+        self.idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+        self.entries = sorted(
+            (-_bm25(self.idf, avg_length, tf, doc_lengths[doc]), doc) for doc, tf in posting.items()
+        ) if sort else None
+
+    def score(self, doc: int, doc_lengths: list[float]) -> float:
+        tf = self.posting.get(doc)
+        if tf is None:
+            return 0.0
+        return _bm25(self.idf, self.avg_length, tf, doc_lengths[doc])
+
+    # (posting lookup, numerator, length factor) for scoring one doc inline:
+    # numerator * tf / (tf + BM25_K1 * (1 - BM25_B) + length factor * length)
+    def scorer(self):
+        return self.posting.get, self.idf * (BM25_K1 + 1.0), BM25_K1 * BM25_B / self.avg_length
+
+    # Raise best[doc] to this term's score for each doc in docs (all of
+    # the term's own docs when docs is None)
+    def accumulate(self, best: dict[int, float], doc_lengths: list[float], docs=None):
+        numerator = self.idf * (BM25_K1 + 1.0)
+        base = BM25_K1 * (1.0 - BM25_B)
+        per_length = BM25_K1 * BM25_B / self.avg_length
+        if docs is None:
+            items = self.posting.items()
+        else:
+            posting = self.posting
+            items = [(doc, posting[doc]) for doc in docs if doc in posting]
+        for doc, tf in items:
+            score = numerator * tf / (tf + base + per_length * doc_lengths[doc])
+            if score > best.get(doc, 0.0):
+                best[doc] = score
+
+    def is_stale(self, n_docs: int, avg_length: float) -> bool:
+        return (
+            abs(n_docs - self.n_docs) > SCORED_LIST_DRIFT * self.n_docs
+            or abs(avg_length - self.avg_length) > SCORED_LIST_DRIFT * self.avg_length
+        )
+
+
+class SearchIndex:
+    """
+    Inverted index over club, post and event text, ranked with BM25.
+
+    The index is built from the DB in a background thread, started by the
+    first ensure_loading() call and again once ttl seconds have passed
+    since the last build. Building 300k documents takes tens of seconds, so
+    until the first build finishes callers answer from SQL instead (see
+    search_core), and a rebuild keeps serving the previous index. On a
+    serverless host the thread only runs while the instance is serving
+    requests, so a cold build there takes correspondingly longer.
+
+    The create/update/delete paths (core_logic.py for posts and events,
+    queries.py for clubs) keep the index up to date. Writes made during a
+    build go to the current index and are also replayed onto the new one
+    before it is swapped in, so none is lost. A query only walks the posting
+    lists of its own terms, and long lists are read best-first with the
+    threshold algorithm, so a query over a common word stops after enough
+    documents to fill the page instead of scoring all of them.
+
+    Documents are keyed by (kind, id) and stored under a dense internal doc
+    number. Postings are term -> {doc: weighted term frequency}.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # None until the first build has been swapped in
+        self._loaded_at: float | None = None
+        # Writes made while a build runs, to replay onto it; None when idle
+        self._pending: list[tuple] | None = None
+        # Set while no build is running
+        self._idle = threading.Event()
+        self._idle.set()
+        # Bumped by reset(), so a build started before it is thrown away
+        self._epoch = 0
+        self._clear()
+
+    def _clear(self):
+        self.postings: dict[str, dict[int, float]] = {}
+        # Sorted vocabulary, for prefix lookups with bisect
+        self.terms: list[str] = []
+        self.doc_keys: list[tuple[str, int] | None] = []
+        self.doc_ids: dict[tuple[str, int], int] = {}
+        self.doc_lengths: list[float] = []
+        self.doc_terms: list[tuple[str, ...]] = []
+        self.free_docs: list[int] = []
+        self.total_length = 0.0
+        # False while a load appends terms unsorted
+        self._terms_sorted = False
+        # term -> _ScoredList, only for long posting lists that have been queried
+        self.scored: dict[str, _ScoredList] = {}
+
+    # Everything _clear() sets, moved over from a finished build
+    _STATE = (
+        "postings", "terms", "doc_keys", "doc_ids", "doc_lengths", "doc_terms",
+        "free_docs", "total_length", "_terms_sorted", "scored",
+    )
+
+    def _fresh(self) -> bool:
+        loaded_at = self._loaded_at
+        return loaded_at is not None and time.monotonic() - loaded_at <= self.ttl
+
+    def ensure_loading(self) -> bool:
+        """
+        Start a background build when there is no index yet or it is past
+        its ttl, unless one is already running. Returns True when there is
+        an index to search (possibly one being rebuilt).
+        """
+        with self._lock:
+            if not self._fresh() and self._pending is None:
+                self._pending = []
+                self._idle.clear()
+                threading.Thread(target=self._load, args=(self._epoch,), name=LOAD_THREAD_NAME, daemon=True).start()
+            return self._loaded_at is not None
+
+    # Block until no build is running; False if timeout ran out first
+    def wait_loaded(self, timeout: float | None = None) -> bool:
+        return self._idle.wait(timeout)
+
+    # Load every club, post and event with one column-only query per table
+    def _load(self, epoch: int):
+        db = SessionLocal()
+        try:
+            clubs = db.query(Clubs.clubid, Clubs.clubname, Clubs.description).all()
+            posts = db.query(Posts.postid, Posts.title, Posts.content).all()
+            events = db.query(Events.eventid, Events.title, Events.description, Events.location).all()
+        except Exception as e:
+            print(f"Error has occured when loading the search index: {e}")
+            with self._lock:
+                if epoch == self._epoch:
+                    self._pending = None
+                    self._idle.set()
+            return
+        finally:
+            db.close()
+        self._load_rows((("club", clubs), ("post", posts), ("event", events)), epoch)
+
+    # rows_by_kind: (kind, rows) pairs, each row is (id, *fields in FIELD_WEIGHTS order).
+    # The new index is built without the lock, which is only held to swap it in.
+    def _load_rows(self, rows_by_kind, epoch: int):
+        built = SearchIndex(self.ttl)
+        for kind, rows in rows_by_kind:
+            names = [name for name, _ in FIELD_WEIGHTS[kind]]
+            for row in rows:
+                built._add(kind, row[0], dict(zip(names, row[1:])))
+        built.terms.sort()
+        built._terms_sorted = True
+
+        with self._lock:
+            # reset() was called while building
+            if epoch != self._epoch:
+                return
+            for write in self._pending or ():
+                built._apply(*write)
+            for name in self._STATE:
+                setattr(self, name, getattr(built, name))
+            self._pending = None
+            self._loaded_at = time.monotonic()
+            self._idle.set()
+
+    @staticmethod
+    def _weighted_terms(kind: str, fields: dict) -> dict[str, float]:
+        counts: dict[str, float] = {}
+        for name, weight in FIELD_WEIGHTS[kind]:
+            for token in tokenize(fields.get(name)):
+                counts[token] = counts.get(token, 0.0) + weight
+        return counts
+
+    # Caller holds the lock. New terms are appended unsorted during the
+    # initial load and inserted in order afterwards.
+    def _add(self, kind: str, doc_id: int, fields: dict):
+        counts = self._weighted_terms(kind, fields)
+        doc = self.free_docs.pop() if self.free_docs else len(self.doc_keys)
+        length = sum(counts.values())
+        if doc == len(self.doc_keys):
+            self.doc_keys.append((kind, doc_id))
+            self.doc_lengths.append(length)
+            self.doc_terms.append(tuple(counts))
+        else:
+            self.doc_keys[doc] = (kind, doc_id)
+            self.doc_lengths[doc] = length
+            self.doc_terms[doc] = tuple(counts)
+        self.doc_ids[(kind, doc_id)] = doc
+        self.total_length += length
+
+        for term, tf in counts.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                if self._terms_sorted:
+                    bisect.insort(self.terms, term)
+                else:
+                    self.terms.append(term)
+            posting[doc] = tf
+            scored = self.scored.get(term)
+            if scored is not None:
+                bisect.insort(scored.entries, (-scored.score(doc, self.doc_lengths), doc))
+
+    # Caller holds the lock
+    def _remove(self, kind: str, doc_id: int):
+        doc = self.doc_ids.pop((kind, doc_id), None)
+        if doc is None:
+            return
+        for term in self.doc_terms[doc]:
+            scored = self.scored.get(term)
+            if scored is not None:
+                # Same stats and length as when it was inserted, so the key matches
+                key = (-scored.score(doc, self.doc_lengths), doc)
+                i = bisect.bisect_left(scored.entries, key)
+                if i < len(scored.entries) and scored.entries[i] == key:
+                    del scored.entries[i]
+                else:
+                    scored.entries = [entry for entry in scored.entries if entry[1] != doc]
+            posting = self.postings[term]
+            del posting[doc]
+            if not posting:
+                del self.postings[term]
+                self.scored.pop(term, None)
+                del self.terms[bisect.bisect_left(self.terms, term)]
+        self.total_length -= self.doc_lengths[doc]
+        self.doc_keys[doc] = None
+        self.doc_lengths[doc] = 0.0
+        self.doc_terms[doc] = ()
+        self.free_docs.append(doc)
+
+    # Caller holds the lock. fields is None for a removal.
+    def _apply(self, kind: str, doc_id: int, fields: dict | None):
+        self._remove(kind, doc_id)
+        if fields is not None:
+            self._add(kind, doc_id, fields)
+
+    # Apply a write to the current index and to a build in progress (lock held)
+    def _write(self, kind: str, doc_id: int, fields: dict | None):
+        if self._pending is not None:
+            self._pending.append((kind, doc_id, fields))
+        # Nothing more to do before the first build, the rows will be read from the DB
+        if self._loaded_at is not None:
+            self._apply(kind, doc_id, fields)
+
+    # Add or replace a document. fields maps column names to text.
+    def upsert(self, kind: str, doc_id: int, fields: dict):
+        with self._lock:
+            self._write(kind, doc_id, dict(fields))
+
+    def remove(self, kind: str, doc_id: int):
+        with self._lock:
+            self._write(kind, doc_id, None)
+
+    # Drop everything so the next call rebuilds from the DB
+    def reset(self):
+        with self._lock:
+            self._clear()
+            self._loaded_at = None
+            self._pending = None
+            self._epoch += 1
+            self._idle.set()
+
+    def _expand_prefix(self, prefix: str) -> list[str]:
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + "\U0010ffff", start)
+        matches = self.terms[start:end]
+        if len(matches) <= MAX_PREFIX_EXPANSIONS:
+            return matches
+        postings = self.postings
+        return heapq.nlargest(MAX_PREFIX_EXPANSIONS, matches, key=lambda term: len(postings[term]))
+
+    def search(self, query: str, kinds=None, limit: int = 20, prefix: bool = True):
+        """
+        Rank documents against a free-text query.
+
+        Returns a list of (kind, id, score) triples, best first. With prefix
+        on, the last query term also matches terms that start with it; a
+        document scores the best of those matches for that term. Empty
+        before the first build, see ensure_loading.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        kinds = set(kinds) if kinds else None
+
+        if limit <= 0:
+            return []
+
+        with self._lock:
+            n_docs = len(self.doc_ids)
+            if n_docs == 0:
+                return []
+            avg_length = self.total_length / n_docs
+
+            # One group per query token: a document scores the best of the
+            # group's terms, and the groups' scores are summed
+            groups: list[list[_ScoredList]] = []
+            for i, token in enumerate(tokens):
+                if prefix and i == len(tokens) - 1 and len(token) >= MIN_PREFIX_LENGTH:
+                    terms = self._expand_prefix(token)
+                else:
+                    terms = [token] if token in self.postings else []
+                if terms:
+                    groups.append([self._scored_list(term, n_docs, avg_length) for term in terms])
+            if not groups:
+                return []
+
+            return self._top_k(groups, kinds, limit)
+
+    # Caller holds the lock
+    def _scored_list(self, term: str, n_docs: int, avg_length: float) -> _ScoredList:
+        posting = self.postings[term]
+        if len(posting) < SCORED_LIST_MIN_DF:
+            return _ScoredList(posting, self.doc_lengths, n_docs, avg_length, sort=False)
+        scored = self.scored.get(term)
+        if scored is None or scored.is_stale(n_docs, avg_length):
+            scored = self.scored[term] = _ScoredList(posting, self.doc_lengths, n_docs, avg_length, sort=True)
+        return scored
+
+    # Caller holds the lock
+    def _top_k(self, groups: list[list[_ScoredList]], kinds, limit: int):
+        """
+        Every document in a short list is scored in full. The long lists are
+        then read best-first in lock step (the threshold algorithm): each new
+        document is scored by looking it up in all the lists, and reading
+        stops once the k-th best score reaches the best score an unseen
+        document could still get. An unseen document is in none of the short
+        lists, so that bound is the sum of each group's best unread entry in
+        its long lists.
+        """
+        doc_keys = self.doc_keys
+        doc_lengths = self.doc_lengths
+        # Min-heap of (score, kind, -id, doc); ties broken by kind and id so
+        # the order is stable between calls
+        heap: list[tuple[float, str, int, int]] = []
+
+        # Same formula as _ScoredList.score, unrolled: this runs once per
+        # document read from a long list
+        base = BM25_K1 * (1.0 - BM25_B)
+        group_scorers = [[scored.scorer() for scored in group] for group in groups]
+
+        def consider(doc: int):
+            kind, doc_id = doc_keys[doc]
+            if kinds is not None and kind not in kinds:
+                return
+            length = doc_lengths[doc]
+            score = 0.0
+            for scorers in group_scorers:
+                best = 0.0
+                for get, numerator, per_length in scorers:
+                    tf = get(doc)
+                    if tf is not None:
+                        term_score = numerator * tf / (tf + base + per_length * length)
+                        if term_score > best:
+                            best = term_score
+                score += best
+            item = (score, kind, -doc_id, doc)
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+        # Short lists, term at a time: sum each group's best score per doc
+        seen: set[int] = set()
+        for group in groups:
+            for scored in group:
+                if scored.entries is None:
+                    seen.update(scored.posting)
+        if seen:
+            totals = dict.fromkeys(seen, 0.0)
+            for group in groups:
+                best: dict[int, float] = {}
+                for scored in group:
+                    scored.accumulate(best, doc_lengths, None if scored.entries is None else seen)
+                for doc, score in best.items():
+                    totals[doc] += score
+            candidates = totals.items()
+            if kinds is not None:
+                candidates = [item for item in candidates if doc_keys[item[0]][0] in kinds]
+            heap = heapq.nlargest(limit, (
+                (score, doc_keys[doc][0], -doc_keys[doc][1], doc) for doc, score in candidates
+            ))
+            heapq.heapify(heap)
+
+        long_groups = [[scored for scored in group if scored.entries is not None] for group in groups]
+        long_groups = [group for group in long_groups if group]
+        lists = [scored for group in long_groups for scored in group]
+        positions = [0] * len(lists)
+
+        while lists:
+            progressed = False
+            for n, scored in enumerate(lists):
+                position = positions[n]
+                end = min(position + THRESHOLD_CHECK_EVERY, len(scored.entries))
+                if position == end:
+                    continue
+                positions[n] = end
+                progressed = True
+
+                for _, doc in scored.entries[position:end]:
+                    if doc not in seen:
+                        seen.add(doc)
+                        consider(doc)
+
+            if not progressed:
+                break
+            if len(heap) == limit:
+                threshold = 0.0
+                n = 0
+                for group in long_groups:
+                    best = 0.0
+                    for scored in group:
+                        position = positions[n]
+                        if position < len(scored.entries):
+                            best = max(best, -scored.entries[position][0])
+                        n += 1
+                    threshold += best
+                if heap[0][0] >= threshold:
+                    break
+
+        return [(kind, -neg_id, score) for score, kind, neg_id, _ in sorted(heap, reverse=True)]
+
+
+# Shared index for this process
+search_index = SearchIndex(ttl=settings.SEARCH_INDEX_TTL_SECONDS)
@@ -0,0 +1,24 @@
+import hashlib
+
+import pytest
+
+import cpp_bridge
+
+library = cpp_bridge.get_library()
+needs_batch = pytest.mark.skipif(
+    library is None or not hasattr(library, "manual_encrypt_batch"),
+    reason="compiled encryption library with manual_encrypt_batch not found",
+)
+
+
+@needs_batch
+def test_batch_matches_single_digests():
+    passwords = ["", "abc", "x" * 55, "x" * 56, "pässwörd", "a\0b", "\0"]
+    assert cpp_bridge.encrypt_passwords_batch(passwords) == [cpp_bridge.encrypt_password(p) for p in passwords]
+
+
+@needs_batch
+def test_embedded_nul_hashes_up_to_the_nul():
+    expected = hashlib.sha256(b"secret").hexdigest()
+    assert cpp_bridge.encrypt_password("secret\0tail") == expected
+    assert cpp_bridge.encrypt_passwords_batch(["secret\0tail"]) == [expected]
@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta
+
+from models import Clubs, Events
+
+START = datetime(2030, 1, 1, 9)
+
+
+def test_cached_event_listing_picks_up_new_events(db, client, auth_headers):
+    db.add(Clubs(clubid=1, clubname="Chess", description="chess"))
+    db.add(Events(eventid=1, clubid=1, title="Opening", startdatetime=START, enddatetime=START + timedelta(hours=1)))
+    db.commit()
+
+    first = client.get("/api/events").json()
+    assert [event["id"] for event in first["events"]] == [1]
+    # Served from the cache until a write invalidates it
+    assert client.get("/api/events").json() == first
+
+    created = client.post("/api/events", headers=auth_headers, json={
+        "club_id": 1, "title": "Blitz", "description": "fast games", "location": "Hall",
+        "start_datetime": (START + timedelta(days=1)).isoformat(),
+        "end_datetime": (START + timedelta(days=1, hours=2)).isoformat(),
+    })
+    assert created.status_code == 200, created.text
+
+    assert [event["id"] for event in client.get("/api/events").json()["events"]] == [1, 2]
@@ -0,0 +1,47 @@
+import core_logic
+import queries
+from models import Users
+from passwords import DUMMY_HASH, hash_password
+
+
+def _record_verifies(monkeypatch, module, name):
+    calls = []
+    verify = getattr(module, name)
+
+    if name.endswith("_async"):
+        async def recording(password, stored):
+            calls.append(stored)
+            return await verify(password, stored)
+    else:
+        def recording(password, stored):
+            calls.append(stored)
+            return verify(password, stored)
+
+    monkeypatch.setattr(module, name, recording)
+    return calls
+
+
+def _add_user(db, email, password):
+    user = Users(email=email, password=hash_password(password), name="Known")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_login_hashes_for_unknown_and_known_emails(db, client, monkeypatch):
+    stored = _add_user(db, "known@clubr.test", "right").password
+    calls = _record_verifies(monkeypatch, core_logic, "verify_password_async")
+
+    unknown = client.post("/api/login", json={"email": "nobody@clubr.test", "password": "wrong"})
+    known = client.post("/api/login", json={"email": "known@clubr.test", "password": "wrong"})
+
+    assert unknown.status_code == known.status_code == 401
+    assert unknown.json() == known.json()
+    assert calls == [DUMMY_HASH, stored]
+
+
+def test_check_existing_user_hashes_for_unknown_email(db, monkeypatch):
+    calls = _record_verifies(monkeypatch, queries, "verify_password")
+
+    assert queries.check_existing_user(db, "nobody@clubr.test", "wrong") is None
+    assert calls == [DUMMY_HASH]
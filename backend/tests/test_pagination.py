@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+from models import Clubs, Events, Posts
+
+START = datetime(2030, 1, 1, 9)
+
+
+def _walk(client, path, key):
+    """Every id a listing returns, one row per page."""
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+        response = client.get(path, params=params)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        ids += [row["id"] for row in body[key]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def test_listings_page_past_null_sort_keys(db, client):
+    db.add(Clubs(clubid=1, clubname="Chess", description="chess"))
+    # NULL-dated rows sort at an end of the order, so with one row per
+    # page they land on a page boundary
+    db.add_all([
+        Events(eventid=i, clubid=1, title=f"Event {i}", startdatetime=START + timedelta(days=i) if i <= 3 else None)
+        for i in range(1, 6)
+    ])
+    db.add_all([
+        Posts(postid=i, clubid=1, title=f"Post {i}", content="c")
+        for i in range(1, 6)
+    ])
+    db.commit()
+    db.query(Posts).filter(Posts.postid > 3).update({Posts.timestamp: None})
+    for post_id in (1, 2, 3):
+        db.query(Posts).filter(Posts.postid == post_id).update({Posts.timestamp: START + timedelta(hours=post_id)})
+    db.commit()
+
+    assert _walk(client, "/api/events", "events") == [1, 2, 3]
+    assert _walk(client, "/api/clubs/1/events", "events") == [1, 2, 3]
+    assert _walk(client, "/api/clubs/1/posts", "posts") == [3, 2, 1]
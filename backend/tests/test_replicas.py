@@ -0,0 +1,57 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import replicas
+from benchmarks.sqlite_db import make_sqlite_session
+from models import Clubs
+
+START = datetime(2030, 1, 1, 9)
+
+
+@pytest.fixture
+def lagging_replica(db, tmp_path, monkeypatch):
+    """A replica that has the club but none of the writes made in the test."""
+    url = f"sqlite:///{tmp_path / 'replica.db'}"
+    replica = make_sqlite_session(url)
+    replica.add(Clubs(clubid=1, clubname="Chess", description="chess"))
+    replica.commit()
+    replica.close()
+    db.add(Clubs(clubid=1, clubname="Chess", description="chess"))
+    db.commit()
+    monkeypatch.setattr(replicas, "replica_router", replicas.ReplicaRouter([url], retry_seconds=30))
+
+
+def _event_titles(client, headers=None):
+    response = client.get("/api/clubs/1/events", headers=headers or {})
+    assert response.status_code == 200, response.text
+    return [event["title"] for event in response.json()["events"]]
+
+
+def test_writer_reads_its_write_through_the_header(lagging_replica, client, auth_headers):
+    created = client.post("/api/events", headers=auth_headers, json={
+        "club_id": 1, "title": "Blitz", "description": "fast games", "location": "Hall",
+        "start_datetime": START.isoformat(), "end_datetime": (START + timedelta(hours=2)).isoformat(),
+    })
+    assert created.status_code == 200, created.text
+    last_write = created.headers[replicas.LAST_WRITE_HEADER]
+    assert replicas.LAST_WRITE_COOKIE in created.cookies
+
+    # A browser's cross-origin fetch sends no cookie, only the echoed header
+    client.cookies.clear()
+    assert _event_titles(client, {replicas.LAST_WRITE_HEADER: last_write}) == ["Blitz"]
+    # Everyone else, and a marker older than the replica lag, reads the replica
+    assert _event_titles(client) == []
+    assert _event_titles(client, {replicas.LAST_WRITE_HEADER: f"{time.time() - 3600:.3f}"}) == []
+
+
+def test_writer_reads_its_write_through_the_cookie(lagging_replica, client, auth_headers):
+    created = client.post("/api/events", headers=auth_headers, json={
+        "club_id": 1, "title": "Blitz", "description": "fast games", "location": "Hall",
+        "start_datetime": START.isoformat(), "end_datetime": (START + timedelta(hours=2)).isoformat(),
+    })
+    assert created.status_code == 200, created.text
+
+    # The test client keeps the last-write cookie, as a same-origin browser would
+    assert _event_titles(client) == ["Blitz"]
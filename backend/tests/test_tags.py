@@ -0,0 +1,22 @@
+from sqlalchemy import text
+
+import queries
+from models import Tags, UserTags, Users
+
+
+def test_assign_tags_matches_case_and_non_ascii_spellings(db):
+    db.add(Users(userid=1, email="tags@clubr.test", password="-", name="Tags"))
+    db.add_all([Tags(tagid=1, tagname="Music"), Tags(tagid=2, tagname="Écologie")])
+    db.commit()
+
+    report = queries.create_user_tags(db, 1, ["MUSIC", "Écologie", "music", "Chess"])
+
+    assert report == {"added": ["MUSIC", "Écologie"], "skipped": [], "unknown": ["Chess"]}
+    assert sorted(tag_id for (tag_id,) in db.query(UserTags.tagid).filter(UserTags.userid == 1)) == [1, 2]
+
+
+def test_lower_tagname_lookup_uses_the_index(db):
+    plan = db.execute(text(
+        "EXPLAIN QUERY PLAN SELECT tagid FROM tags WHERE lower(tagname) IN ('music', 'chess')"
+    )).all()
+    assert any("ix_tags_lower_tagname" in row[-1] for row in plan)
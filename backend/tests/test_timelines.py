@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from models import ClubMembership, Clubs, Posts, Users
+from timelines import timeline_store
+
+START = datetime(2020, 1, 1, 9)
+
+
+def _feed_ids(client, headers):
+    response = client.get("/api/feed", headers=headers)
+    assert response.status_code == 200, response.text
+    return [post["id"] for post in response.json()["posts"]]
+
+
+def test_cached_timeline_sees_posts_from_other_instances(db, client, auth_headers):
+    user_id = db.query(Users.userid).filter(Users.email == "member@clubr.test").scalar()
+    db.add_all([Clubs(clubid=1, clubname="Chess", description="chess"), Clubs(clubid=2, clubname="Go", description="go")])
+    db.add_all([ClubMembership(userid=user_id, clubid=1, role="Follower"), ClubMembership(userid=user_id, clubid=2, role="Follower")])
+    db.add(Posts(postid=1, clubid=1, title="Opening", content="c", timestamp=START))
+    db.commit()
+    assert _feed_ids(client, auth_headers) == [1]
+
+    # Written by another instance: no fan-out here, only the version bump
+    db.add(Posts(postid=2, clubid=2, title="Joseki", content="c", timestamp=START + timedelta(hours=1)))
+    db.query(Clubs).filter(Clubs.clubid == 2).update({Clubs.contentversion: Clubs.contentversion + 1})
+    db.commit()
+    assert _feed_ids(client, auth_headers) == [2, 1]
+
+    # Written here: fanned out, and the timeline stays current without a rebuild
+    timeline = timeline_store._timelines.get(user_id)
+    created = client.post("/api/posts", headers=auth_headers, json={"club_id": 1, "title": "Endgame", "content": "c"})
+    assert created.status_code == 200, created.text
+    new_id = created.json()["post"]["id"]
+    assert _feed_ids(client, auth_headers) == [new_id, 2, 1]
+    assert timeline_store._timelines.get(user_id) is timeline
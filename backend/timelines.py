@@ -0,0 +1,223 @@
+import heapq
+import threading
+from bisect import bisect_left, insort
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from config import settings
+from models import ClubMembership, Clubs, Posts
+
+# ------------ Home timelines (fan-out on write) ------------
+
+# Timeline entries are (timestamp, postid, clubid) tuples. Sorting them as
+# tuples gives the same order as the feed's (timestamp, postid) keyset.
+#
+# Timelines live in one process, but posts can be written on any instance.
+# Every post write bumps its club's contentversion in the same transaction
+# (core_logic._bump_club_version), so a timeline remembers the version of
+# each push club it was built from and is rebuilt when the user's followed
+# clubs or any of those versions differ from the DB's.
+
+
+class Timeline:
+    """
+    One user's materialized timeline.
+
+    entries holds the newest posts of the user's "push" clubs in ascending
+    order, capped at TIMELINE_MAX_LENGTH. Clubs with more followers than
+    TIMELINE_FANOUT_MAX_FOLLOWERS are "pull" clubs: their posts are not
+    copied into timelines and are merged in at read time instead.
+
+    versions maps each push club to the contentversion the entries reflect.
+    """
+
+    __slots__ = ("entries", "post_ids", "push_clubs", "pull_clubs", "truncated", "versions", "lock")
+
+    def __init__(self, entries, push_clubs, pull_clubs, truncated, versions):
+        self.entries = entries
+        self.post_ids = {entry[1] for entry in entries}
+        self.push_clubs = push_clubs
+        self.pull_clubs = pull_clubs
+        self.truncated = truncated
+        self.versions = versions
+        self.lock = threading.Lock()
+
+    # True when built from the same followed clubs and push club versions
+    def matches(self, followed: dict[int, int]) -> bool:
+        if len(followed) != len(self.push_clubs) + len(self.pull_clubs):
+            return False
+        with self.lock:
+            return all(
+                followed.get(club_id) == version for club_id, version in self.versions.items()
+            ) and all(club_id in followed for club_id in self.pull_clubs)
+
+    # version is the club's contentversion after the post's write
+    def add(self, entry, max_length: int, version: int):
+        with self.lock:
+            # Only this write since the build, the timeline is current for the
+            # club again. Otherwise a write it has not seen stays unseen, and
+            # the next read rebuilds it.
+            if self.versions.get(entry[2]) == version - 1:
+                self.versions[entry[2]] = version
+            if entry[1] in self.post_ids:
+                return
+            insort(self.entries, entry)
+            self.post_ids.add(entry[1])
+
+            # Drop the oldest entries past the cap
+            while len(self.entries) > max_length:
+                dropped = self.entries.pop(0)
+                self.post_ids.discard(dropped[1])
+                self.truncated = True
+
+    # Up to `count` entries older than before_key, newest first
+    def older_than(self, before_key, count: int):
+        with self.lock:
+            end = bisect_left(self.entries, before_key) if before_key else len(self.entries)
+            start = max(0, end - count)
+            return self.entries[start:end][::-1], start == 0
+
+
+class TimelineStore:
+    """
+    Bounded set of materialized timelines, built lazily on first read and
+    then kept current by fan_out() when a post is created here. Each read
+    checks the followed clubs' versions first (one query), so posts written
+    on other instances are never missed.
+    """
+
+    def __init__(self, max_length: int, fanout_max_followers: int, max_users: int, ttl: float):
+        self.max_length = max_length
+        self.fanout_max_followers = fanout_max_followers
+        self._timelines = TTLCache(maxsize=max_users, ttl=ttl)
+
+    def invalidate_user(self, user_id: int):
+        self._timelines.delete(user_id)
+
+    # Followed club id -> contentversion, what a cached timeline is checked against
+    @staticmethod
+    def _followed_versions(db: Session, user_id: int) -> dict[int, int]:
+        rows = (
+            db.query(ClubMembership.clubid, Clubs.contentversion)
+            .join(Clubs, Clubs.clubid == ClubMembership.clubid)
+            .filter(ClubMembership.userid == user_id)
+            .all()
+        )
+        return {club_id: version or 0 for club_id, version in rows}
+
+    # Build a user's timeline in two more queries on top of the followed
+    # clubs: their follower counts, and the newest posts across the push clubs
+    def _build(self, db: Session, followed_versions: dict[int, int]) -> Timeline:
+        followed = list(followed_versions)
+
+        push_clubs, pull_clubs = [], []
+        if followed:
+            follower_counts = dict(
+                db.query(ClubMembership.clubid, func.count())
+                .filter(ClubMembership.clubid.in_(followed))
+                .group_by(ClubMembership.clubid)
+                .all()
+            )
+            for club_id in followed:
+                if follower_counts.get(club_id, 0) > self.fanout_max_followers:
+                    pull_clubs.append(club_id)
+                else:
+                    push_clubs.append(club_id)
+
+        entries = []
+        if push_clubs:
+            rows = (
+                db.query(Posts.timestamp, Posts.postid, Posts.clubid)
+                .filter(Posts.clubid.in_(push_clubs), Posts.timestamp.isnot(None))
+                .order_by(Posts.timestamp.desc(), Posts.postid.desc())
+                .limit(self.max_length)
+                .all()
+            )
+            entries = [tuple(row) for row in reversed(rows)]
+
+        versions = {club_id: followed_versions[club_id] for club_id in push_clubs}
+        return Timeline(entries, push_clubs, pull_clubs, len(entries) >= self.max_length, versions)
+
+    def get(self, db: Session, user_id: int) -> Timeline:
+        followed = self._followed_versions(db, user_id)
+        timeline = self._timelines.get(user_id)
+        if timeline is None or not timeline.matches(followed):
+            timeline = self._build(db, followed)
+            self._timelines.set(user_id, timeline)
+        return timeline
+
+    def fan_out(self, db: Session, club_id: int, timestamp, post_id: int, version: int):
+        """
+        Push a new post into the materialized timelines of the club's
+        followers. Clubs over the fan-out limit are skipped (read-time pull).
+        version is the club's contentversion after the post was committed.
+        """
+        if timestamp is None:
+            return
+
+        follower_ids = [
+            user_id for (user_id,) in
+            db.query(ClubMembership.userid)
+            .filter(ClubMembership.clubid == club_id)
+            .limit(self.fanout_max_followers + 1)
+            .all()
+        ]
+        if len(follower_ids) > self.fanout_max_followers:
+            return
+
+        entry = (timestamp, post_id, club_id)
+        for user_id in follower_ids:
+            # Users without a materialized timeline pick the post up when it is built
+            timeline = self._timelines.get(user_id)
+            if timeline is not None:
+                timeline.add(entry, self.max_length, version)
+
+    def page(self, db: Session, user_id: int, before_key, count: int):
+        """
+        Up to `count` timeline entries older than before_key, newest first,
+        merged from the materialized timeline and the user's pull clubs.
+        """
+        timeline = self.get(db, user_id)
+        materialized, reached_start = timeline.older_than(before_key, count)
+
+        sources = [materialized]
+
+        # Past the end of a capped timeline, read older push-club posts from the DB
+        if reached_start and timeline.truncated and len(materialized) < count:
+            lower = materialized[-1][:2] if materialized else before_key
+            sources.append(
+                self._query_posts(db, timeline.push_clubs, lower, count - len(materialized))
+            )
+
+        # Read-time pull for large clubs, one keyset range scan each
+        for club_id in timeline.pull_clubs:
+            sources.append(self._query_posts(db, [club_id], before_key, count))
+
+        if len(sources) == 1:
+            return materialized
+
+        merged = heapq.merge(*sources, key=lambda entry: entry[:2], reverse=True)
+        return [entry for _, entry in zip(range(count), merged)]
+
+    @staticmethod
+    def _query_posts(db: Session, club_ids, before_key, count: int):
+        if not club_ids:
+            return []
+        query = db.query(Posts.timestamp, Posts.postid, Posts.clubid).filter(
+            Posts.clubid.in_(club_ids), Posts.timestamp.isnot(None)
+        )
+        if before_key:
+            query = query.filter(tuple_(Posts.timestamp, Posts.postid) < before_key)
+        rows = query.order_by(Posts.timestamp.desc(), Posts.postid.desc()).limit(count).all()
+        return [tuple(row) for row in rows]
+
+
+# Shared timeline store for this process
+timeline_store = TimelineStore(
+    max_length=settings.TIMELINE_MAX_LENGTH,
+    fanout_max_followers=settings.TIMELINE_FANOUT_MAX_FOLLOWERS,
+    max_users=settings.TIMELINE_CACHE_USERS,
+    ttl=settings.TIMELINE_TTL_SECONDS,
+)
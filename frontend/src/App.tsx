@@ -13,6 +13,7 @@ import { mockClubs, mockPosts, mockEvents, mockChats } from './mockData';
 import { Club, Post, Event } from './types';
 import { Toaster } from './components/ui/sonner';
 import { toast } from 'sonner';
+import { apiFetch } from './api';
 
 type AppState = 'login' | 'interests' | 'app';
 type PageType = 'home' | 'discovery' | 'club' | 'messages' | 'clubs' | 'profile';
@@ -59,7 +60,7 @@ export default function App() {
         return;
       }
 
-      const response = await fetch("http://localhost:8000/api/save_tags", {
+      const response = await apiFetch("/api/save_tags", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -0,0 +1,28 @@
+// Thin fetch wrapper for the Clubr backend.
+//
+// After a write the backend answers with an X-Last-Write header (see
+// backend/replicas.py). Sending it back keeps this client's reads on the
+// primary database until the read replicas have caught up, so what the
+// user just saved shows up straight away. The last-write cookie the
+// backend also sets is not sent on cross-origin fetches, so the header is
+// what carries it from here.
+export const API_BASE_URL = 'http://localhost:8000';
+
+const LAST_WRITE_HEADER = 'X-Last-Write';
+const LAST_WRITE_KEY = 'lastWrite';
+
+export async function apiFetch(path: string, init: RequestInit = {}): Promise<Response> {
+  const headers = new Headers(init.headers);
+  const lastWrite = sessionStorage.getItem(LAST_WRITE_KEY);
+  if (lastWrite) {
+    headers.set(LAST_WRITE_HEADER, lastWrite);
+  }
+
+  const response = await fetch(`${API_BASE_URL}${path}`, { ...init, headers });
+
+  const written = response.headers.get(LAST_WRITE_HEADER);
+  if (written) {
+    sessionStorage.setItem(LAST_WRITE_KEY, written);
+  }
+  return response;
+}
@@ -12,6 +12,7 @@ import {
 } from "./ui/card";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "./ui/tabs";
 import { toast } from "sonner";
+import { apiFetch } from "../api";
 
 interface LoginPageProps {
   onLogin: () => void;
@@ -29,7 +30,7 @@ export function LoginPage({ onLogin, onSignUp }: LoginPageProps) {
     setIsLoading(true);
 
     try {
-      const response = await fetch("http://localhost:8000/api/login", {
+      const response = await apiFetch("/api/login", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -59,7 +60,7 @@ export function LoginPage({ onLogin, onSignUp }: LoginPageProps) {
     setIsLoading(true);
 
     try {
-      const response = await fetch("http://localhost:8000/api/signup", {
+      const response = await apiFetch("/api/signup", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",